@@ -0,0 +1,1762 @@
+"""
+Code analysis features: explanation, generation, flow diagrams, security
+scanning, fixing, language conversion and the debugging assistant.
+
+These functions only talk to the model providers and never import Streamlit,
+so the web app (app.py) and the command-line interface (cli.py) share them.
+Each feature has an async implementation, a synchronous wrapper and, where
+the app shows output as it is generated, a streaming variant.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+from providers import (
+    groq_chat_async,
+    groq_stream,
+    gemini_generate_async,
+    gemini_stream,
+    groq_chat_hedged_async,
+    groq_stream_hedged,
+)
+from async_runtime import run_sync
+from code_chunks import CodeChunk, split_code, split_definitions
+from token_budget import context_window, plan_output_tokens
+from patching import apply_patch
+from resilience import ErrorKind, classify_error
+from prompt_templates import register_template
+from minify import minify_source, MinifiedSource
+from static_scan import scan_code, flagged_regions
+
+# Gemini model parameters shared by the explanation helpers
+GEMINI_SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+]
+
+EXPLAIN_GENERATION_CONFIG = {
+    "temperature": 0.2,  # Lower for more accurate explanations
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+}
+
+# Large-input explanation: inputs above the threshold are explained chunk by
+# chunk in parallel and the chunk notes are combined into one overview
+EXPLAIN_CHUNK_THRESHOLD = int(os.environ.get("FIXIFOX_EXPLAIN_CHUNK_THRESHOLD", "12000"))
+EXPLAIN_REDUCE_MAX_CHARS = int(os.environ.get("FIXIFOX_EXPLAIN_REDUCE_MAX_CHARS", "24000"))
+EXPLAIN_CHUNK_GENERATION_CONFIG = {**EXPLAIN_GENERATION_CONFIG, "max_output_tokens": 768}
+
+# Incremental analysis: code with enough top-level definitions is explained and
+# scanned one definition per request. Each request contains only that
+# definition, so after an edit the unchanged ones are served from the response
+# cache and only the changed ones go to the model. 0 disables it.
+INCREMENTAL_MIN_DEFINITIONS = int(os.environ.get("FIXIFOX_INCREMENTAL_MIN_DEFINITIONS", "3"))
+INCREMENTAL_MIN_CHARS = int(os.environ.get("FIXIFOX_INCREMENTAL_MIN_CHARS", "2000"))
+
+# Output budgets relative to the size of the user's input (see token_budget.plan_output_tokens)
+EXPLAIN_OUTPUT_RATIO = 1.5
+FIX_OUTPUT_RATIO = 1.2
+FIX_PATCH_OUTPUT_RATIO = 0.3
+CONVERSION_OUTPUT_RATIO = 1.5
+SECURITY_SCAN_OUTPUT_RATIO = 1.0
+
+def explain_generation_config(model_name: str, prompt: str, source: str) -> dict:
+    """
+    EXPLAIN_GENERATION_CONFIG with max_output_tokens sized from the input.
+    
+    Raises:
+        TokenBudgetError: If the prompt cannot fit in the model's context window.
+    """
+    max_output_tokens = plan_output_tokens(
+        model_name,
+        prompt,
+        source,
+        ratio=EXPLAIN_OUTPUT_RATIO,
+        minimum=EXPLAIN_GENERATION_CONFIG["max_output_tokens"]
+    )
+    return {**EXPLAIN_GENERATION_CONFIG, "max_output_tokens": max_output_tokens}
+
+# Explanation prompts. Templates are compacted once at import (see prompt_templates)
+EXPLAIN_ERROR_TEMPLATE = register_template("explain_error", """Explain the following error message in a very beginner-friendly way:
+        
+        ERROR:
+        ```
+        {code}
+        ```
+        
+        {language_part}
+        
+        EXPLANATION GUIDELINES:
+        - Start with a simple explanation of what went wrong in plain English
+        - Explain exactly which part of the code caused the error
+        - Suggest 2-3 specific ways to fix the error
+        - {style}
+        - {format}
+        - {depth}
+        {highlight_part}
+        {examples_part}
+        {diagram_part}
+        
+        Conclude with a one-sentence summary of what the programmer should remember to avoid this error in the future.
+        """)
+
+EXPLAIN_CODE_TEMPLATE = register_template("explain_code", """Explain the following code in a very beginner-friendly way:
+        
+        CODE:
+        ```
+        {code}
+        ```
+        
+        {language_part}
+        
+        EXPLANATION GUIDELINES:
+        - Start with a simple overview of what this code does in 1-2 sentences
+        - Then walk through the code step-by-step
+        - Explain the purpose of each major section
+        - {style}
+        - {format}
+        - {depth}
+        {highlight_part}
+        {examples_part}
+        {diagram_part}
+        
+        Conclude with a bullet list summary of key concepts demonstrated in this code.
+        """)
+
+EXPLAIN_HIGHLIGHT_PART = register_template("explain_highlight_part", """
+        Highlight important parts of the code by:
+        1. **Bolding key variables, functions, and control structures**
+        2. Explaining critical lines with 💡 emoji at the start
+        3. Flagging potential issues with ⚠️ emoji
+        4. Using bullet points for step-by-step explanations
+        """)
+
+EXPLAIN_EXAMPLES_PART = register_template("explain_examples_part", """
+        Include 1-2 simple, concrete examples showing how the code works with specific inputs and outputs.
+        For errors, show a corrected version of the code.
+        """)
+
+EXPLAIN_DIAGRAM_PART = register_template("explain_diagram_part", """
+        Include a simple ASCII or markdown diagram to visually explain the code flow or data structures
+        when it would help understanding.
+        """)
+
+def build_explain_prompt(
+    code: str,
+    is_error: bool = False,
+    programming_language: str = None,
+    detail_level: str = "beginner",
+    highlight_important_parts: bool = True,
+    include_examples: bool = True,
+    include_diagrams: bool = False
+) -> str:
+    """
+    Build the Gemini prompt used to explain code or an error message.
+    
+    Takes the same options as explain_code_with_gemini.
+    
+    Returns:
+        str: The prompt text.
+    """
+    # Set language detection part
+    language_part = ""
+    if programming_language:
+        language_part = f"This is {programming_language} code."
+    else:
+        language_part = "Please identify what programming language this is before explaining it."
+    
+    # Configure detail level
+    detail_configs = {
+        "beginner": {
+            "style": "Use simple language as if explaining to someone with no programming experience. Define all technical terms.",
+            "format": "Break down the explanation into small, easy-to-understand sections.",
+            "depth": "Focus on the basic purpose of each line, avoiding complex concepts unless necessary."
+        },
+        "intermediate": {
+            "style": "Use straightforward explanations assuming basic programming knowledge.",
+            "format": "Organize the explanation by logical components or functions.",
+            "depth": "Include explanations of common patterns and programming concepts."
+        },
+        "advanced": {
+            "style": "Use technical language assuming substantial programming experience.",
+            "format": "Focus on non-obvious aspects and design decisions.",
+            "depth": "Include performance considerations and alternative approaches."
+        }
+    }
+    
+    detail_config = detail_configs.get(detail_level, detail_configs["beginner"])
+    
+    # Optional guideline blocks; empty ones are dropped from the prompt
+    highlight_part = EXPLAIN_HIGHLIGHT_PART.render() if highlight_important_parts else ""
+    examples_part = EXPLAIN_EXAMPLES_PART.render() if include_examples else ""
+    diagram_part = EXPLAIN_DIAGRAM_PART.render() if include_diagrams else ""
+    
+    # Create prompt based on whether it's code or an error
+    template = EXPLAIN_ERROR_TEMPLATE if is_error else EXPLAIN_CODE_TEMPLATE
+    return template.render(
+        code=code,
+        language_part=language_part,
+        style=detail_config['style'],
+        format=detail_config['format'],
+        depth=detail_config['depth'],
+        highlight_part=highlight_part,
+        examples_part=examples_part,
+        diagram_part=diagram_part
+    )
+
+def highlight_code_terms(explanation: str) -> str:
+    """
+    Bold code-like terms in an explanation that has no markdown emphasis.
+    """
+    # Find code-like patterns and add bold formatting
+    code_pattern = r'\b([a-zA-Z_][a-zA-Z0-9_]*\(|\bif\b|\bfor\b|\bwhile\b|\bdef\b|\bclass\b|\breturn\b|\bimport\b)'
+    return re.sub(code_pattern, r'**\1**', explanation)
+
+def explanation_error_message(error, model_name: str, elapsed: float = 0.0) -> str:
+    """
+    Turn a provider error into a friendly explanation-failure message.
+    """
+    kind = classify_error(error)
+    if kind == ErrorKind.TIMEOUT or elapsed > 30:
+        return "The explanation is taking too long to generate. Your code might be very complex. Try sharing a smaller portion of the code."
+    elif kind == ErrorKind.CONTEXT_LENGTH:
+        return "The code is too large to explain in one go. Please share a smaller snippet or break it into logical parts."
+    elif kind in (ErrorKind.NOT_FOUND, ErrorKind.CIRCUIT_OPEN):
+        return f"The Gemini model '{model_name}' is currently unavailable. Try again later or try using 'gemini-1.5-pro' instead."
+    elif kind == ErrorKind.RATE_LIMIT:
+        return "Unable to generate explanation after multiple attempts. Please try again later or with a different code sample."
+    return f"Could not generate an explanation: {str(error)}. Please try again with a simpler code snippet."
+
+CHUNK_EXPLAIN_TEMPLATE = register_template("explain_code_chunk", """You are reading one section of a large source file. {language_part}
+    
+    FILE OUTLINE (all sections):
+    {outline}
+    
+    SECTION: {title}
+    ```
+    {code}
+    ```
+    
+    Write concise notes on this section only:
+    - What each function, class or block in it does (1-2 sentences each)
+    - How it relates to other sections in the outline, if that is clear
+    - Any ⚠️ potential issues
+    Do not repeat the code.
+    """)
+
+def build_chunk_explain_prompt(chunk, outline: str, programming_language: str = None) -> str:
+    """
+    Build the map-step prompt: notes on one section of a large file.
+    """
+    language_part = f"The file is {programming_language} code." if programming_language else ""
+    return CHUNK_EXPLAIN_TEMPLATE.render(
+        language_part=language_part,
+        outline=outline,
+        title=chunk.title,
+        code=chunk.text.rstrip("\n")
+    )
+
+DEFINITION_EXPLAIN_TEMPLATE = register_template("explain_definition", """You are reading one top-level part of a source file. {language_part}
+    
+    ```
+    {code}
+    ```
+    
+    Write concise notes on this part only:
+    - What each function, class or block in it does (1-2 sentences each)
+    - What it depends on, if that is clear
+    - Any ⚠️ potential issues
+    Do not repeat the code.
+    """)
+
+def build_definition_explain_prompt(definition, programming_language: str = None) -> str:
+    """
+    Build the map-step prompt for one top-level definition.
+    
+    Only the definition's own text goes into the prompt (no line numbers or
+    outline), so the prompt, and its cached result, stay the same as long as
+    the definition itself is unchanged.
+    """
+    language_part = f"The code is {programming_language}." if programming_language else ""
+    return DEFINITION_EXPLAIN_TEMPLATE.render(language_part=language_part, code=definition.text.strip("\n"))
+
+def split_for_incremental_analysis(code: str, programming_language: str = None):
+    """
+    Split code into top-level definitions if it qualifies for incremental analysis.
+    
+    Returns:
+        list: CodeChunk objects from split_definitions, or None if the code is
+            too small, too large (see EXPLAIN_CHUNK_THRESHOLD) or has too few
+            named definitions.
+    """
+    if not INCREMENTAL_MIN_DEFINITIONS or not INCREMENTAL_MIN_CHARS <= len(code) <= EXPLAIN_CHUNK_THRESHOLD:
+        return None
+    definitions = split_definitions(code, language=programming_language)
+    if sum(1 for definition in definitions if definition.names) < INCREMENTAL_MIN_DEFINITIONS:
+        return None
+    return definitions
+
+CONDENSE_TEMPLATE = register_template("explain_code_condense", """Combine the following notes on consecutive sections of a source file into one
+    shorter set of notes. Keep every function and class name, what it does and any ⚠️ issues.
+    
+    {notes}
+    """)
+
+def build_condense_prompt(notes: list) -> str:
+    """
+    Build the prompt that merges several sections' notes into shorter notes.
+    """
+    return CONDENSE_TEMPLATE.render(notes="\n\n".join(notes))
+
+OVERVIEW_TEMPLATE = register_template("explain_code_overview", """The code to explain is a large file that has been read section by section.
+    
+    FILE OUTLINE:
+    {outline}
+    
+    SECTION NOTES:
+    {notes}
+    
+    Using only the outline and notes above, write one explanation of the whole file.
+    Explain the overall purpose and structure first, then each major part.
+    
+    {guidelines}
+    """)
+
+def build_overview_prompt(
+    notes: list,
+    outline: str,
+    programming_language: str = None,
+    detail_level: str = "beginner",
+    highlight_important_parts: bool = True,
+    include_examples: bool = True,
+    include_diagrams: bool = False
+) -> str:
+    """
+    Build the reduce-step prompt that turns section notes into one explanation.
+    """
+    # Reuse the single-shot guidelines so both modes read the same way
+    guidelines = build_explain_prompt(
+        "(see the section notes below)",
+        programming_language=programming_language,
+        detail_level=detail_level,
+        highlight_important_parts=highlight_important_parts,
+        include_examples=include_examples,
+        include_diagrams=include_diagrams
+    )
+    return OVERVIEW_TEMPLATE.render(outline=outline, notes="\n\n".join(notes), guidelines=guidelines)
+
+async def summarize_code_chunks_async(
+    code: str,
+    programming_language: str = None,
+    model_name: str = 'gemini-2.0-flash',
+    definitions: list = None
+) -> tuple:
+    """
+    Map step of the large-input and incremental explanations.
+    
+    Splits the code along top-level definitions, explains every chunk in
+    parallel and condenses the notes (also in parallel) until they fit in a
+    single overview prompt.
+    
+    Args:
+        definitions (list, optional): Chunks from split_for_incremental_analysis.
+            When given, each one is explained on its own with
+            build_definition_explain_prompt instead of packing the code into
+            large chunks.
+    
+    Returns:
+        tuple: (file outline, list of section notes)
+    """
+    chunks = definitions or split_code(code, language=programming_language)
+    outline = "\n".join(f"- {chunk.title}" for chunk in chunks)
+    if definitions:
+        function = "explain_definition"
+        prompts = [build_definition_explain_prompt(chunk, programming_language) for chunk in chunks]
+    else:
+        function = "explain_code_chunk"
+        prompts = [build_chunk_explain_prompt(chunk, outline, programming_language) for chunk in chunks]
+    
+    results = await asyncio.gather(*[
+        gemini_generate_async(
+            function,
+            model_name,
+            prompt,
+            generation_config=EXPLAIN_CHUNK_GENERATION_CONFIG,
+            safety_settings=GEMINI_SAFETY_SETTINGS
+        )
+        for prompt in prompts
+    ], return_exceptions=True)
+    
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures and len(failures) == len(results):
+        raise failures[0]
+    notes = [
+        f"### {chunk.title}\n" + (f"(No notes: {result})" if isinstance(result, Exception) else result)
+        for chunk, result in zip(chunks, results)
+    ]
+    
+    # Condense in rounds until the notes fit in the overview prompt
+    while len(notes) > 1 and sum(len(note) for note in notes) > EXPLAIN_REDUCE_MAX_CHARS:
+        groups = [[]]
+        for note in notes:
+            if len(groups[-1]) >= 2 and sum(len(n) for n in groups[-1]) + len(note) > EXPLAIN_REDUCE_MAX_CHARS:
+                groups.append([])
+            groups[-1].append(note)
+        condensed = await asyncio.gather(*[
+            gemini_generate_async(
+                "explain_code_condense",
+                model_name,
+                build_condense_prompt(group),
+                generation_config=EXPLAIN_CHUNK_GENERATION_CONFIG,
+                safety_settings=GEMINI_SAFETY_SETTINGS
+            ) if len(group) > 1 else asyncio.sleep(0, result=group[0])
+            for group in groups
+        ])
+        notes = list(condensed)
+    
+    return outline, notes
+
+async def explain_large_code_async(
+    code: str,
+    programming_language: str = None,
+    detail_level: str = "beginner",
+    highlight_important_parts: bool = True,
+    include_examples: bool = True,
+    include_diagrams: bool = False,
+    model_name: str = 'gemini-2.0-flash',
+    definitions: list = None
+) -> str:
+    """
+    Explain a file too large for a single request with a chunked map-reduce.
+    
+    With definitions (see split_for_incremental_analysis) the map step runs
+    per definition, so only changed definitions are sent to the model again.
+    
+    Returns:
+        str: The combined explanation or an error message.
+    """
+    start_time = time.time()
+    try:
+        outline, notes = await summarize_code_chunks_async(code, programming_language, model_name, definitions)
+        prompt = build_overview_prompt(
+            notes,
+            outline,
+            programming_language=programming_language,
+            detail_level=detail_level,
+            highlight_important_parts=highlight_important_parts,
+            include_examples=include_examples,
+            include_diagrams=include_diagrams
+        )
+        explanation = await gemini_generate_async(
+            "explain_code_overview",
+            model_name,
+            prompt,
+            generation_config=explain_generation_config(model_name, prompt, "\n\n".join(notes)),
+            safety_settings=GEMINI_SAFETY_SETTINGS
+        )
+    except Exception as e:
+        return explanation_error_message(e, model_name, time.time() - start_time)
+    
+    if highlight_important_parts and "**" not in explanation:
+        explanation = highlight_code_terms(explanation)
+    return explanation
+
+async def explain_code_with_gemini_async(
+    code: str, 
+    is_error: bool = False,
+    programming_language: str = None,
+    detail_level: str = "beginner",
+    highlight_important_parts: bool = True,
+    include_examples: bool = True,
+    include_diagrams: bool = False,
+    model_name: str = 'gemini-2.0-flash'
+) -> str:
+    """
+    Explains code or error messages in a beginner-friendly way using Google's Gemini model.
+    
+    Args:
+        code (str): The code or error message to explain.
+        is_error (bool, optional): Whether the input is an error message. Defaults to False.
+        programming_language (str, optional): The programming language of the code. 
+            This helps the model provide more accurate explanations. Defaults to None (auto-detect).
+        detail_level (str, optional): Level of explanation detail - "beginner", "intermediate", or "advanced".
+            Defaults to "beginner".
+        highlight_important_parts (bool, optional): Whether to highlight important parts of the code.
+            Defaults to True.
+        include_examples (bool, optional): Whether to include simple examples. Defaults to True.
+        include_diagrams (bool, optional): Whether to request ascii/markdown diagrams for visual learners.
+            Defaults to False.
+        model_name (str, optional): The Gemini model to use. Defaults to 'gemini-2.0-flash'.
+    
+    Returns:
+        str: Beginner-friendly explanation or error message.
+    """
+    large_input_options = dict(
+        programming_language=programming_language,
+        detail_level=detail_level,
+        highlight_important_parts=highlight_important_parts,
+        include_examples=include_examples,
+        include_diagrams=include_diagrams,
+        model_name=model_name
+    )
+    if not is_error and len(code) > EXPLAIN_CHUNK_THRESHOLD:
+        return await explain_large_code_async(code, **large_input_options)
+    definitions = None if is_error else split_for_incremental_analysis(code, programming_language)
+    if definitions:
+        return await explain_large_code_async(code, definitions=definitions, **large_input_options)
+    
+    prompt = build_explain_prompt(
+        code,
+        is_error=is_error,
+        programming_language=programming_language,
+        detail_level=detail_level,
+        highlight_important_parts=highlight_important_parts,
+        include_examples=include_examples,
+        include_diagrams=include_diagrams
+    )
+    
+    # Retries with backoff and circuit breaking happen in the provider layer
+    start_time = time.time()
+    try:
+        # Generate response with enhanced parameters (served from cache when possible)
+        explanation = await gemini_generate_async(
+            "explain_code_with_gemini",
+            model_name,
+            prompt,
+            generation_config=explain_generation_config(model_name, prompt, code),
+            safety_settings=GEMINI_SAFETY_SETTINGS
+        )
+    except Exception as e:
+        if not is_error and classify_error(e) == ErrorKind.CONTEXT_LENGTH:
+            # Too large for one request after all: explain it in chunks
+            return await explain_large_code_async(code, **large_input_options)
+        return explanation_error_message(e, model_name, time.time() - start_time)
+    
+    # Add syntax highlighting markers if not present but requested
+    if highlight_important_parts and "**" not in explanation:
+        explanation = highlight_code_terms(explanation)
+    
+    return explanation
+
+def explain_code_with_gemini(*args, **kwargs) -> str:
+    """
+    Synchronous wrapper around explain_code_with_gemini_async; takes the same arguments.
+    """
+    return run_sync(explain_code_with_gemini_async(*args, **kwargs))
+
+def stream_explain_code_with_gemini(
+    code: str, 
+    is_error: bool = False,
+    programming_language: str = None,
+    detail_level: str = "beginner",
+    highlight_important_parts: bool = True,
+    include_examples: bool = True,
+    include_diagrams: bool = False,
+    model_name: str = 'gemini-2.0-flash'
+):
+    """
+    Streaming variant of explain_code_with_gemini.
+    
+    Takes the same arguments and yields the explanation as text deltas as soon
+    as Gemini produces them. Errors are yielded as a final message.
+    
+    Yields:
+        str: Pieces of the explanation.
+    """
+    function = "explain_code_with_gemini"
+    source = code
+    try:
+        definitions = None if is_error else split_for_incremental_analysis(code, programming_language)
+        if not is_error and (len(code) > EXPLAIN_CHUNK_THRESHOLD or definitions):
+            # Large input or many definitions: explain the parts in parallel, then stream the combined overview
+            outline, notes = run_sync(summarize_code_chunks_async(code, programming_language, model_name, definitions))
+            function = "explain_code_overview"
+            source = "\n\n".join(notes)
+            prompt = build_overview_prompt(
+                notes,
+                outline,
+                programming_language=programming_language,
+                detail_level=detail_level,
+                highlight_important_parts=highlight_important_parts,
+                include_examples=include_examples,
+                include_diagrams=include_diagrams
+            )
+        else:
+            prompt = build_explain_prompt(
+                code,
+                is_error=is_error,
+                programming_language=programming_language,
+                detail_level=detail_level,
+                highlight_important_parts=highlight_important_parts,
+                include_examples=include_examples,
+                include_diagrams=include_diagrams
+            )
+        
+        yield from gemini_stream(
+            function,
+            model_name,
+            prompt,
+            generation_config=explain_generation_config(model_name, prompt, source),
+            safety_settings=GEMINI_SAFETY_SETTINGS
+        )
+    except Exception as e:
+        yield "\n\n" + explanation_error_message(e, model_name)
+
+def build_generation_models(model: str = "llama-3.3-70b-versatile", fallback_models: list = None) -> list:
+    """
+    Return the model chain for code generation: the requested model followed by its fallbacks.
+    """
+    fallback_models = list(fallback_models or [
+        "gemma2-9b-it",
+        "llama-3.1-8b-instant",
+    ])
+    if model not in fallback_models:
+        fallback_models.insert(0, model)
+    return fallback_models
+
+def build_generation_prompt(
+    text: str,
+    language: str = None,
+    include_comments: bool = False,
+    optimize_for: str = "readability",
+    context_aware: bool = True
+) -> str:
+    """
+    Build the prompt used to generate code from a natural language description.
+    """
+    optimization_presets = {
+        "readability": (
+            "Prioritize clean, well-documented code with:\n"
+            "- Meaningful variable names\n"
+            "- Proper indentation\n"
+            "- Section comments\n"
+            "- Clear structure"
+        ),
+        "efficiency": (
+            "Optimize for performance with:\n"
+            "- Efficient algorithms\n"
+            "- Minimal computational complexity\n"
+            "- Memory optimization\n"
+            "- Parallelization where possible"
+        ),
+        "brevity": (
+            "Create concise code with:\n"
+            "- Minimal boilerplate\n"
+            "- Language idioms\n"
+            "- Compact syntax\n"
+            "- Removed redundancy"
+        )
+    }
+    optimize_for = optimize_for if optimize_for in optimization_presets else "readability"
+
+    prompt_sections = [
+        f"CODE GENERATION TASK: {text}",
+        f"TARGET LANGUAGE: {language or 'Auto-select'}",
+        f"OPTIMIZATION GOAL: {optimization_presets[optimize_for]}",
+        "ADDITIONAL REQUIREMENTS:",
+        f"- {'Include' if include_comments else 'Exclude'} detailed comments",
+        "- Generate production-ready code",
+        "- Use modern best practices",
+        "- Include error handling",
+        "- Output in markdown code blocks"
+    ]
+    if context_aware:
+        prompt_sections.insert(1, "CONTEXT: Generate robust code that handles edge cases and validates inputs")
+    return "\n".join(prompt_sections)
+
+async def generate_code_from_text_async(
+    text: str,
+    language: str = None,
+    model: str = "llama-3.3-70b-versatile",
+    temperature: float = 0.1,
+    max_tokens: int = 1024,
+    include_comments: bool = False,
+    optimize_for: str = "readability",
+    context_aware: bool = True,
+    fallback_models: list = None,
+    stream: bool = False
+) -> str:
+    """
+    Generates production-ready code from natural language descriptions using Groq's AI models.
+    Returns only the generated code as a string, or an error message.
+    """
+    import re
+
+    if not text or not isinstance(text, str):
+        return "❌ Invalid input: Text description must be a non-empty string."
+
+    temperature = max(0.0, min(1.0, temperature))
+    max_tokens = max(100, min(max_tokens, 8192))
+
+    fallback_models = build_generation_models(model, fallback_models)
+    prompt = build_generation_prompt(text, language, include_comments, optimize_for, context_aware)
+
+    # Hedged across the fallback chain: a slow primary is raced by the next model
+    try:
+        content = await groq_chat_hedged_async(
+            "generate_code_from_text",
+            fallback_models,
+            prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    except Exception:
+        return f"❌ All model attempts failed. Tried: {fallback_models}"
+
+    # Extract code block
+    code_blocks = re.findall(r"```(?:[a-zA-Z]+)?\n([\s\S]+?)\n```", content, re.MULTILINE)
+    if code_blocks:
+        return code_blocks[0].strip()
+    return content.strip()
+
+def generate_code_from_text(*args, **kwargs) -> str:
+    """
+    Synchronous wrapper around generate_code_from_text_async; takes the same arguments.
+    """
+    return run_sync(generate_code_from_text_async(*args, **kwargs))
+
+def stream_generate_code_from_text(
+    text: str,
+    language: str = None,
+    model: str = "llama-3.3-70b-versatile",
+    temperature: float = 0.1,
+    max_tokens: int = 1024,
+    include_comments: bool = False,
+    optimize_for: str = "readability",
+    context_aware: bool = True,
+    fallback_models: list = None
+):
+    """
+    Streaming variant of generate_code_from_text.
+    
+    Yields the raw model output as text deltas; pass the accumulated text to
+    extract_code_block(..., partial=True) to display the code while it streams.
+    
+    Yields:
+        str: Pieces of the model response, or a single error message.
+    """
+    if not text or not isinstance(text, str):
+        yield "❌ Invalid input: Text description must be a non-empty string."
+        return
+
+    temperature = max(0.0, min(1.0, temperature))
+    max_tokens = max(100, min(max_tokens, 8192))
+
+    fallback_models = build_generation_models(model, fallback_models)
+    prompt = build_generation_prompt(text, language, include_comments, optimize_for, context_aware)
+
+    try:
+        yield from groq_stream_hedged(
+            "generate_code_from_text",
+            fallback_models,
+            prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    except Exception:
+        yield f"\n❌ All model attempts failed. Tried: {fallback_models}"
+
+CODE_FLOW_TEMPLATE = register_template("generate_code_flow", """
+    You are an expert programmer who specializes in creating BEGINNER-FRIENDLY explanations.
+
+    Please generate a simple, easy-to-understand flow diagram for this Python code:
+
+    ```python
+    {code}
+    ```
+
+    Important requirements:
+    1. Make the diagram EXTREMELY beginner-friendly with clear labels
+    2. Include comments explaining what each step does
+    3. Use simple language - avoid technical jargon
+    4. Break complex operations into smaller steps
+    5. Provide the diagram ONLY in Mermaid syntax
+    6. Do not include any explanatory text outside the Mermaid code
+
+    Return ONLY the Mermaid diagram code.
+    """)
+
+async def generate_code_flow_async(code: str) -> str:
+    """
+    Generate a beginner-friendly Mermaid flow diagram from code.
+
+    Args:
+        code (str): Source code as input
+
+    Returns:
+        str: Mermaid flow diagram (no extra text)
+    """
+    # Craft the prompt
+    prompt = CODE_FLOW_TEMPLATE.render(code=code)
+
+    try:
+        # Call Groq model
+        content = await groq_chat_async(
+            "generate_code_flow",
+            "deepseek-r1-distill-llama-70b",
+            prompt,
+            temperature=0.4,
+            max_completion_tokens=4096,
+            top_p=0.95
+        )
+
+        # Extract and clean Mermaid diagram
+        content = content.strip()
+        mermaid_code = re.findall(r'```(?:mermaid)?\s*(.*?)```', content, re.DOTALL)
+
+        return mermaid_code[0].strip() if mermaid_code else content
+
+    except Exception as e:
+        return f"Error generating flow diagram: {str(e)}"
+
+def generate_code_flow(code: str) -> str:
+    """
+    Synchronous wrapper around generate_code_flow_async.
+    """
+    return run_sync(generate_code_flow_async(code))
+
+
+# Model used for the security scan
+SECURITY_SCAN_MODEL = "qwen-qwq-32b"  # Using Alibaba's QwQ 32B model
+
+SECURE_REPORT = "✅ NO SECURITY ISSUES DETECTED\n\nThe code appears to be secure. No vulnerabilities were identified in the analysis."
+
+# Order used when merging findings from several scans
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Local pre-scan: the static rules (see static_scan) run first, only the
+# regions they flag are sent to SECURITY_SCAN_MODEL to be confirmed, and the
+# rest of the code gets a quick sweep by SECURITY_SWEEP_MODEL. That is much
+# faster and cheaper than reasoning over the whole file, at the price of
+# subtle issues outside the flagged lines being more easily missed; set
+# FIXIFOX_SECURITY_PRESCAN=0 to scan everything with SECURITY_SCAN_MODEL
+SECURITY_PRESCAN = os.environ.get("FIXIFOX_SECURITY_PRESCAN", "1") != "0"
+# Non-reasoning model for the code the local rules did not flag
+SECURITY_SWEEP_MODEL = os.environ.get("FIXIFOX_SECURITY_SWEEP_MODEL", "llama-3.1-8b-instant")
+
+SECURITY_SCAN_TEMPLATE = register_template("run_security_scan", """
+    You are an expert in code security and vulnerability analysis specializing in Python.
+    
+    Analyze the following code for security vulnerabilities, including but not limited to:
+    - Injection vulnerabilities (SQL, command, etc.)
+    - Insecure cryptography
+    - Authentication issues
+    - Authorization flaws
+    - Data validation problems
+    - Hardcoded credentials
+    - Insecure file operations
+    - Race conditions
+    - Memory management issues
+    - Input validation
+    
+    ```python
+    {code}
+    ```
+    
+    For each vulnerability found:
+    1. Provide a clear description of the vulnerability
+    2. Explain why it's a security concern
+    3. Rate its severity (Critical, High, Medium, Low)
+    4. Provide a complete code example that fixes the issue
+    
+    If no security issues are found, explicitly state "NO SECURITY ISSUES DETECTED" and explain why the code appears secure.
+    
+    Format your response as JSON with the following structure:
+    {{
+        "status": "secure" or "vulnerable",
+        "issues": [
+            {{
+                "type": "vulnerability type",
+                "severity": "Critical/High/Medium/Low",
+                "description": "detailed description",
+                "explanation": "why this is a security concern",
+                "fix": "complete code fix"
+            }}
+        ]
+    }}
+    
+    If the code is secure, return an empty issues array.
+    """)
+
+CONFIRM_SECURITY_TEMPLATE = register_template("confirm_security_findings", """
+    You are an expert in code security and vulnerability analysis.
+    
+    Automated checks flagged the following lines of this code excerpt (line numbers are relative to the excerpt):
+    {findings}
+    
+    ```{fence_language}
+    {code}
+    ```
+    
+    For each flagged line, decide whether it is a real vulnerability in this context. Report only the confirmed ones,
+    plus any other clear vulnerability in these lines. Refer to lines as "Line N" of the excerpt.
+    
+    For each vulnerability:
+    1. Provide a clear description of the vulnerability
+    2. Explain why it's a security concern
+    3. Rate its severity (Critical, High, Medium, Low)
+    4. Provide a complete code example that fixes the issue
+    
+    Format your response as JSON with the following structure:
+    {{
+        "status": "secure" or "vulnerable",
+        "issues": [
+            {{
+                "type": "vulnerability type",
+                "severity": "Critical/High/Medium/Low",
+                "description": "detailed description",
+                "explanation": "why this is a security concern",
+                "fix": "complete code fix"
+            }}
+        ]
+    }}
+    
+    If none of the flagged lines is a real vulnerability, return an empty issues array.
+    """)
+
+def build_security_scan_prompt(code):
+    """
+    Build the prompt asking the model for a JSON security report on the code.
+    """
+    return SECURITY_SCAN_TEMPLATE.render(code=code)
+
+def build_confirm_findings_prompt(code, findings, programming_language=None):
+    """
+    Build the prompt asking the model to confirm local findings in a region of code.
+    
+    Args:
+        code (str): The region's code as sent.
+        findings (list): (line in the region, Finding) tuples.
+        programming_language (str, optional): Language for the code fence.
+    """
+    listing = "\n".join(f"- Line {line}: {finding.title} - {finding.message}" for line, finding in findings)
+    return CONFIRM_SECURITY_TEMPLATE.render(
+        findings=listing,
+        code=code,
+        fence_language=(programming_language or "").lower()
+    )
+
+def format_local_findings(findings):
+    """
+    Format the findings of the local pre-scan, shown while the model confirms them.
+    
+    Returns:
+        str: One line per finding, or an empty string if there are none.
+    """
+    return "\n".join(f"- Line {finding.line}: {finding.title} ({finding.severity}) - {finding.message}" for finding in findings)
+
+def format_security_report(issues):
+    """
+    Format security issues for human readability.
+    
+    Args:
+        issues (list): Issue dicts with type, severity, description, explanation,
+            fix and (for incremental scans) location keys.
+    
+    Returns:
+        str: The formatted report.
+    """
+    if not issues:
+        return SECURE_REPORT
+    
+    # Format the issues into a readable report
+    formatted_report = "🔴 SECURITY VULNERABILITIES DETECTED\n\n"
+    for i, issue in enumerate(issues, 1):
+        formatted_report += f"ISSUE #{i}: {issue.get('type')} (Severity: {issue.get('severity')})\n"
+        if issue.get('location'):
+            formatted_report += f"Location: {issue.get('location')}\n"
+        formatted_report += f"Description: {issue.get('description')}\n"
+        formatted_report += f"Explanation: {issue.get('explanation')}\n\n"
+        formatted_report += "Recommended Fix:\n```python\n{}\n```\n\n".format(issue.get('fix'))
+    
+    return formatted_report
+
+def parse_security_report(security_report):
+    """
+    Parse the model's JSON security report.
+    
+    Returns:
+        list: The issues found (empty if the code is secure), or None if the
+            response is not JSON and does not say the code is secure.
+    """
+    security_report = security_report.strip()
+    try:
+        report_data = json.loads(security_report)
+    except json.JSONDecodeError:
+        # Fallback for non-JSON responses
+        if "NO SECURITY ISSUES DETECTED" in security_report:
+            return []
+        return None
+    if report_data.get("status") == "secure":
+        return []
+    return report_data.get("issues", [])
+
+def sort_by_severity(issues):
+    """Return security issues ordered Critical, High, Medium, Low (unknown severities last)."""
+    return sorted(issues, key=lambda issue: SEVERITY_ORDER.get(str(issue.get("severity", "")).lower(), len(SEVERITY_ORDER)))
+
+def remap_issue_lines(issue, source):
+    """Point "line N" references in an issue's text fields back to the original code."""
+    return {key: source.remap_line_references(value) if isinstance(value, str) else value for key, value in issue.items()}
+
+async def _scan_text_async(text, first_line=1, programming_language=None, minify=False, model=SECURITY_SCAN_MODEL):
+    # One security-scan request; returns the raw report and the MinifiedSource (or None)
+    source = None
+    if minify:
+        source = minify_source(text, programming_language, first_line)
+        text = source.code
+    prompt = build_security_scan_prompt(text)
+    report = await groq_chat_async(
+        "run_security_scan",
+        model,
+        prompt,
+        temperature=0.2,
+        max_tokens=plan_output_tokens(model, prompt, text, ratio=SECURITY_SCAN_OUTPUT_RATIO, minimum=4000),
+        response_format={"type": "json_object"}  # Request JSON response
+    )
+    return report, source
+
+async def _scan_chunks_async(chunks, programming_language=None, minify=False, model=SECURITY_SCAN_MODEL):
+    # Scan each chunk separately and merge the findings, tagged with their location
+    results = await asyncio.gather(*[
+        _scan_text_async(chunk.text, chunk.start_line, programming_language, True, model) if minify
+        else _scan_text_async(chunk.text.strip("\n"), model=model)
+        for chunk in chunks
+    ], return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures and len(failures) == len(results):
+        raise failures[0]
+    
+    issues = []
+    notes = []
+    for chunk, result in zip(chunks, results):
+        location = f"{', '.join(chunk.names) or 'module-level code'} (lines {chunk.start_line}-{chunk.end_line})"
+        if isinstance(result, Exception):
+            notes.append(f"⚠️ Could not scan {location}: {result}")
+            continue
+        report, source = result
+        found = parse_security_report(report)
+        if found is None:
+            notes.append(f"⚠️ Unstructured findings for {location}:\n{source.remap_line_references(report.strip()) if source else report.strip()}")
+            continue
+        if source:
+            found = [remap_issue_lines(issue, source) for issue in found]
+        issues.extend({**issue, "location": location} for issue in found)
+    return issues, notes
+
+def unflagged_chunks(code, regions, definitions=None):
+    """
+    Return the parts of the code that no flagged region covers.
+    
+    Args:
+        code (str): The source code.
+        regions (list): (CodeChunk, findings) tuples from static_scan.flagged_regions.
+        definitions (list, optional): Chunks from split_for_incremental_analysis.
+            Definitions outside every region are returned whole, so their
+            scans can be served from the response cache.
+    
+    Returns:
+        list: CodeChunk objects in source order; blank parts are left out.
+    """
+    covered = set()
+    for region, _ in regions:
+        covered.update(range(region.start_line, region.end_line + 1))
+    lines = code.splitlines(keepends=True)
+    chunks = []
+    rest = set(range(1, len(lines) + 1)) - covered
+    if definitions:
+        for definition in definitions:
+            span = set(range(definition.start_line, definition.end_line + 1))
+            if not span & covered:
+                chunks.append(definition)
+                rest -= span
+    start = None
+    for number in range(1, len(lines) + 2):
+        if number in rest and start is None:
+            start = number
+        elif number not in rest and start is not None:
+            text = "".join(lines[start - 1:number - 1])
+            if text.strip():
+                chunks.append(CodeChunk(start, number - 1, text))
+            start = None
+    return sorted(chunks, key=lambda chunk: chunk.start_line)
+
+async def scan_security_issues_async(code, definitions=None, programming_language=None, minify=False):
+    """
+    Security-scan code and return the structured findings.
+    
+    With definitions, each top-level definition is scanned separately and the
+    findings are merged. Each request contains only one definition, so results
+    for definitions that did not change since the last scan are served from
+    the response cache and only edited definitions are sent to the model.
+    
+    With SECURITY_PRESCAN on, the local rules run first: only the regions
+    they flag are sent to SECURITY_SCAN_MODEL to be confirmed (see
+    confirm_local_findings_async), and the rest of the code, per definition
+    where possible, gets a quick sweep by the non-reasoning
+    SECURITY_SWEEP_MODEL. Code without risky constructs therefore never
+    waits for the reasoning model, but the sweep may miss subtle issues that
+    a full scan would find.
+    
+    Args:
+        code (str): The source code to scan.
+        definitions (list, optional): Chunks from split_for_incremental_analysis.
+        programming_language (str, optional): Language of the code, for the
+            local rules and minify; guessed when omitted.
+        minify (bool, optional): Strip comments, docstrings and blank lines
+            before sending (see minify.minify_source). Line references in the
+            findings are mapped back to the original line numbers.
+    
+    Returns:
+        tuple: (issues, notes) - the issues found, most severe first (tagged
+            with a "location" when scanned per definition or region), and
+            messages about parts that could not be scanned or returned
+            unstructured findings.
+    
+    Raises:
+        Exception: The provider error if no part of the code could be scanned.
+    """
+    if SECURITY_PRESCAN:
+        findings = scan_code(code, programming_language)
+        regions = flagged_regions(code, findings, programming_language) if findings else []
+        chunks = unflagged_chunks(code, regions, definitions)
+        if not regions:
+            # Nothing risky: only the sweep, which raises if nothing could be scanned
+            issues, notes = await _scan_chunks_async(chunks, programming_language, minify, SECURITY_SWEEP_MODEL)
+            return sort_by_severity(issues), notes
+        # Unconfirmed local findings are kept when confirming fails, so only the sweep can raise
+        confirmed, scanned = await asyncio.gather(
+            confirm_local_findings_async(regions, programming_language, minify),
+            _scan_chunks_async(chunks, programming_language, minify, SECURITY_SWEEP_MODEL),
+            return_exceptions=True
+        )
+        issues, notes = confirmed
+        if isinstance(scanned, Exception):
+            notes.append(f"⚠️ Could not scan the code outside the flagged lines: {scanned}")
+        else:
+            issues += scanned[0]
+            notes += scanned[1]
+        return sort_by_severity(issues), notes
+    
+    if not definitions:
+        security_report, source = await _scan_text_async(code, 1, programming_language, minify)
+        issues = parse_security_report(security_report)
+        if issues is None:
+            return [], [source.remap_line_references(security_report.strip()) if source else security_report.strip()]
+        if source:
+            issues = [remap_issue_lines(issue, source) for issue in issues]
+        return sort_by_severity(issues), []
+    
+    issues, notes = await _scan_chunks_async(definitions, programming_language, minify)
+    return sort_by_severity(issues), notes
+
+def _region_line(source, line):
+    # Line of the sent region holding an original line (or the next kept one)
+    return next((index for index, original in enumerate(source.line_map, 1) if original >= line), len(source.line_map))
+
+async def confirm_local_findings_async(regions, programming_language=None, minify=False):
+    """
+    Let the model confirm the findings of the local security rules.
+    
+    One request is sent per region. If a region cannot be confirmed, its
+    local findings are reported as unconfirmed.
+    
+    Args:
+        regions (list): (CodeChunk, findings) tuples from static_scan.flagged_regions.
+        programming_language (str, optional): Language of the code.
+        minify (bool, optional): Strip comments and docstrings from the regions before sending.
+    
+    Returns:
+        tuple: (issues, notes) as for scan_security_issues_async, unsorted.
+    """
+    async def confirm(region, region_findings):
+        if minify:
+            source = minify_source(region.text, programming_language, region.start_line)
+        else:
+            source = MinifiedSource(region.text, list(range(region.start_line, region.end_line + 1)))
+        prompt = build_confirm_findings_prompt(
+            source.code,
+            [(_region_line(source, finding.line), finding) for finding in region_findings],
+            programming_language
+        )
+        report = await groq_chat_async(
+            "confirm_security_findings",
+            SECURITY_SCAN_MODEL,
+            prompt,
+            temperature=0.2,
+            max_tokens=plan_output_tokens(SECURITY_SCAN_MODEL, prompt, source.code, ratio=SECURITY_SCAN_OUTPUT_RATIO, minimum=2000),
+            response_format={"type": "json_object"}
+        )
+        return report, source
+    
+    results = await asyncio.gather(*[confirm(region, region_findings) for region, region_findings in regions], return_exceptions=True)
+    
+    issues = []
+    notes = []
+    for (region, region_findings), result in zip(regions, results):
+        location = f"{', '.join(region.names) or 'code'} (lines {region.start_line}-{region.end_line})"
+        found = None
+        if isinstance(result, Exception):
+            notes.append(f"⚠️ Could not confirm the local findings in {location}: {result}")
+        else:
+            report, source = result
+            found = parse_security_report(report)
+            if found is None:
+                notes.append(f"⚠️ Unstructured findings for {location}:\n{source.remap_line_references(report.strip())}")
+            else:
+                found = [remap_issue_lines(issue, source) for issue in found]
+        if found is None:
+            found = [
+                {**finding.as_issue(), "explanation": f"{finding.as_issue()['explanation']} (not confirmed by the model)"}
+                for finding in region_findings
+            ]
+        issues.extend({**issue, "location": location} for issue in found)
+    return issues, notes
+
+async def run_security_scan_async(code, minify=False, programming_language=None):
+    """
+    Run a comprehensive security scan on the provided code using AI.
+    
+    Args:
+        code (str): The source code to scan
+        minify (bool, optional): Strip comments, docstrings and blank lines
+            before sending to save tokens. Defaults to False.
+        programming_language (str, optional): Language of the code; guessed
+            by the local rules and the chunking when omitted.
+        
+    Returns:
+        dict: A structured security scan report containing:
+            - status: "secure" or "vulnerable"
+            - issues: List of identified vulnerabilities (empty if none found)
+            - fixes: Suggested code fixes for each vulnerability
+            - explanation: Detailed explanation of each issue
+    """
+    definitions = split_for_incremental_analysis(code, programming_language)
+    try:
+        issues, notes = await scan_security_issues_async(code, definitions, programming_language, minify)
+    except Exception as e:
+        return f"❌ ERROR DURING SECURITY SCAN: {str(e)}\n\nPlease check your code format and try again."
+    
+    if not definitions and not issues and notes:
+        # The model did not answer in JSON, or part of the code was not
+        # scanned: show that as is rather than a clean report
+        return "\n\n".join(notes)
+    report = format_security_report(issues)
+    if notes:
+        report += "\n\n" + "\n\n".join(notes)
+    return report
+
+def run_security_scan(code, minify=False, programming_language=None):
+    """
+    Synchronous wrapper around run_security_scan_async.
+    """
+    return run_sync(run_security_scan_async(code, minify, programming_language))
+    
+    
+# Model used for "Fix the code"
+FIX_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"  # Changed from qwen-2.5-coder-32b
+
+# Files with at least this many lines are fixed with patches instead of a full rewrite
+FIX_PATCH_MIN_LINES = int(os.environ.get("FIXIFOX_FIX_PATCH_MIN_LINES", "150"))
+
+FIX_TEMPLATE = register_template("get_fixed_code_with_groq", """
+    You are an expert programmer proficient in multiple programming languages.
+    
+    I need you to fix and secure the following code:
+    
+    ```python
+    {code}
+    ```
+    
+    Please provide only the fixed and secure code without any explanations or comments.
+    Make sure to preserve the functionality and logic of the original code.
+    Use idiomatic Python patterns and best practices.
+    """)
+
+def build_fix_prompt(code):
+    """
+    Build the prompt asking the model to fix and secure the given code.
+    """
+    return FIX_TEMPLATE.render(code=code)
+
+FIX_PATCH_TEMPLATE = register_template("get_fixed_code_with_patches", """
+    You are an expert programmer proficient in multiple programming languages.
+    
+    I need you to fix and secure the following code:
+    
+    ```python
+    {code}
+    ```
+    
+    The file is long, so do NOT return the whole file. Return only the changes, as one or
+    more SEARCH/REPLACE blocks in exactly this format:
+    
+    <<<<<<< SEARCH
+    exact lines copied from the original code, with their indentation
+    =======
+    the lines that replace them
+    >>>>>>> REPLACE
+    
+    Include just enough unchanged lines in each SEARCH section to make it unique.
+    Make sure to preserve the functionality and logic of the original code.
+    If the code needs no changes, reply with NO CHANGES.
+    """)
+
+def build_fix_patch_prompt(code):
+    """
+    Build the prompt asking the model to fix the given code by returning only
+    SEARCH/REPLACE blocks for the lines that change.
+    """
+    return FIX_PATCH_TEMPLATE.render(code=code)
+
+def use_fix_patch_mode(code):
+    """
+    Whether "Fix the code" should ask for patches instead of the whole file.
+    """
+    return len(code.splitlines()) >= FIX_PATCH_MIN_LINES
+
+async def get_fixed_code_with_patches_async(code):
+    """
+    Fix a large file by asking for SEARCH/REPLACE hunks and applying them locally.
+    
+    Output tokens (and latency) scale with the size of the fix rather than the
+    size of the file.
+    
+    Args:
+        code (str): The source code to fix
+        
+    Returns:
+        str: The fixed code
+    
+    Raises:
+        PatchError: If the patch could not be applied.
+        Exception: The provider error if the patch could not be obtained.
+    """
+    prompt = build_fix_patch_prompt(code)
+    
+    patch = await groq_chat_async(
+        "get_fixed_code_with_patches",
+        FIX_MODEL,
+        prompt,
+        temperature=0.2,
+        max_tokens=plan_output_tokens(FIX_MODEL, prompt, code, ratio=FIX_PATCH_OUTPUT_RATIO, minimum=1024)
+    )
+    if "NO CHANGES" in patch and "SEARCH" not in patch:
+        return code
+    return apply_patch(code, patch)
+
+async def get_fixed_code_with_groq_async(code):
+    """
+    Get fixed and secure code using Groq API.
+    
+    Args:
+        code (str): The source code to fix
+        
+    Returns:
+        str: The fixed and secure code or error message
+    """
+    model = FIX_MODEL
+    
+    patch_error = None
+    if use_fix_patch_mode(code):
+        try:
+            return await get_fixed_code_with_patches_async(code)
+        except Exception as e:
+            # Fall back to a full-file fix; the reason is reported if that fails too
+            patch_error = e
+    
+    prompt = build_fix_prompt(code)
+    
+    try:
+        fixed_code = (await groq_chat_async(
+            "get_fixed_code_with_groq",
+            model,
+            prompt,
+            temperature=0.2,
+            max_tokens=plan_output_tokens(model, prompt, code, ratio=FIX_OUTPUT_RATIO)
+        )).strip()
+        
+        # Clean up the response to extract just the code if it contains markdown
+        if "```" in fixed_code:
+            # Extract code between markdown code blocks
+            import re
+            code_blocks = re.findall(r'```(?:\w+)?\n(.*?)```', fixed_code, re.DOTALL)
+            if code_blocks:
+                fixed_code = code_blocks[0].strip()
+        
+        return fixed_code
+    
+    except Exception as e:
+        if patch_error is not None:
+            return f"Error during code fixing: {e} (patch mode failed first: {patch_error})"
+        return f"Error during code fixing: {e}"
+
+def get_fixed_code_with_groq(code):
+    """
+    Synchronous wrapper around get_fixed_code_with_groq_async.
+    """
+    return run_sync(get_fixed_code_with_groq_async(code))
+
+def stream_fixed_code_with_groq(code):
+    """
+    Streaming variant of get_fixed_code_with_groq.
+    
+    Args:
+        code (str): The source code to fix
+        
+    Yields:
+        str: Pieces of the raw model response (use extract_code_block on the
+            accumulated text), or an error message.
+    """
+    prompt = build_fix_prompt(code)
+    
+    try:
+        yield from groq_stream(
+            "get_fixed_code_with_groq",
+            FIX_MODEL,
+            prompt,
+            temperature=0.2,
+            max_tokens=plan_output_tokens(FIX_MODEL, prompt, code, ratio=FIX_OUTPUT_RATIO)
+        )
+    except Exception as e:
+        yield f"\nError during code fixing: {e}"
+
+# Models used for code conversion, in preference order
+CONVERSION_MODELS = [
+    "qwen-qwq-32b",  # Primary model as requested
+    "gemma2-9b-it"   # Secondary model as requested
+]
+
+CONVERSION_TEMPLATE = register_template("convert_code_language", """
+    You are an expert programmer proficient in multiple programming languages.
+    
+    I need you to convert the following {source_language} code to {target_language}.
+    
+    ```{fence_language}
+    {code}
+    ```
+    
+    Please provide only the converted {target_language} code without any explanations or comments.
+    Make sure to preserve the functionality and logic of the original code.
+    Use idiomatic {target_language} patterns and best practices.
+    
+    IMPORTANT: Return ONLY the code, no markdown code blocks, no explanations.
+    """)
+
+def build_conversion_prompt(code, source_language, target_language):
+    """
+    Build the prompt asking the model to convert code between languages.
+    """
+    return CONVERSION_TEMPLATE.render(code=code, source_language=source_language, target_language=target_language, fence_language=source_language.lower())
+
+def clean_converted_code(converted_code, target_language):
+    """
+    Strip markdown fences and stray headers from a conversion response.
+    
+    Args:
+        converted_code (str): The raw model response
+        target_language (str): The target language of the conversion
+        
+    Returns:
+        str: Just the converted code
+    """
+    converted_code = converted_code.strip()
+    
+    # Clean up the response to extract just the code if it contains markdown
+    if "```" in converted_code:
+        # Extract code between markdown code blocks
+        code_blocks = re.findall(r'```(?:\w+)?\n(.*?)```', converted_code, re.DOTALL)
+        if code_blocks:
+            converted_code = code_blocks[0].strip()
+        else:
+            # If we can't find code blocks with language specification, try without it
+            code_blocks = re.findall(r'```\n?(.*?)```', converted_code, re.DOTALL)
+            if code_blocks:
+                converted_code = code_blocks[0].strip()
+    
+    # Further cleanup: remove any remaining tags or headers
+    converted_code = re.sub(r'^#.*\n?', '', converted_code, flags=re.MULTILINE)
+    
+    # If the code still starts with language name or comments about the language, remove them
+    if converted_code.lower().startswith(target_language.lower()):
+        converted_code = re.sub(f'^{target_language.lower()}.*\n', '', converted_code, flags=re.IGNORECASE)
+    
+    return converted_code
+
+def _conversion_output_tokens(prompt, code):
+    # Planned for the largest context window in the chain; the hedged call
+    # clamps it for (or skips) the models with less room
+    return plan_output_tokens(max(CONVERSION_MODELS, key=context_window), prompt, code, ratio=CONVERSION_OUTPUT_RATIO)
+
+async def convert_code_language_async(code, source_language, target_language, minify=False):
+    """
+    Convert code from one programming language to another using Groq API.
+    
+    Args:
+        code (str): The source code to convert
+        source_language (str): The language of the source code
+        target_language (str): The target language to convert to
+        minify (bool, optional): Strip comments, docstrings and blank lines
+            before sending to save tokens. Defaults to False.
+        
+    Returns:
+        str: The converted code or error message
+    """
+    if minify:
+        code = minify_source(code, source_language).code
+    prompt = build_conversion_prompt(code, source_language, target_language)
+    
+    # Race the models with hedged requests instead of waiting for each to fail
+    try:
+        converted_code = await groq_chat_hedged_async(
+            "convert_code_language",
+            CONVERSION_MODELS,
+            prompt,
+            temperature=0.2,
+            max_tokens=_conversion_output_tokens(prompt, code)
+        )
+    except Exception as e:
+        print(f"Code conversion failed: {e}")
+        return f"Error during code conversion: {e}"
+    
+    print("Code conversion successful")
+    
+    return clean_converted_code(converted_code, target_language)
+
+def convert_code_language(code, source_language, target_language, minify=False):
+    """
+    Synchronous wrapper around convert_code_language_async.
+    """
+    return run_sync(convert_code_language_async(code, source_language, target_language, minify))
+
+def stream_convert_code_language(code, source_language, target_language, minify=False):
+    """
+    Streaming variant of convert_code_language.
+    
+    Yields the raw model output; pass the accumulated text to
+    extract_code_block(..., partial=True) while streaming and to
+    clean_converted_code once it is complete.
+    
+    Yields:
+        str: Pieces of the model response, or an error message.
+    """
+    if minify:
+        code = minify_source(code, source_language).code
+    prompt = build_conversion_prompt(code, source_language, target_language)
+    
+    try:
+        yield from groq_stream_hedged(
+            "convert_code_language",
+            CONVERSION_MODELS,
+            prompt,
+            temperature=0.2,
+            max_tokens=_conversion_output_tokens(prompt, code)
+        )
+    except Exception as e:
+        print(f"Code conversion failed: {e}")
+        yield f"\nError during code conversion: {e}"
+
+async def analyze_project_file_async(code, language, explain=False, fix=False, minify=False):
+    """
+    Security-scan one file of an uploaded project, optionally explaining and fixing it too.
+    
+    Args:
+        code (str): The file's source code.
+        language (str): Its programming language.
+        explain (bool, optional): Also explain the file. Defaults to False.
+        fix (bool, optional): Also fix the file. Defaults to False.
+        minify (bool, optional): Strip comments before the security scan. Defaults to False.
+    
+    Returns:
+        dict: "issues" and "notes" from scan_security_issues_async, plus
+            "explanation" and "fixed_code" when requested.
+    """
+    analyses = [scan_security_issues_async(code, split_for_incremental_analysis(code, language), language, minify)]
+    if explain:
+        analyses.append(explain_code_with_gemini_async(code, programming_language=language))
+    if fix:
+        analyses.append(get_fixed_code_with_groq_async(code))
+    results = await asyncio.gather(*analyses)
+    
+    issues, notes = results[0]
+    analysis = {"issues": issues, "notes": notes}
+    if explain:
+        analysis["explanation"] = results[1]
+    if fix:
+        analysis["fixed_code"] = results[-1]
+    return analysis
+
+def format_project_report(file_results):
+    """
+    Combine the per-file results of a project scan into one security report.
+    
+    Args:
+        file_results (list): FileResult objects whose result comes from analyze_project_file_async.
+    
+    Returns:
+        str: Every file's issues in one list, most severe first, followed by
+            the files that could not be scanned.
+    """
+    issues = []
+    notes = []
+    for file_result in file_results:
+        if file_result.error:
+            notes.append(f"⚠️ Could not scan {file_result.path}: {file_result.error}")
+            continue
+        for issue in file_result.result["issues"]:
+            location = f"{file_result.path}: {issue['location']}" if issue.get("location") else file_result.path
+            issues.append({**issue, "location": location})
+        notes.extend(f"⚠️ {file_result.path}: {note}" for note in file_result.result["notes"])
+    
+    report = format_security_report(sort_by_severity(issues))
+    if notes:
+        report += "\n\n" + "\n\n".join(notes)
+    return report
+
+def build_assistant_prompt(
+    code: str,
+    question: str,
+    expertise_level: str = "beginner",
+    include_examples: bool = True,
+    language: str = None
+) -> str:
+    """
+    Build the prompt for the AI debugging assistant.
+    """
+    expertise_instructions = {
+        "beginner": (
+            "- Use simple explanations and define technical terms.\n"
+            "- Break down solutions step by step.\n"
+            "- Avoid jargon unless explained.\n"
+            "- Encourage and be friendly."
+        ),
+        "intermediate": (
+            "- Balance explanation and practical solutions.\n"
+            "- Suggest best practices and patterns."
+        ),
+        "expert": (
+            "- Focus on concise, efficient solutions.\n"
+            "- Discuss trade-offs and optimizations."
+        )
+    }
+    instructions = expertise_instructions.get(expertise_level, expertise_instructions["beginner"])
+    language_hint = f"The code is written in {language}." if language else "Please identify the programming language."
+    example_instruction = "Include 1-2 clear examples." if include_examples else ""
+
+    return (
+        f"You are an expert AI code assistant.\n\n"
+        f"CODE:\n{code}\n\n"
+        f"QUESTION:\n{question}\n\n"
+        f"{language_hint}\n\n"
+        f"INSTRUCTIONS:\n"
+        f"- Tailor your help for a {expertise_level} programmer.\n"
+        f"- {example_instruction}\n"
+        f"- Identify the issue clearly.\n"
+        f"- Explain solutions simply.\n"
+        f"- Show corrected code if needed.\n"
+        f"{instructions}\n"
+    )
+
+def assistant_error_message(error) -> str:
+    """
+    Turn a provider error into a friendly assistant message.
+    """
+    kind = classify_error(error)
+    if kind == ErrorKind.TIMEOUT:
+        return "The AI assistant timed out. Try simplifying your code or question."
+    elif kind == ErrorKind.CONTEXT_LENGTH:
+        return "Your code is too large. Please provide a smaller snippet."
+    elif kind in (ErrorKind.NOT_FOUND, ErrorKind.CIRCUIT_OPEN):
+        return "The selected AI model is unavailable. Try again later."
+    return f"AI assistant error: {error}"
+
+async def get_ai_assistant_response_async(
+    code: str,
+    question: str,
+    expertise_level: str = "beginner",
+    model: str = "meta-llama/llama-4-scout-17b-16e-instruct",
+    include_examples: bool = True,
+    language: str = None,
+    temperature: float = 0.7,
+    max_tokens: int = 1024
+) -> str:
+    """
+    Provides AI-powered code assistance for debugging and explanation.
+
+    Args:
+        code (str): The code to analyze.
+        question (str): The user's question or issue.
+        expertise_level (str): "beginner", "intermediate", or "expert".
+        model (str): Model name for Groq API.
+        include_examples (bool): Whether to include examples.
+        language (str): Programming language (optional).
+        temperature (float): Model creativity.
+        max_tokens (int): Max tokens for response.
+
+    Returns:
+        str: AI assistant's response or error message.
+    """
+    prompt = build_assistant_prompt(code, question, expertise_level, include_examples, language)
+
+    try:
+        response = await groq_chat_async(
+            "get_ai_assistant_response",
+            model,
+            prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.strip()
+    except Exception as e:
+        return assistant_error_message(e)
+
+def get_ai_assistant_response(*args, **kwargs) -> str:
+    """
+    Synchronous wrapper around get_ai_assistant_response_async; takes the same arguments.
+    """
+    return run_sync(get_ai_assistant_response_async(*args, **kwargs))
+
+def stream_ai_assistant_response(
+    code: str,
+    question: str,
+    expertise_level: str = "beginner",
+    model: str = "meta-llama/llama-4-scout-17b-16e-instruct",
+    include_examples: bool = True,
+    language: str = None,
+    temperature: float = 0.7,
+    max_tokens: int = 1024
+):
+    """
+    Streaming variant of get_ai_assistant_response.
+
+    Yields:
+        str: Pieces of the assistant's response, or an error message.
+    """
+    prompt = build_assistant_prompt(code, question, expertise_level, include_examples, language)
+
+    try:
+        yield from groq_stream(
+            "get_ai_assistant_response",
+            model,
+            prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    except Exception as e:
+        yield "\n\n" + assistant_error_message(e)
@@ -1,14 +1,57 @@
 import os
-from groq import Groq
-import google.generativeai as genai
 import streamlit as st
 from dotenv import load_dotenv
-import google.generativeai as genai
 import sqlite3
 import hashlib
 import re
+import time
+import difflib
+import subprocess
 from datetime import datetime
-import os
+from concurrent.futures import as_completed
+from llm_clients import configure_clients, start_prewarm
+from providers import groq_stream_hedged
+from async_runtime import submit
+from code_blocks import extract_code_block, extract_code_blocks
+from analysis import (
+    highlight_code_terms,
+    split_for_incremental_analysis,
+    explain_code_with_gemini_async,
+    stream_explain_code_with_gemini,
+    stream_generate_code_from_text,
+    generate_code_flow_async,
+    generate_code_flow,
+    SECURITY_PRESCAN,
+    SECURITY_SCAN_MODEL,
+    SECURITY_SWEEP_MODEL,
+    format_local_findings,
+    run_security_scan_async,
+    run_security_scan,
+    use_fix_patch_mode,
+    get_fixed_code_with_groq_async,
+    get_fixed_code_with_groq,
+    stream_fixed_code_with_groq,
+    clean_converted_code,
+    stream_convert_code_language,
+    analyze_project_file_async,
+    format_project_report,
+    stream_ai_assistant_response,
+)
+from static_scan import scan_code
+from local_checks import run_local_checks
+from sandbox import SANDBOX_TIMEOUT, can_run_locally, run_code, prewarm_sandbox
+import tracer
+import profiler
+import benchmark
+from sandbox_pool import SandboxBusyError, sandbox_pool_stats
+from batch_processing import BATCH_MAX_WORKERS, SOURCE_EXTENSIONS, iter_uploaded_sources, run_batch
+from token_budget import get_token_estimator
+from prompt_templates import template_stats
+from stream_renderer import StreamRenderer, get_render_stats
+from resilience import circuit_states
+from rate_limiter import set_current_user, get_admission_controller
+from response_cache import get_response_cache
+from single_flight import get_single_flight
 
 # Load environment variables
 load_dotenv()
@@ -92,225 +135,6 @@ def is_strong_password(password):
         return False, "Password must include at least one number"
     return True, "Password is strong"
 
-def explain_code_with_gemini(
-    code: str, 
-    is_error: bool = False,
-    programming_language: str = None,
-    detail_level: str = "beginner",
-    highlight_important_parts: bool = True,
-    include_examples: bool = True,
-    include_diagrams: bool = False,
-    model_name: str = 'gemini-2.0-flash'
-) -> str:
-    """
-    Explains code or error messages in a beginner-friendly way using Google's Gemini model.
-    
-    Args:
-        code (str): The code or error message to explain.
-        is_error (bool, optional): Whether the input is an error message. Defaults to False.
-        programming_language (str, optional): The programming language of the code. 
-            This helps the model provide more accurate explanations. Defaults to None (auto-detect).
-        detail_level (str, optional): Level of explanation detail - "beginner", "intermediate", or "advanced".
-            Defaults to "beginner".
-        highlight_important_parts (bool, optional): Whether to highlight important parts of the code.
-            Defaults to True.
-        include_examples (bool, optional): Whether to include simple examples. Defaults to True.
-        include_diagrams (bool, optional): Whether to request ascii/markdown diagrams for visual learners.
-            Defaults to False.
-        model_name (str, optional): The Gemini model to use. Defaults to 'gemini-2.0-flash'.
-    
-    Returns:
-        str: Beginner-friendly explanation or error message.
-    """
-    # Configure the model
-    try:
-        model = genai.GenerativeModel(model_name)
-    except Exception as model_error:
-        return f"Error initializing Gemini model: {model_error}. Please check your API key and model name."
-    
-    # Set language detection part
-    language_part = ""
-    if programming_language:
-        language_part = f"This is {programming_language} code."
-    else:
-        language_part = "Please identify what programming language this is before explaining it."
-    
-    # Configure detail level
-    detail_configs = {
-        "beginner": {
-            "style": "Use simple language as if explaining to someone with no programming experience. Define all technical terms.",
-            "format": "Break down the explanation into small, easy-to-understand sections.",
-            "depth": "Focus on the basic purpose of each line, avoiding complex concepts unless necessary."
-        },
-        "intermediate": {
-            "style": "Use straightforward explanations assuming basic programming knowledge.",
-            "format": "Organize the explanation by logical components or functions.",
-            "depth": "Include explanations of common patterns and programming concepts."
-        },
-        "advanced": {
-            "style": "Use technical language assuming substantial programming experience.",
-            "format": "Focus on non-obvious aspects and design decisions.",
-            "depth": "Include performance considerations and alternative approaches."
-        }
-    }
-    
-    detail_config = detail_configs.get(detail_level, detail_configs["beginner"])
-    
-    # Configure highlighting
-    highlight_part = ""
-    if highlight_important_parts:
-        highlight_part = """
-        Highlight important parts of the code by:
-        1. **Bolding key variables, functions, and control structures**
-        2. Explaining critical lines with 💡 emoji at the start
-        3. Flagging potential issues with ⚠️ emoji
-        4. Using bullet points for step-by-step explanations
-        """
-    
-    # Configure examples
-    examples_part = ""
-    if include_examples:
-        examples_part = """
-        Include 1-2 simple, concrete examples showing how the code works with specific inputs and outputs.
-        For errors, show a corrected version of the code.
-        """
-    
-    # Configure diagrams
-    diagram_part = ""
-    if include_diagrams:
-        diagram_part = """
-        Include a simple ASCII or markdown diagram to visually explain the code flow or data structures
-        when it would help understanding.
-        """
-    
-    # Create prompt based on whether it's code or an error
-    if is_error:
-        prompt = f"""Explain the following error message in a very beginner-friendly way:
-        
-        ERROR:
-        ```
-        {code}
-        ```
-        
-        {language_part}
-        
-        EXPLANATION GUIDELINES:
-        - Start with a simple explanation of what went wrong in plain English
-        - Explain exactly which part of the code caused the error
-        - Suggest 2-3 specific ways to fix the error
-        - {detail_config['style']}
-        - {detail_config['format']}
-        - {detail_config['depth']}
-        {highlight_part}
-        {examples_part}
-        {diagram_part}
-        
-        Conclude with a one-sentence summary of what the programmer should remember to avoid this error in the future.
-        """
-    else:
-        prompt = f"""Explain the following code in a very beginner-friendly way:
-        
-        CODE:
-        ```
-        {code}
-        ```
-        
-        {language_part}
-        
-        EXPLANATION GUIDELINES:
-        - Start with a simple overview of what this code does in 1-2 sentences
-        - Then walk through the code step-by-step
-        - Explain the purpose of each major section
-        - {detail_config['style']}
-        - {detail_config['format']}
-        - {detail_config['depth']}
-        {highlight_part}
-        {examples_part}
-        {diagram_part}
-        
-        Conclude with a bullet list summary of key concepts demonstrated in this code.
-        """
-    
-    # Safety timeout and retry mechanism
-    import time
-    start_time = time.time()
-    max_retries = 2
-    retries = 0
-    
-    while retries <= max_retries:
-        try:
-            # Configure model parameters
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                }
-            ]
-            
-            generation_config = {
-                "temperature": 0.2,  # Lower for more accurate explanations
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-            
-            # Generate response with enhanced parameters
-            response = model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            
-            # Check if we have content
-            if hasattr(response, 'text') and response.text:
-                # Process the response to enhance formatting
-                explanation = response.text
-                
-                # Add syntax highlighting markers if not present but requested
-                if highlight_important_parts and "**" not in explanation:
-                    import re
-                    # Find code-like patterns and add bold formatting
-                    code_pattern = r'\b([a-zA-Z_][a-zA-Z0-9_]*\(|\bif\b|\bfor\b|\bwhile\b|\bdef\b|\bclass\b|\breturn\b|\bimport\b)'
-                    explanation = re.sub(code_pattern, r'**\1**', explanation)
-                
-                return explanation
-            else:
-                raise Exception("Empty response received")
-                
-        except Exception as retry_error:
-            error_message = str(retry_error).lower()
-            retries += 1
-            
-            # Handle specific error types
-            if "rate" in error_message and retries <= max_retries:
-                time.sleep(2)  # Wait before retry
-            elif "timeout" in error_message and retries <= max_retries:
-                time.sleep(1)  # Wait before retry
-            else:
-                # If we've exhausted retries or hit a different error
-                if time.time() - start_time > 30:
-                    return "The explanation is taking too long to generate. Your code might be very complex. Try sharing a smaller portion of the code."
-                elif "token" in error_message:
-                    return "The code is too large to explain in one go. Please share a smaller snippet or break it into logical parts."
-                elif "model" in error_message:
-                    return f"The Gemini model '{model_name}' is currently unavailable. Try again later or try using 'gemini-1.5-pro' instead."
-                else:
-                    return f"Could not generate an explanation: {str(retry_error)}. Please try again with a simpler code snippet."
-    
-    # Fallback for exhausted retries
-    return "Unable to generate explanation after multiple attempts. Please try again later or with a different code sample."
 
 # Set API keys from environment variable
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
@@ -320,10 +144,15 @@ if not GROQ_API_KEY or not GOOGLE_API_KEY:
     st.error("⚠️ API keys for Groq and Gemini are required. Please set them as Streamlit secrets.")
     st.stop()
 
-# Initialize clients
+# Initialize clients once per process; every session and rerun shares them
+@st.cache_resource(show_spinner=False)
+def init_llm_clients():
+    configure_clients(groq_api_key=GROQ_API_KEY, google_api_key=GOOGLE_API_KEY)
+    start_prewarm()
+    return True
+
 try:
-    groq_client = Groq(api_key=GROQ_API_KEY)
-    genai.configure(api_key=GOOGLE_API_KEY)
+    init_llm_clients()
 except Exception as e:
     st.error(f"Error initializing API clients: {e}")
     st.stop()
@@ -1225,406 +1054,244 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-def generate_code_from_text(
-    text: str,
-    language: str = None,
-    model: str = "llama-3.3-70b-versatile",
-    temperature: float = 0.1,
-    max_tokens: int = 1024,
-    include_comments: bool = False,
-    optimize_for: str = "readability",
-    context_aware: bool = True,
-    fallback_models: list = None,
-    stream: bool = False
-) -> str:
-    """
-    Generates production-ready code from natural language descriptions using Groq's AI models.
-    Returns only the generated code as a string, or an error message.
-    """
-    from groq import Groq
-    import re
-
-    if not text or not isinstance(text, str):
-        return "❌ Invalid input: Text description must be a non-empty string."
-
-    temperature = max(0.0, min(1.0, temperature))
-    max_tokens = max(100, min(max_tokens, 8192))
-
-    fallback_models = fallback_models or [
-        "gemma2-9b-it",
-        "llama-3.1-8b-instant",
-    ]
-    if model not in fallback_models:
-        fallback_models.insert(0, model)
-
-    optimization_presets = {
-        "readability": (
-            "Prioritize clean, well-documented code with:\n"
-            "- Meaningful variable names\n"
-            "- Proper indentation\n"
-            "- Section comments\n"
-            "- Clear structure"
-        ),
-        "efficiency": (
-            "Optimize for performance with:\n"
-            "- Efficient algorithms\n"
-            "- Minimal computational complexity\n"
-            "- Memory optimization\n"
-            "- Parallelization where possible"
-        ),
-        "brevity": (
-            "Create concise code with:\n"
-            "- Minimal boilerplate\n"
-            "- Language idioms\n"
-            "- Compact syntax\n"
-            "- Removed redundancy"
-        )
-    }
-    optimize_for = optimize_for if optimize_for in optimization_presets else "readability"
-
-    prompt_sections = [
-        f"CODE GENERATION TASK: {text}",
-        f"TARGET LANGUAGE: {language or 'Auto-select'}",
-        f"OPTIMIZATION GOAL: {optimization_presets[optimize_for]}",
-        "ADDITIONAL REQUIREMENTS:",
-        f"- {'Include' if include_comments else 'Exclude'} detailed comments",
-        "- Generate production-ready code",
-        "- Use modern best practices",
-        "- Include error handling",
-        "- Output in markdown code blocks"
-    ]
-    if context_aware:
-        prompt_sections.insert(1, "CONTEXT: Generate robust code that handles edge cases and validates inputs")
-    prompt = "\n".join(prompt_sections)
-
-    client = Groq()
-    models_tried = []
-
-    for current_model in fallback_models:
-        models_tried.append(current_model)
-        try:
-            completion = client.chat.completions.create(
-                model=current_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            content = completion.choices[0].message.content
-            # Extract code block
-            code_blocks = re.findall(r"```(?:[a-zA-Z]+)?\n([\s\S]+?)\n```", content, re.MULTILINE)
-            if code_blocks:
-                return code_blocks[0].strip()
-            return content.strip()
-        except Exception as e:
-            continue
-
-    return f"❌ All model attempts failed. Tried: {models_tried}"
 
-def generate_code_flow(code: str) -> str:
+def render_markdown_stream(deltas):
     """
-    Generate a beginner-friendly Mermaid flow diagram from code.
-
-    Args:
-        code (str): Source code as input
-
+    Render a stream of markdown deltas as they arrive.
+    
     Returns:
-        str: Mermaid flow diagram (no extra text)
+        tuple: (full text, StreamRenderer holding the rendered output)
     """
-    # Initialize the Groq client
-    groq_client = Groq()
-
-    # Craft the prompt
-    prompt = f"""
-    You are an expert programmer who specializes in creating BEGINNER-FRIENDLY explanations.
-
-    Please generate a simple, easy-to-understand flow diagram for this Python code:
-
-    ```python
-    {code}
-    ```
+    renderer = StreamRenderer(mode="markdown")
+    return renderer.render(deltas), renderer
 
-    Important requirements:
-    1. Make the diagram EXTREMELY beginner-friendly with clear labels
-    2. Include comments explaining what each step does
-    3. Use simple language - avoid technical jargon
-    4. Break complex operations into smaller steps
-    5. Provide the diagram ONLY in Mermaid syntax
-    6. Do not include any explanatory text outside the Mermaid code
-
-    Return ONLY the Mermaid diagram code.
+def render_code_stream(deltas, language='python'):
     """
-
-    try:
-        # Call Groq model
-        response = groq_client.chat.completions.create(
-            model="deepseek-r1-distill-llama-70b",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-            max_completion_tokens=4096,
-            top_p=0.95,
-            stream=False
-        )
-
-        # Extract and clean Mermaid diagram
-        content = response.choices[0].message.content.strip()
-        mermaid_code = re.findall(r'```(?:mermaid)?\s*(.*?)```', content, re.DOTALL)
-
-        return mermaid_code[0].strip() if mermaid_code else content
-
-    except Exception as e:
-        return f"Error generating flow diagram: {str(e)}"
-
-
-def run_security_scan(code):
-    """
-    Run a comprehensive security scan on the provided code using AI.
+    Render a streaming model response as a code block, showing the code
+    inside the first markdown fence while it is still being written.
     
-    Args:
-        code (str): The source code to scan
-        
     Returns:
-        dict: A structured security scan report containing:
-            - status: "secure" or "vulnerable"
-            - issues: List of identified vulnerabilities (empty if none found)
-            - fixes: Suggested code fixes for each vulnerability
-            - explanation: Detailed explanation of each issue
+        tuple: (full raw response, StreamRenderer holding the rendered code)
     """
-    from groq import Groq
-    client = Groq()
-    
-    model = "qwen-qwq-32b"  # Using Alibaba's QwQ 32B model
-    
-    prompt = f"""
-    You are an expert in code security and vulnerability analysis specializing in Python.
-    
-    Analyze the following code for security vulnerabilities, including but not limited to:
-    - Injection vulnerabilities (SQL, command, etc.)
-    - Insecure cryptography
-    - Authentication issues
-    - Authorization flaws
-    - Data validation problems
-    - Hardcoded credentials
-    - Insecure file operations
-    - Race conditions
-    - Memory management issues
-    - Input validation
-    
-    ```python
-    {code}
-    ```
-    
-    For each vulnerability found:
-    1. Provide a clear description of the vulnerability
-    2. Explain why it's a security concern
-    3. Rate its severity (Critical, High, Medium, Low)
-    4. Provide a complete code example that fixes the issue
-    
-    If no security issues are found, explicitly state "NO SECURITY ISSUES DETECTED" and explain why the code appears secure.
-    
-    Format your response as JSON with the following structure:
-    {{
-        "status": "secure" or "vulnerable",
-        "issues": [
-            {{
-                "type": "vulnerability type",
-                "severity": "Critical/High/Medium/Low",
-                "description": "detailed description",
-                "explanation": "why this is a security concern",
-                "fix": "complete code fix"
-            }}
-        ]
-    }}
-    
-    If the code is secure, return an empty issues array.
+    renderer = StreamRenderer(mode="code", language=language)
+    return renderer.render(deltas), renderer
+
+def show_incremental_analysis_note(feature, code, programming_language=None):
     """
+    Show how many definitions changed since the last incremental analysis.
     
-    try:
-        # Make API call to the model using the setup provided
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            max_tokens=4000,
-            response_format={"type": "json_object"}  # Request JSON response
-        )
-        
-        # Extract and parse the security report
-        security_report = response.choices[0].message.content.strip()
-        
-        # Process the report
-        try:
-            import json
-            report_data = json.loads(security_report)
-            
-            # Format the report for human readability
-            if report_data.get("status") == "secure":
-                return "✅ NO SECURITY ISSUES DETECTED\n\nThe code appears to be secure. No vulnerabilities were identified in the analysis."
-            else:
-                issues = report_data.get("issues", [])
-                if not issues:
-                    return "✅ NO SECURITY ISSUES DETECTED\n\nThe code appears to be secure. No vulnerabilities were identified in the analysis."
-                
-                # Format the issues into a readable report
-                formatted_report = "🔴 SECURITY VULNERABILITIES DETECTED\n\n"
-                for i, issue in enumerate(issues, 1):
-                    formatted_report += f"ISSUE #{i}: {issue.get('type')} (Severity: {issue.get('severity')})\n"
-                    formatted_report += f"Description: {issue.get('description')}\n"
-                    formatted_report += f"Explanation: {issue.get('explanation')}\n\n"
-                    formatted_report += "Recommended Fix:\n```python\n{}\n```\n\n".format(issue.get('fix'))
-                
-                return formatted_report
-                
-        except json.JSONDecodeError:
-            # Fallback for non-JSON responses
-            if "NO SECURITY ISSUES DETECTED" in security_report:
-                return "✅ NO SECURITY ISSUES DETECTED\n\nThe code appears to be secure. No vulnerabilities were identified in the analysis."
-            else:
-                return security_report
-        
-    except Exception as e:
-        return f"❌ ERROR DURING SECURITY SCAN: {str(e)}\n\nPlease check your code format and try again."
+    Keeps the definition fingerprints of each feature's latest run in the
+    session and compares them with this run. Unchanged definitions can be
+    answered from the response cache, but their entries may have expired, so
+    the note does not claim they were.
     
-    
-def get_fixed_code_with_groq(code):
+    Args:
+        feature (str): Key of the analysis, e.g. "explain" or "security".
+        code (str): The analyzed code.
+        programming_language (str, optional): The language the analysis split
+            the code with, so the definitions are the ones it sent.
+    """
+    definitions = split_for_incremental_analysis(code, programming_language)
+    if not definitions:
+        return
+    previous = st.session_state.setdefault("analyzed_fingerprints", {}).get(feature, set())
+    fingerprints = {definition.fingerprint for definition in definitions}
+    changed = sum(1 for definition in definitions if definition.fingerprint not in previous)
+    st.session_state["analyzed_fingerprints"][feature] = fingerprints
+    if previous:
+        st.caption(f"♻️ {changed} of {len(definitions)} definitions changed since the last run; the others can be served from the response cache.")
+    else:
+        st.caption(f"Analyzed {len(definitions)} definitions separately.")
+
+def show_execution_result(execution):
     """
-    Get fixed and secure code using Groq API.
+    Show the output of a sandboxed run: status line, stdout and stderr.
     
     Args:
-        code (str): The source code to fix
-        
-    Returns:
-        str: The fixed and secure code or error message
+        execution (ExecutionResult): The result from sandbox.run_code.
     """
-    model = "meta-llama/llama-4-scout-17b-16e-instruct"  # Changed from qwen-2.5-coder-32b
-    
-    prompt = f"""
-    You are an expert programmer proficient in multiple programming languages.
-    
-    I need you to fix and secure the following code:
-    
-    ```python
-    {code}
-    ```
-    
-    Please provide only the fixed and secure code without any explanations or comments.
-    Make sure to preserve the functionality and logic of the original code.
-    Use idiomatic Python patterns and best practices.
+    if execution.exit_code == 0 and not execution.timed_out:
+        st.success(f"✅ {execution.status()}")
+    else:
+        st.error(f"⚠️ {execution.status()}")
+    if execution.stdout:
+        st.markdown("**Output:**")
+        st.code(execution.stdout, language="text")
+    if execution.stderr:
+        st.markdown("**Errors:**" if execution.phase == "run" else "**Compiler output:**")
+        st.code(execution.stderr, language="text")
+    if not execution.stdout and not execution.stderr:
+        st.caption("The program printed nothing.")
+    if execution.truncated:
+        st.caption("✂️ Output was truncated.")
+
+def trace_debug_run(code, program_input, breakpoint_lines, debug_options):
     """
+    Run Python code under the tracer in the sandbox and show what was observed.
     
-    try:
-        response = groq_client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            max_tokens=4000
-        )
-        
-        fixed_code = response.choices[0].message.content.strip()
-        
-        # Clean up the response to extract just the code if it contains markdown
-        if "```" in fixed_code:
-            # Extract code between markdown code blocks
-            import re
-            code_blocks = re.findall(r'```(?:\w+)?\n(.*?)```', fixed_code, re.DOTALL)
-            if code_blocks:
-                fixed_code = code_blocks[0].strip()
-        
-        return fixed_code
+    Args:
+        code (str): The code from the editor.
+        program_input (str): Text fed to the program as stdin.
+        breakpoint_lines (list): Breakpoints, numbered like the stripped code in the line picker.
+        debug_options (list): The selected Debugging Configuration options.
     
-    except Exception as e:
-        return f"Error during code fixing: {e}"
-
-def convert_code_language(code, source_language, target_language):
+    Returns:
+        str: The compact trace summary for the prompt, or an empty string if
+            the code could not be traced.
     """
-    Convert code from one programming language to another using Groq API.
+    # The line picker numbers the lines of the stripped code
+    leading_lines = code[:len(code) - len(code.lstrip())].count("\n")
+    arguments = [f"{SANDBOX_TIMEOUT * 0.8:g}"] + [str(line + leading_lines) for line in breakpoint_lines]
+    with st.spinner("Tracing your code..."):
+        try:
+            execution = run_code(code, "Python", program_input, harness=tracer, harness_args=arguments)
+        except (OSError, ValueError, subprocess.SubprocessError, SandboxBusyError) as e:
+            st.warning(f"⚠️ Could not trace the code: {e}")
+            return ""
+    if not execution.data:
+        st.warning(f"⚠️ Could not trace the code: {execution.status()}")
+        return ""
+    summary = tracer.format_trace_summary(execution.data, debug_options)
+    with st.expander(f"🔎 Observed execution ({execution.elapsed * 1000:.0f} ms)"):
+        if execution.stdout:
+            st.markdown("**Output:**")
+            st.code(execution.stdout, language="text")
+        st.code(summary, language="text")
+    return summary
+
+def profile_optimize_run(code, program_input):
+    """
+    Run Python code under the profiler in the sandbox and show its hotspots.
     
     Args:
-        code (str): The source code to convert
-        source_language (str): The language of the source code
-        target_language (str): The target language to convert to
-        
+        code (str): The code from the editor.
+        program_input (str): Text fed to the program as stdin.
+    
     Returns:
-        str: The converted code or error message
+        str: The top hotspots for the prompt, or an empty string if the code
+            could not be profiled.
     """
-    # Import the Groq client
-    try:
-        from groq import Groq
-    except ImportError:
-        return "Error: Groq package not installed. Install with 'pip install groq'"
-    
-    # Use the specifically requested models
-    models = [
-        "qwen-qwq-32b",  # Primary model as requested
-        "gemma2-9b-it"   # Secondary model as requested
-    ]
-    
-    prompt = f"""
-    You are an expert programmer proficient in multiple programming languages.
-    
-    I need you to convert the following {source_language} code to {target_language}.
-    
-    ```{source_language.lower()}
-    {code}
-    ```
+    # Stopping a long run takes a final memory snapshot, so leave it more headroom than the tracer
+    arguments = [f"{SANDBOX_TIMEOUT * 0.6:g}"]
+    with st.spinner("Profiling your code..."):
+        try:
+            execution = run_code(code, "Python", program_input, harness=profiler, harness_args=arguments)
+        except (OSError, ValueError, subprocess.SubprocessError, SandboxBusyError) as e:
+            st.warning(f"⚠️ Could not profile the code: {e}")
+            return ""
+    if not execution.data:
+        st.warning(f"⚠️ Could not profile the code: {execution.status()}")
+        return ""
+    profile = execution.data
+    with st.expander(f"📈 Measured profile ({profile['elapsed'] * 1000:.0f} ms, peak memory {profiler.format_bytes(profile['peak_memory'])})"):
+        if profile["error"]:
+            st.warning(f"⚠️ {profile['error']}")
+        if profile["functions"]:
+            st.markdown("**Functions by cumulative time:**")
+            st.table([
+                {
+                    "Function": function["function"],
+                    "Location": function["location"],
+                    "Calls": function["calls"],
+                    "Cumulative ms": round(function["cumulative_time"] * 1000, 1),
+                    "Own ms": round(function["total_time"] * 1000, 1),
+                }
+                for function in profile["functions"]
+            ])
+        if profile["lines"]:
+            st.markdown("**Allocation peaks by line:**")
+            st.table([
+                {
+                    "Line": line["line"],
+                    "Memory": profiler.format_bytes(line["peak_bytes"]),
+                    "Blocks": line["blocks"],
+                    "Source": line["source"],
+                }
+                for line in profile["lines"]
+            ])
+        st.caption("Times include profiler overhead; compare them with each other rather than with a plain run.")
+    return profiler.format_profile_summary(profile)
+
+def optimized_code_candidate(code, response):
+    """
+    Pick the optimized program out of an Optimize response.
     
-    Please provide only the converted {target_language} code without any explanations or comments.
-    Make sure to preserve the functionality and logic of the original code.
-    Use idiomatic {target_language} patterns and best practices.
+    Args:
+        code (str): The original code.
+        response (str): The model's complete response.
     
-    IMPORTANT: Return ONLY the code, no markdown code blocks, no explanations.
+    Returns:
+        str: The longest fenced block that compiles and differs from the
+            original (snippets and unchanged copies are skipped), or an
+            empty string if there is none.
     """
-    
-    # Try each model in sequence until one works
-    for model in models:
+    candidates = []
+    for block in extract_code_blocks(response):
+        if not block or block == code.strip():
+            continue
         try:
-            # Initialize the Groq client
-            groq_client = Groq()
-            
-            # Attempt to use the current model
-            response = groq_client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=4000,
-                stream=False  # Using non-streaming for simplicity
-            )
-            
-            converted_code = response.choices[0].message.content.strip()
-            
-            # Clean up the response to extract just the code if it contains markdown
-            if "```" in converted_code:
-                # Extract code between markdown code blocks
-                import re
-                code_blocks = re.findall(r'```(?:\w+)?\n(.*?)```', converted_code, re.DOTALL)
-                if code_blocks:
-                    converted_code = code_blocks[0].strip()
-                else:
-                    # If we can't find code blocks with language specification, try without it
-                    code_blocks = re.findall(r'```\n?(.*?)```', converted_code, re.DOTALL)
-                    if code_blocks:
-                        converted_code = code_blocks[0].strip()
-            
-            # Further cleanup: remove any remaining tags or headers
-            converted_code = re.sub(r'^#.*\n?', '', converted_code, flags=re.MULTILINE)
-            
-            # If the code still starts with language name or comments about the language, remove them
-            if converted_code.lower().startswith(target_language.lower()):
-                converted_code = re.sub(f'^{target_language.lower()}.*\n', '', converted_code, flags=re.IGNORECASE)
-            
-            # Log which model was successfully used
-            print(f"Code conversion successful using model: {model}")
-            
-            return converted_code
-            
-        except Exception as e:
-            print(f"Model {model} failed with error: {e}")
-            # If we're on the last model, return the error
-            if model == models[-1]:
-                return f"Error during code conversion: {e}"
-            # Otherwise continue to the next model
+            compile(block, "<optimized>", "exec")
+        except (SyntaxError, ValueError):
             continue
+        candidates.append(block)
+    return max(candidates, key=len, default="")
+
+def benchmark_optimized_code(code, optimized_code, program_input):
+    """
+    Benchmark the original and the optimized code in the sandbox and show the comparison.
+    
+    Both run with the same stdin, one after the other so they do not compete
+    for the CPU. The optimized version is flagged if it is slower, fails or
+    prints different output.
     
-    return "Error: All conversion attempts failed."
+    Args:
+        code (str): The original code.
+        optimized_code (str): The code extracted from the Optimize response.
+        program_input (str): Text fed to both programs as stdin.
+    """
+    arguments = [str(benchmark.BENCHMARK_REPEAT), f"{SANDBOX_TIMEOUT * 0.8:g}"]
+    results = {}
+    with st.spinner("Benchmarking the original and the optimized code..."):
+        for label, source in (("Original", code), ("Optimized", optimized_code)):
+            try:
+                execution = run_code(source, "Python", program_input, harness=benchmark, harness_args=arguments)
+            except (OSError, ValueError, subprocess.SubprocessError, SandboxBusyError) as e:
+                st.warning(f"⚠️ Could not benchmark the code: {e}")
+                return
+            if not execution.data:
+                st.warning(f"⚠️ Could not benchmark the {label.lower()} code: {execution.status()}")
+                return
+            results[label] = execution.data
+    comparison = benchmark.compare_benchmarks(results["Original"], results["Optimized"])
+
+    st.markdown("#### ⏱️ Before/after benchmark")
+    if comparison["problems"]:
+        st.error("⚠️ " + "; ".join(comparison["problems"]) + ".")
+    elif comparison["faster"]:
+        st.success(f"✅ {comparison['speedup']:.2f}× faster with the same output.")
+    else:
+        st.info("➖ Same output, but no measurable speedup.")
+    st.table([
+        {
+            "Version": label,
+            "Runs": comparison[label.lower()]["runs"],
+            "Best ms": round(comparison[label.lower()]["best"] * 1000, 2),
+            "Mean ms": round(comparison[label.lower()]["mean"] * 1000, 2),
+            "Std dev ms": round(comparison[label.lower()]["stdev"] * 1000, 2),
+            "Variation": f"{comparison[label.lower()]['variation']:.1%}",
+            "Peak memory": profiler.format_bytes(results[label]["peak_memory"]) if results[label]["peak_memory"] is not None else "n/a",
+            "Error": results[label]["error"] or "",
+        }
+        for label in ("Original", "Optimized")
+    ])
+    if not comparison["outputs_match"]:
+        with st.expander("🔍 Output differences"):
+            differences = "\n".join(difflib.unified_diff(
+                results["Original"]["output"].splitlines(), results["Optimized"]["output"].splitlines(),
+                "original", "optimized", lineterm=""
+            ))
+            st.code(differences or "The outputs differ after the first characters shown here.", language="diff")
+    st.caption(f"Speedup compares the best of up to {benchmark.BENCHMARK_REPEAT} runs each, as timeit does.")
 
 # Main app function 
 def main():
@@ -1749,15 +1416,17 @@ def render_auth_page():
     st.markdown('</div>', unsafe_allow_html=True)  # Close auth-card
 
 def render_main_app():
+    # Provider calls made during this run are rate-limited per user
+    set_current_user(st.session_state.username)
+
     # Set API keys from environment variable
     if not GROQ_API_KEY or not GOOGLE_API_KEY:
         st.error("⚠️ API keys for Groq and Gemini are required. Please set them as Streamlit secrets.")
         st.stop()
 
-    # Initialize clients
+    # Make sure the shared clients exist
     try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
-        genai.configure(api_key=GOOGLE_API_KEY)
+        init_llm_clients()
     except Exception as e:
         st.error(f"Error initializing API clients: {e}")
         st.stop()
@@ -1834,7 +1503,7 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
 """)
 
     # Navigation bar
-    page = st.selectbox("Select a feature:", ["Code Debugger", "Interactive Debugging Tool", "Code Generation", "Code Conversion", "Code Compiler"])
+    page = st.selectbox("Select a feature:", ["Code Debugger", "Project Scan", "Interactive Debugging Tool", "Code Generation", "Code Conversion", "Code Compiler"])
     
     if page == "Interactive Debugging Tool":
         st.markdown("### 🛠️ Code Analysis & Debugging Studio")
@@ -1843,6 +1512,9 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
         # Import the Monaco editor package
         from streamlit_monaco import st_monaco
         
+        # Start the warm Python workers so the first Run does not pay for interpreter startup
+        prewarm_sandbox()
+        
         # Create two columns for better layout
         col1, col2 = st.columns([2, 1])
         
@@ -1903,6 +1575,7 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
             )
             
             # Debugging configuration (shown only when Debug mode is selected)
+            breakpoint_lines = []
             if mode == "Debug":
                 st.markdown("##### Debugging Configuration")
                 debug_options = {
@@ -1936,52 +1609,90 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
                 st.markdown('<div class="result-container">', unsafe_allow_html=True)
                 st.markdown(f"### Results ({mode} Mode)")
                 
-                with st.spinner(f"Processing your code ({mode} mode)..."):
-                    try:
-                        client = Groq()
-                        models = ["llama-3.1-8b-instant", "meta-llama/llama-4-scout-17b-16e-instruct"]
-                        response = None
+                # Deterministic checks run locally first; the model gets their summary as confirmed facts
+                local_report = None
+                if mode in ("Debug", "Analyze"):
+                    local_report = run_local_checks(debug_code, language)
+                    if local_report.checker:
+                        st.markdown(f"#### ⚡ Local checks ({local_report.elapsed * 1000:.0f} ms)")
+                        if local_report.diagnostics:
+                            st.markdown("\n".join(f"- {diagnostic}" for diagnostic in local_report.diagnostics))
+                        else:
+                            st.markdown("✅ No syntax errors found.")
+                
+                # Debug mode gives the model a real trace of the run instead of asking it to simulate one
+                trace_summary = ""
+                if mode == "Debug" and language == "Python" and not local_report.errors and can_run_locally(language):
+                    trace_summary = trace_debug_run(debug_code, program_input, breakpoint_lines, selected_debug_options)
+                
+                # Optimize mode points the model at measured hotspots instead of guessed ones
+                profile_summary = ""
+                if mode == "Optimize" and language == "Python" and can_run_locally(language):
+                    profile_summary = profile_optimize_run(debug_code, program_input)
+                
+                if mode == "Run" and can_run_locally(language):
+                    # Run the code for real in the local sandbox instead of asking the model for its output
+                    with st.spinner("Running your code..."):
+                        try:
+                            execution = run_code(debug_code, language, program_input)
+                        except (OSError, ValueError, subprocess.SubprocessError, SandboxBusyError) as e:
+                            execution = None
+                            st.error(f"⚠️ Could not run the code: {e}")
+                    if execution:
+                        show_execution_result(execution)
+                else:
+                    with st.spinner(f"Processing your code ({mode} mode)..."):
+                        try:
+                            models = ["llama-3.1-8b-instant", "meta-llama/llama-4-scout-17b-16e-instruct"]
+                            response = None
                         
-                        # Prepare prompt based on mode
-                        if mode == "Run":
-                            prompt = f"Language: {language}\nCode:\n{debug_code}\n\nInput:\n{program_input}\n\nPlease execute this code and show the output."
-                        elif mode == "Debug":
-                            debug_features = ", ".join(selected_debug_options)
-                            prompt = f"Language: {language}\nCode:\n{debug_code}\n\nInput:\n{program_input}\nIssue:\n{issue_description}\n\nPerform detailed debugging with: {debug_features}. Explanation level: {difficulty}."
-                        elif mode == "Analyze":
-                            prompt = f"Language: {language}\nCode:\n{debug_code}\n\nPerform code analysis focusing on correctness, potential bugs, edge cases, and efficiency. Provide feedback at {difficulty} level."
-                        elif mode == "Optimize":
-                            prompt = f"Language: {language}\nCode:\n{debug_code}\n\nOptimize this code for better performance and readability. Explain optimizations at {difficulty} level."
-                        elif mode == "Explain":
-                            prompt = f"Language: {language}\nCode:\n{debug_code}\n\nExplain this code line-by-line in detail. Break down core concepts and logic at {difficulty} level."
+                            # Prepare prompt based on mode
+                            if mode == "Run":
+                                prompt = f"Language: {language}\nCode:\n{debug_code}\n\nInput:\n{program_input}\n\nPlease execute this code and show the output."
+                            elif mode == "Debug":
+                                debug_features = ", ".join(selected_debug_options)
+                                prompt = f"Language: {language}\nCode:\n{debug_code}\n\nInput:\n{program_input}\nIssue:\n{issue_description}\n\nPerform detailed debugging with: {debug_features}. Explanation level: {difficulty}."
+                                if trace_summary:
+                                    prompt += f"\n\nObserved execution (a real run with this input; base the debugging on these facts instead of simulating the execution):\n{trace_summary}"
+                            elif mode == "Analyze":
+                                prompt = f"Language: {language}\nCode:\n{debug_code}\n\nPerform code analysis focusing on correctness, potential bugs, edge cases, and efficiency. Provide feedback at {difficulty} level."
+                            elif mode == "Optimize":
+                                prompt = f"Language: {language}\nCode:\n{debug_code}\n\nOptimize this code for better performance and readability. Explain optimizations at {difficulty} level."
+                                if profile_summary:
+                                    prompt += f"\n\nMeasured profile (a real run with this input; focus the optimizations on these hotspots):\n{profile_summary}"
+                            elif mode == "Explain":
+                                prompt = f"Language: {language}\nCode:\n{debug_code}\n\nExplain this code line-by-line in detail. Break down core concepts and logic at {difficulty} level."
+                            if local_report and local_report.checker:
+                                prompt += "\n\n" + local_report.prompt_summary()
                         
-                        # Try models in sequence
-                        for model in models:
+                            # Hedged streaming: the fallback model starts if the primary is slow to respond
+                            # Coalescing renderer: completed paragraphs are frozen, only the tail is re-sent
+                            renderer = StreamRenderer(mode="markdown")
                             try:
-                                completion = client.chat.completions.create(
-                                    model=model,
-                                    messages=[{"role": "user", "content": prompt}],
+                                for chunk_content in groq_stream_hedged(
+                                    "interactive_debugger",
+                                    models,
+                                    prompt,
+                                    use_cache=False,
                                     temperature=0.6,
                                     max_completion_tokens=4096,
                                     top_p=0.95,
-                                    stream=True,
                                     stop=None,
-                                )
-                                
-                                response = ""
-                                response_placeholder = st.empty()
-                                for chunk in completion:
-                                    chunk_content = chunk.choices[0].delta.content or ""
-                                    response += chunk_content
-                                    response_placeholder.markdown(response)
-                                break  # Exit loop if successful
+                                ):
+                                    renderer.write(chunk_content)
                             except Exception as e:
-                                st.warning(f"⚠️ Model {model} failed: {e}")
+                                st.warning(f"⚠️ {e}")
+                            response = renderer.close()
                         
-                        if not response:
-                            st.error("⚠️ All models failed. Please try again later.")
-                    except Exception as e:
-                        st.error(f"⚠️ An error occurred: {e}")
+                            if not response:
+                                st.error("⚠️ All models failed. Please try again later.")
+                            elif mode == "Optimize" and language == "Python" and can_run_locally(language):
+                                # Check the suggested code instead of taking the model's word for it
+                                optimized_code = optimized_code_candidate(debug_code, response)
+                                if optimized_code:
+                                    benchmark_optimized_code(debug_code, optimized_code, program_input)
+                        except Exception as e:
+                            st.error(f"⚠️ An error occurred: {e}")
                 
                
         # Educational resources section
@@ -2046,18 +1757,88 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
                 )
                 security_clicked = st.button("🔐 Security Scan", key="security-btn-hidden", help="Check your code for vulnerabilities and quality issues")
 
+            st.markdown(
+                '<button class="custom-button" id="run-all-btn" onclick="document.querySelector(\'#run-all-btn-hidden\').click()">🚀 Run All Analyses</button>',
+                unsafe_allow_html=True
+            )
+            run_all_clicked = st.button("🚀 Run All Analyses", key="run-all-btn-hidden", help="Explain, fix, diagram and scan your code in parallel")
+            minify_scan = st.checkbox(
+                "✂️ Strip comments and docstrings before the security scan",
+                value=False,
+                help="Sends fewer tokens; line numbers in the report still refer to your code"
+            )
+            scan_language = st.selectbox(
+                "Language for the security scan:",
+                ["Auto-detect", "Python", "JavaScript", "Java", "C++", "C", "Ruby", "PHP", "Go"],
+                help="Picks the local security rules and how the code is split into definitions"
+            )
+            scan_language = None if scan_language == "Auto-detect" else scan_language
+
             st.markdown('</div>', unsafe_allow_html=True)
 
             # Process actions
+            if run_all_clicked:
+                if code_input.strip():
+                    st.markdown('<div class="result-container">', unsafe_allow_html=True)
+                    st.markdown("### 🚀 Full Analysis")
+
+                    # Each analysis renders into its own slot as soon as it finishes
+                    analyses = {
+                        "explain": ("### 🔍 Code Explanation", explain_code_with_gemini_async),
+                        "fix": ("### 🔧 Fixed & Secure Code", get_fixed_code_with_groq_async),
+                        "diagram": ("### 📊 Code Flow Diagram", generate_code_flow_async),
+                        "security": ("### 🔐 Security & Vulnerability Report", lambda code: run_security_scan_async(code, minify_scan, scan_language)),
+                    }
+                    placeholders = {}
+                    for key, (title, _) in analyses.items():
+                        st.markdown(title)
+                        placeholders[key] = st.empty()
+                        placeholders[key].info("⏳ Running...")
+
+                    # All four run concurrently on the shared event loop
+                    start_time = time.time()
+                    futures = {
+                        submit(func(code_input)): key
+                        for key, (_, func) in analyses.items()
+                    }
+
+                    for future in as_completed(futures):
+                        key = futures[future]
+                        elapsed = time.time() - start_time
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            placeholders[key].error(f"⚠️ Analysis failed: {e}")
+                            continue
+
+                        with placeholders[key].container():
+                            if key == "fix":
+                                st.code(result, language='python')
+                            elif key == "diagram":
+                                st.markdown(f"```mermaid\n{result}\n```")
+                            else:
+                                st.markdown(result)
+                            st.caption(f"Completed in {elapsed:.1f}s")
+
+                    st.caption(f"All analyses finished in {time.time() - start_time:.1f}s")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                else:
+                    st.error("⚠️ Please enter some code to analyze!")
+
             if explain_clicked:
                 if code_input.strip():
                     st.markdown('<div class="result-container">', unsafe_allow_html=True)
                     st.markdown("### 🔍 Code Explanation")
 
                     with st.spinner("Generating explanation..."):
-                        explanation = explain_code_with_gemini(code_input)
+                        explanation, explanation_placeholder = render_markdown_stream(
+                            stream_explain_code_with_gemini(code_input)
+                        )
 
-                    st.markdown(explanation)
+                    # Same finishing touch as the non-streaming explanation
+                    if explanation and "**" not in explanation:
+                        explanation_placeholder.replace(highlight_code_terms(explanation))
+                    show_incremental_analysis_note("explain", code_input)
                     st.markdown('</div>', unsafe_allow_html=True)
                 else:
                     st.error("⚠️ Please enter some code to explain!")
@@ -2067,11 +1848,26 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
                     st.markdown('<div class="result-container">', unsafe_allow_html=True)
                     st.markdown("### 🔧 Fixed & Secure Code")
 
+                    patch_mode = use_fix_patch_mode(code_input)
                     with st.spinner("Fixing and securing code..."):
-                        fixed_code = get_fixed_code_with_groq(code_input)
-
-                    if fixed_code:
-                        st.code(fixed_code, language='python')
+                        if patch_mode:
+                            # Large file: the model only returns the changed hunks
+                            fixed_code = get_fixed_code_with_groq(code_input)
+                            fix_placeholder = StreamRenderer(mode="code")
+                        else:
+                            raw_fix, fix_placeholder = render_code_stream(stream_fixed_code_with_groq(code_input))
+                            fixed_code = extract_code_block(raw_fix)
+
+                    if fixed_code.startswith("Error during code fixing:"):
+                        st.error(f"⚠️ {fixed_code}")
+                    elif fixed_code:
+                        fix_placeholder.replace(fixed_code)
+                        if patch_mode:
+                            changes = "\n".join(difflib.unified_diff(
+                                code_input.splitlines(), fixed_code.splitlines(), "original", "fixed", lineterm=""
+                            ))
+                            with st.expander("🔍 Changes"):
+                                st.code(changes or "No changes", language="diff")
 
                         # Copy button
                         if st.button("📋 Copy Fixed Code"):
@@ -2102,10 +1898,25 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
                     st.markdown('<div class="result-container">', unsafe_allow_html=True)
                     st.markdown("### 🔐 Security & Vulnerability Report")
 
-                    with st.spinner("Scanning for vulnerabilities..."):
-                        security_report = run_security_scan(code_input)
+                    # The local checks take milliseconds: show their findings while the model runs
+                    report_placeholder = st.empty()
+                    local_findings = format_local_findings(scan_code(code_input, scan_language))
+                    if local_findings:
+                        waiting = "asking the model to confirm them" if SECURITY_PRESCAN else "the model is scanning the whole file"
+                        report_placeholder.markdown(f"⚡ Local checks flagged these lines; {waiting}...\n\n{local_findings}")
 
-                    st.markdown(security_report)
+                    with st.spinner("Scanning for vulnerabilities..."):
+                        security_report = run_security_scan(code_input, minify_scan, scan_language)
+
+                    if local_findings and not SECURITY_PRESCAN:
+                        # Not part of the model's report, so keep them next to it
+                        security_report = f"⚡ Local checks flagged these lines:\n\n{local_findings}\n\n---\n\n{security_report}"
+                    report_placeholder.markdown(security_report)
+                    if SECURITY_PRESCAN:
+                        reviewed = f"Only the flagged lines were reviewed by {SECURITY_SCAN_MODEL}; the rest" if local_findings else "The local checks flagged nothing, so the code"
+                        st.caption(f"{reviewed} was swept by the faster {SECURITY_SWEEP_MODEL}, which can miss subtle issues.")
+                    else:
+                        show_incremental_analysis_note("security", code_input, scan_language)
                     st.markdown('</div>', unsafe_allow_html=True)
                 else:
                     st.error("⚠️ Please enter some code to scan for vulnerabilities!")
@@ -2123,9 +1934,8 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
                     st.markdown("### 🤖 AI Response")
 
                     with st.spinner("Asking AI..."):
-                        assistant_response = get_ai_assistant_response(assistant_code, assistant_question)
+                        render_markdown_stream(stream_ai_assistant_response(assistant_code, assistant_question))
 
-                    st.markdown(assistant_response)
                     st.markdown('</div>', unsafe_allow_html=True)
                 else:
                     st.error("⚠️ Please provide both code and a question!")
@@ -2215,6 +2025,67 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
             st.markdown("#### ⚡ Performance")
             response_detail_level = st.slider("Response detail level:", min_value=1, max_value=10, value=7)
 
+            cache_stats = get_response_cache().stats()
+            cache_col1, cache_col2, cache_col3 = st.columns(3)
+            cache_col1.metric("Cache hits", cache_stats["hits"])
+            cache_col2.metric("Cache misses", cache_stats["misses"])
+            cache_col3.metric("Cached responses", cache_stats["entries"])
+
+            open_circuits = [key for key, state in circuit_states().items() if state["state"] != "closed"]
+            if open_circuits:
+                st.warning(f"⚠️ Temporarily skipping failing models: {', '.join(open_circuits)}")
+
+            admission_stats = get_admission_controller().stats()
+            queue_col1, queue_col2, queue_col3 = st.columns(3)
+            queue_col1.metric("Queued requests", sum(lane["queue_depth"] for lane in admission_stats.values()))
+            queue_col2.metric("Max queue wait", f"{max([lane['max_wait'] for lane in admission_stats.values()] or [0]):.1f}s")
+            queue_col3.metric("Throttled requests", sum(lane["rejected"] for lane in admission_stats.values()))
+
+            render_stats = get_render_stats()
+            render_col1, render_col2, render_col3 = st.columns(3)
+            render_col1.metric("Stream flushes", render_stats["flushes"])
+            render_col2.metric("Stream KB sent", f"{render_stats['bytes_sent'] / 1024:.1f}")
+            render_col3.metric("Avg render latency", f"{render_stats['avg_render_seconds'] * 1000:.1f} ms")
+
+            flight_stats = get_single_flight().stats()
+            flight_col1, flight_col2, flight_col3 = st.columns(3)
+            flight_col1.metric("Upstream calls", flight_stats["upstream_calls"])
+            flight_col2.metric("Coalesced requests", flight_stats["coalesced"])
+            flight_col3.metric("In flight", flight_stats["in_flight"])
+
+            pool_stats = sandbox_pool_stats()
+            if pool_stats:
+                pool_col1, pool_col2, pool_col3 = st.columns(3)
+                pool_col1.metric("Sandbox workers busy", f"{pool_stats['busy']} / {pool_stats['size']}")
+                pool_col2.metric("Avg run latency", f"{pool_stats['avg_latency'] * 1000:.0f} ms")
+                pool_col3.metric("Queue wait (p95)", f"{pool_stats['p95_queue_wait'] * 1000:.0f} ms")
+                st.caption(
+                    f"Sandbox: {pool_stats['jobs']} runs, {pool_stats['waiting']} waiting, "
+                    f"{pool_stats['recycled']} workers recycled, {pool_stats['replaced']} replaced after failures"
+                )
+
+            token_stats = get_token_estimator().stats()
+            if token_stats:
+                samples = sum(stats["samples"] for stats in token_stats.values())
+                mean_error = sum(stats["mean_abs_error"] * stats["samples"] for stats in token_stats.values()) / samples
+                st.caption(f"Token estimate error: {mean_error:.1%} over {samples} requests")
+
+            with st.expander("✂️ Prompt template sizes"):
+                prompt_stats = template_stats()
+                st.table([
+                    {
+                        "Template": name,
+                        "Tokens (as written)": stats["raw_tokens"],
+                        "Tokens (compacted)": stats["compact_tokens"],
+                        "Uses": stats["renders"],
+                        "Tokens saved": stats["tokens_saved"],
+                    }
+                    for name, stats in sorted(prompt_stats.items())
+                ])
+            if st.button("🧹 Clear Response Cache"):
+                get_response_cache().clear()
+                st.success("✅ Response cache cleared!")
+
             if st.button("💾 Save Settings"):
              st.session_state.theme = theme
              st.session_state.explanation_model = explanation_model
@@ -2233,9 +2104,12 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
                 st.markdown('<div class="result-container">', unsafe_allow_html=True)
                 st.markdown("### 💻 Generated Code")
                 with st.spinner("Generating code..."):
-                    generated_code = generate_code_from_text(text_input)
+                    raw_generated, generated_placeholder = render_code_stream(
+                        stream_generate_code_from_text(text_input)
+                    )
+                    generated_code = extract_code_block(raw_generated)
                     if generated_code:
-                        st.code(generated_code, language='python')
+                        generated_placeholder.replace(generated_code)
                     else:
                         st.error("⚠️ Failed to generate code.")
                 st.markdown('</div>', unsafe_allow_html=True)
@@ -2264,22 +2138,29 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
         # Optional: Add advanced options
         with st.expander("Advanced Options"):
             explain_conversion = st.checkbox("Explain conversion changes", value=False)
+            minify_conversion = st.checkbox("Strip comments and docstrings before converting (fewer tokens)", value=False)
         
         if st.button("Convert Code"):
             if code_to_convert.strip():
                 with st.spinner(f"Converting code from {source_language} to {target_language}..."):
                     try:
-                        # Calling the function with only the supported parameters
-                        converted_code = convert_code_language(
-                            code_to_convert, 
-                            source_language, 
-                            target_language
+                        st.markdown('<div class="result-container">', unsafe_allow_html=True)
+                        st.markdown(f"### 🔄 Converted Code ({target_language})")
+                        
+                        # Stream the conversion, then apply the usual cleanup to the final text
+                        raw_converted, converted_placeholder = render_code_stream(
+                            stream_convert_code_language(
+                                code_to_convert, 
+                                source_language, 
+                                target_language,
+                                minify=minify_conversion
+                            ),
+                            language=target_language.lower()
                         )
+                        converted_code = clean_converted_code(raw_converted, target_language)
                         
                         if converted_code:
-                            st.markdown('<div class="result-container">', unsafe_allow_html=True)
-                            st.markdown(f"### 🔄 Converted Code ({target_language})")
-                            st.code(converted_code, language=target_language.lower())
+                            converted_placeholder.replace(converted_code)
                             
                             if explain_conversion:
                                 st.markdown("### 📝 Conversion Explanation")
@@ -2307,6 +2188,81 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
             else:
                 st.error("⚠️ Please enter code to convert.")
                 
+    elif page == "Project Scan":
+        st.markdown("### 📦 Project Security Scan")
+        st.markdown("Upload a .zip of your project (or several source files) to scan every file for vulnerabilities.")
+        project_files = st.file_uploader(
+            "Upload a .zip archive or source files:",
+            type=["zip"] + [extension.lstrip(".") for extension in SOURCE_EXTENSIONS],
+            accept_multiple_files=True
+        )
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            explain_files = st.checkbox("Also explain each file", value=False)
+            minify_files = st.checkbox("Strip comments before scanning", value=False)
+        with col2:
+            fix_files = st.checkbox("Also fix each file", value=False)
+        with col3:
+            project_workers = st.slider("Files in parallel:", 1, 16, min(BATCH_MAX_WORKERS, 16))
+        
+        scan_col, stop_col = st.columns(2)
+        with scan_col:
+            scan_project_clicked = st.button("🔐 Scan Project")
+        with stop_col:
+            # Any click reruns the script, which closes the running batch and cancels its files
+            if st.button("⏹️ Stop"):
+                st.info("Project scan stopped.")
+        
+        if scan_project_clicked:
+            total = sum(1 for _ in iter_uploaded_sources(project_files or []))
+            if total:
+                st.markdown('<div class="result-container">', unsafe_allow_html=True)
+                progress = st.progress(0.0, text=f"Scanning {total} files...")
+                
+                async def analyze(code, language):
+                    return await analyze_project_file_async(code, language, explain=explain_files, fix=fix_files, minify=minify_files)
+                
+                start_time = time.time()
+                file_results = []
+                for file_result in run_batch(iter_uploaded_sources(project_files), analyze, max_workers=project_workers):
+                    file_results.append(file_result)
+                    progress.progress(
+                        len(file_results) / total,
+                        text=f"Scanned {len(file_results)} of {total} files ({file_result.path}, {file_result.elapsed:.1f}s)"
+                    )
+                progress.empty()
+                
+                report = format_project_report(file_results)
+                st.markdown("### 🔐 Project Security Report")
+                st.caption(f"Scanned {total} files in {time.time() - start_time:.1f}s")
+                st.markdown(report)
+                st.download_button("Download Report", data=report, file_name="security_report.md", mime="text/markdown")
+                
+                with st.expander("⏱️ Per-file results"):
+                    st.table([
+                        {
+                            "File": file_result.path,
+                            "Language": file_result.language,
+                            "Issues": len(file_result.result["issues"]) if file_result.result else "-",
+                            "Time (s)": round(file_result.elapsed, 1),
+                            "Status": file_result.error or "OK",
+                        }
+                        for file_result in sorted(file_results, key=lambda file_result: file_result.path)
+                    ])
+                
+                for file_result in sorted(file_results, key=lambda file_result: file_result.path):
+                    if not file_result.result or not (explain_files or fix_files):
+                        continue
+                    with st.expander(f"📄 {file_result.path}"):
+                        if explain_files:
+                            st.markdown(file_result.result["explanation"])
+                        if fix_files and file_result.result["fixed_code"]:
+                            st.code(file_result.result["fixed_code"], language=file_result.language.lower())
+                st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                st.error("⚠️ Please upload a .zip archive or source files to scan!")
+                
     if page == "Code Compiler":
         st.markdown("### 💻 Online Code Compiler")
         st.markdown("Practice, compile, and run code in multiple languages")
@@ -2382,87 +2338,6 @@ Built with **Python, Streamlit, and Groq/Gemini APIs**, FixiFox combines power w
 )
 
 
-def get_ai_assistant_response(
-    code: str,
-    question: str,
-    expertise_level: str = "beginner",
-    model: str = "meta-llama/llama-4-scout-17b-16e-instruct",
-    include_examples: bool = True,
-    language: str = None,
-    temperature: float = 0.7,
-    max_tokens: int = 1024
-) -> str:
-    """
-    Provides AI-powered code assistance for debugging and explanation.
-
-    Args:
-        code (str): The code to analyze.
-        question (str): The user's question or issue.
-        expertise_level (str): "beginner", "intermediate", or "expert".
-        model (str): Model name for Groq API.
-        include_examples (bool): Whether to include examples.
-        language (str): Programming language (optional).
-        temperature (float): Model creativity.
-        max_tokens (int): Max tokens for response.
-
-    Returns:
-        str: AI assistant's response or error message.
-    """
-    from groq import Groq
-
-    expertise_instructions = {
-        "beginner": (
-            "- Use simple explanations and define technical terms.\n"
-            "- Break down solutions step by step.\n"
-            "- Avoid jargon unless explained.\n"
-            "- Encourage and be friendly."
-        ),
-        "intermediate": (
-            "- Balance explanation and practical solutions.\n"
-            "- Suggest best practices and patterns."
-        ),
-        "expert": (
-            "- Focus on concise, efficient solutions.\n"
-            "- Discuss trade-offs and optimizations."
-        )
-    }
-    instructions = expertise_instructions.get(expertise_level, expertise_instructions["beginner"])
-    language_hint = f"The code is written in {language}." if language else "Please identify the programming language."
-    example_instruction = "Include 1-2 clear examples." if include_examples else ""
-
-    prompt = (
-        f"You are an expert AI code assistant.\n\n"
-        f"CODE:\n{code}\n\n"
-        f"QUESTION:\n{question}\n\n"
-        f"{language_hint}\n\n"
-        f"INSTRUCTIONS:\n"
-        f"- Tailor your help for a {expertise_level} programmer.\n"
-        f"- {example_instruction}\n"
-        f"- Identify the issue clearly.\n"
-        f"- Explain solutions simply.\n"
-        f"- Show corrected code if needed.\n"
-        f"{instructions}\n"
-    )
-
-    try:
-        groq_client = Groq()
-        response = groq_client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-            stream=False
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        error_msg = str(e).lower()
-        if "timeout" in error_msg:
-            return "The AI assistant timed out. Try simplifying your code or question."
-        elif "token" in error_msg:
-            return "Your code is too large. Please provide a smaller snippet."
-        elif "model" in error_msg:
-            return "The selected AI model is unavailable. Try again later."
-        return f"AI assistant error: {e}"
 
 if __name__ == "__main__":
     main()
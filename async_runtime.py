@@ -0,0 +1,97 @@
+"""
+Shared asyncio event loop for provider calls.
+
+Streamlit runs every session's script in its own thread. A synchronous
+provider call keeps one blocked socket read (and, with hedging or "Run All
+Analyses", extra worker threads) per request. Async provider calls are instead
+scheduled on a single event loop running in a background thread, where
+hundreds of requests can be in flight over the shared async HTTP clients; the
+calling thread only waits for the final result.
+"""
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+
+_loop = None
+_loop_thread = None
+_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="fixifox-event-loop",
+                    daemon=True,
+                )
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """
+    Schedule a coroutine on the shared event loop.
+
+    The coroutine runs with a copy of the caller's context, so context
+    variables such as the current user are visible to it. Cancelling the
+    returned future cancels the task.
+
+    Args:
+        coro: The coroutine to run.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the coroutine's result.
+    """
+    loop = get_event_loop()
+    context = contextvars.copy_context()
+    future = concurrent.futures.Future()
+
+    def on_done(task):
+        if task.cancelled():
+            future.cancel()
+            return
+        try:
+            if task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        except concurrent.futures.InvalidStateError:
+            # Cancelled by the caller while the task was finishing
+            pass
+
+    def start():
+        if future.cancelled():
+            coro.close()
+            return
+        # Tasks copy the current context when created
+        task = context.run(loop.create_task, coro)
+        task.add_done_callback(on_done)
+        # The future stays pending (not running) so that cancel() succeeds
+        future.add_done_callback(lambda f: f.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+    loop.call_soon_threadsafe(start)
+    return future
+
+
+def run_sync(coro, timeout: float = None):
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+
+    Args:
+        coro: The coroutine to run.
+        timeout (float, optional): Seconds to wait. Defaults to no limit.
+
+    Returns:
+        The coroutine's result. Its exception is raised to the caller.
+    """
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync cannot be called from the shared event loop; await the coroutine instead")
+    return submit(coro).result(timeout)
@@ -0,0 +1,226 @@
+"""
+Run an analysis over every source file of a project.
+
+Files are read one at a time from a zip archive, a list of uploaded files or
+a directory only when a worker is free to process them, so a large project
+is never held in memory at once. At most ``max_workers`` files are analyzed
+concurrently on the shared event loop, and results are yielded as soon as
+each file finishes, so the caller can update a progress bar or stop early.
+"""
+import os
+import time
+import zipfile
+import threading
+import concurrent.futures
+
+from async_runtime import submit
+
+BATCH_MAX_WORKERS = int(os.environ.get("FIXIFOX_BATCH_MAX_WORKERS", "4"))
+BATCH_MAX_FILE_BYTES = int(os.environ.get("FIXIFOX_BATCH_MAX_FILE_BYTES", "200000"))
+
+# Source file extensions and the language names used by the prompts
+SOURCE_EXTENSIONS = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".java": "Java",
+    ".c": "C",
+    ".h": "C",
+    ".cpp": "C++",
+    ".cc": "C++",
+    ".hpp": "C++",
+    ".cs": "C#",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".rb": "Ruby",
+    ".php": "PHP",
+    ".kt": "Kotlin",
+    ".swift": "Swift",
+    ".dart": "Dart",
+}
+
+# Directories that never contain the project's own code
+SKIPPED_DIRECTORIES = {"__MACOSX", "node_modules", "venv", ".venv", "__pycache__", "dist", "build", "vendor"}
+
+
+class SourceFile:
+    """
+    A source file whose content is read only when it is processed.
+
+    Args:
+        path (str): Path of the file inside the project.
+        language (str): Language name, from SOURCE_EXTENSIONS.
+        size (int): Size in bytes.
+        read (callable): Zero-argument function returning the file's bytes.
+    """
+
+    def __init__(self, path: str, language: str, size: int, read):
+        self.path = path
+        self.language = language
+        self.size = size
+        self.read = read
+
+    def read_text(self) -> str:
+        return self.read().decode("utf-8", errors="replace")
+
+
+class FileResult:
+    """
+    Outcome of processing one file.
+
+    Args:
+        path (str): Path of the file inside the project.
+        language (str): Language name.
+        elapsed (float): Seconds spent on the file.
+        result: What the task returned, or None if it failed.
+        error (str, optional): Error message if the file could not be processed.
+    """
+
+    def __init__(self, path: str, language: str, elapsed: float, result=None, error: str = None):
+        self.path = path
+        self.language = language
+        self.elapsed = elapsed
+        self.result = result
+        self.error = error
+
+
+def source_language(path: str):
+    """Return the language of a source file from its extension, or None if it is not source code."""
+    parts = path.replace("\\", "/").split("/")
+    if any(part in SKIPPED_DIRECTORIES or part.startswith(".") for part in parts[:-1]):
+        return None
+    if parts[-1].startswith("."):
+        return None
+    return SOURCE_EXTENSIONS.get(os.path.splitext(parts[-1])[1].lower())
+
+
+def iter_zip_sources(archive, max_file_bytes: int = BATCH_MAX_FILE_BYTES):
+    """
+    Yield the source files of a zip archive without extracting it.
+
+    Args:
+        archive: Path or binary file object of the zip archive.
+        max_file_bytes (int, optional): Larger files are skipped.
+
+    Yields:
+        SourceFile: One per source file, in archive order.
+    """
+    with zipfile.ZipFile(archive) as zip_file:
+        for info in zip_file.infolist():
+            if info.is_dir() or info.file_size > max_file_bytes:
+                continue
+            language = source_language(info.filename)
+            if language:
+                # Bind info now; the member is decompressed when it is read
+                yield SourceFile(info.filename, language, info.file_size, lambda info=info: zip_file.read(info))
+
+
+def iter_uploaded_sources(uploaded_files, max_file_bytes: int = BATCH_MAX_FILE_BYTES):
+    """
+    Yield the source files among uploaded files; zip archives are expanded.
+
+    Args:
+        uploaded_files (list): File objects with ``name`` and ``size``
+            attributes and a ``getvalue()`` method (e.g. Streamlit uploads).
+        max_file_bytes (int, optional): Larger files are skipped.
+
+    Yields:
+        SourceFile: One per source file.
+    """
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith(".zip"):
+            yield from iter_zip_sources(uploaded, max_file_bytes)
+            continue
+        language = source_language(uploaded.name)
+        if language and uploaded.size <= max_file_bytes:
+            yield SourceFile(uploaded.name, language, uploaded.size, uploaded.getvalue)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def iter_directory_sources(root: str, max_file_bytes: int = BATCH_MAX_FILE_BYTES):
+    """
+    Yield the source files under a directory, in sorted order.
+
+    Args:
+        root (str): The project directory.
+        max_file_bytes (int, optional): Larger files are skipped.
+
+    Yields:
+        SourceFile: One per source file, with its path relative to root.
+    """
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(
+            name for name in subdirectories if name not in SKIPPED_DIRECTORIES and not name.startswith(".")
+        )
+        for name in sorted(files):
+            full_path = os.path.join(directory, name)
+            path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            language = source_language(path)
+            size = os.path.getsize(full_path)
+            if language and size <= max_file_bytes:
+                yield SourceFile(path, language, size, lambda full_path=full_path: _read_file(full_path))
+
+
+def run_batch(sources, task, max_workers: int = BATCH_MAX_WORKERS, cancel_event: threading.Event = None):
+    """
+    Run an async task over source files with bounded concurrency.
+
+    The next file is read only when a worker is free. Closing the generator,
+    or setting cancel_event, stops reading files and cancels the files still
+    in flight.
+
+    Args:
+        sources: Iterable of SourceFile.
+        task (callable): ``async task(code, language)`` returning the file's result.
+        max_workers (int, optional): Files processed at the same time.
+        cancel_event (threading.Event, optional): Set it to stop the batch.
+
+    Yields:
+        FileResult: One per file, in completion order.
+    """
+    sources = iter(sources)
+    in_flight = {}
+
+    async def timed(code, language):
+        start = time.time()
+        result = await task(code, language)
+        return result, time.time() - start
+
+    def fill():
+        # Start files until every worker is busy; returns files that could not be read
+        unreadable = []
+        while len(in_flight) < max(1, max_workers) and not (cancel_event and cancel_event.is_set()):
+            source = next(sources, None)
+            if source is None:
+                break
+            try:
+                code = source.read_text()
+            except Exception as e:
+                unreadable.append(FileResult(source.path, source.language, 0.0, error=f"Could not read the file: {e}"))
+                continue
+            in_flight[submit(timed(code, source.language))] = (source, time.time())
+        return unreadable
+
+    try:
+        yield from fill()
+        while in_flight:
+            done, _ = concurrent.futures.wait(in_flight, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED)
+            if cancel_event and cancel_event.is_set():
+                break
+            for future in done:
+                source, started = in_flight.pop(future)
+                try:
+                    result, elapsed = future.result()
+                    yield FileResult(source.path, source.language, elapsed, result=result)
+                except Exception as e:
+                    yield FileResult(source.path, source.language, time.time() - started, error=str(e))
+            yield from fill()
+    finally:
+        for future in in_flight:
+            future.cancel()
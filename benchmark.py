@@ -0,0 +1,194 @@
+"""
+Before/after benchmark for the Interactive Debugging Tool's Optimize mode.
+
+Run in the sandbox as a harness (see sandbox.run_code):
+
+    python harness.py main.py .result.json REPEAT TIME_BUDGET
+
+Like ``timeit``, the program is run repeatedly in the same process with the
+garbage collector disabled, and each run gets the same stdin. It runs
+REPEAT times or as often as fits in TIME_BUDGET seconds, whichever is fewer.
+One more run under ``tracemalloc`` measures the peak memory, so its overhead
+does not affect the timings. The output of the first run is printed and its
+digest kept, so outputs can be compared between two programs without
+sending them back in full.
+
+compare_benchmarks turns the results for the original and the optimized
+program into a verdict for the app. Only the standard library is used,
+because this file runs inside the sandbox.
+"""
+import io
+import os
+import gc
+import sys
+import json
+import time
+import runpy
+import hashlib
+import statistics
+import traceback
+import tracemalloc
+
+# Timed runs per program; the app passes this to the harness as REPEAT
+BENCHMARK_REPEAT = int(os.environ.get("FIXIFOX_BENCHMARK_REPEAT", "7"))
+# An optimized version must be at least this much faster (or slower) than the
+# original before it counts as faster (or slower); smaller differences are noise
+SPEEDUP_THRESHOLD = 1.05
+# Output kept in the result for showing differences; the full output of the
+# first run goes to stdout
+MAX_OUTPUT_CHARS = 4000
+# How much slower a program runs under tracemalloc, at worst
+TRACEMALLOC_SLOWDOWN = 10
+
+
+def _run_once(path: str, stdin_text: str):
+    # Run the program with fresh stdin and captured stdout; returns (output, seconds, error)
+    stdin, stdout = sys.stdin, sys.stdout
+    sys.stdin = io.StringIO(stdin_text)
+    sys.stdout = io.StringIO()
+    error = None
+    started = time.perf_counter()
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as stop:
+        if stop.code not in (None, 0):
+            error = f"SystemExit: {stop.code}"
+    except BaseException as exception:
+        error = "".join(traceback.format_exception_only(type(exception), exception)).strip()
+    elapsed = time.perf_counter() - started
+    output = sys.stdout.getvalue()
+    sys.stdin, sys.stdout = stdin, stdout
+    return output, elapsed, error
+
+
+def benchmark_program(path: str, repeat: int, time_budget: float) -> dict:
+    """
+    Time a program file over repeated runs with the same stdin.
+
+    Args:
+        path (str): The program file.
+        repeat (int): Most timed runs.
+        time_budget (float): Seconds the runs may take in total; a run is
+            only started if it should finish in time, but at least one run is
+            always made.
+
+    Returns:
+        dict: times (seconds per run), output (the start of the first
+            run's output), output_digest (of all of it), consistent (whether every run printed the same),
+            peak_memory (bytes, or None if there was no time left to measure
+            it) and error (the first run's failure, if any).
+    """
+    stdin_text = sys.stdin.read()
+    times = []
+    digests = set()
+    first_output = None
+    error = None
+    started = time.perf_counter()
+    # Only start a run that is expected to finish within the budget
+    while len(times) < repeat and (not times or time.perf_counter() - started + min(times) < time_budget):
+        gc.collect()
+        gc.disable()
+        try:
+            output, elapsed, error = _run_once(path, stdin_text)
+        finally:
+            gc.enable()
+        times.append(elapsed)
+        digests.add(hashlib.sha256(output.encode("utf-8", "replace")).hexdigest())
+        if first_output is None:
+            first_output = output
+            sys.stdout.write(output)
+        if error:
+            # A failing program is not worth timing further
+            break
+
+    peak_memory = None
+    if not error and time.perf_counter() - started + TRACEMALLOC_SLOWDOWN * min(times) < time_budget:
+        tracemalloc.start()
+        _run_once(path, stdin_text)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "times": times,
+        "output": (first_output or "")[:MAX_OUTPUT_CHARS],
+        "output_digest": hashlib.sha256((first_output or "").encode("utf-8", "replace")).hexdigest(),
+        "consistent": len(digests) == 1,
+        "peak_memory": peak_memory,
+        "error": error,
+    }
+
+
+def write_result(path: str, result: dict):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(result, file)
+
+
+def timing_stats(times: list) -> dict:
+    """
+    Summarize run times the way timeit reports them.
+
+    Returns:
+        dict: runs, best, mean and stdev in seconds, and the coefficient of
+            variation (stdev / mean).
+    """
+    mean = statistics.fmean(times)
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    return {
+        "runs": len(times),
+        "best": min(times),
+        "mean": mean,
+        "stdev": stdev,
+        "variation": stdev / mean if mean else 0.0,
+    }
+
+
+def compare_benchmarks(original: dict, optimized: dict) -> dict:
+    """
+    Compare the benchmarks of the original and the optimized program.
+
+    The speedup compares the best run of each, as timeit recommends: slower
+    runs are usually caused by other processes, not by the program.
+
+    Args:
+        original (dict): Result of benchmark_program for the original code.
+        optimized (dict): Result of benchmark_program for the optimized code.
+
+    Returns:
+        dict: original and optimized timing_stats, speedup (original best /
+            optimized best), faster (whether the speedup is above
+            SPEEDUP_THRESHOLD), outputs_match, and problems: reasons to
+            distrust the optimized version, empty unless it is slower, fails
+            or prints different output.
+    """
+    problems = []
+    if optimized["error"] and not original["error"]:
+        problems.append(f"The optimized code fails: {optimized['error']}")
+    outputs_match = original["output_digest"] == optimized["output_digest"]
+    if not outputs_match:
+        problems.append("The optimized code prints different output")
+    if not original["consistent"] or not optimized["consistent"]:
+        problems.append("The output changes between runs, so it cannot be compared reliably")
+    original_stats = timing_stats(original["times"])
+    optimized_stats = timing_stats(optimized["times"])
+    speedup = original_stats["best"] / optimized_stats["best"] if optimized_stats["best"] else float("inf")
+    if speedup < 1 / SPEEDUP_THRESHOLD:
+        problems.append(f"The optimized code is slower ({1 / speedup:.2f}× the original's time)")
+    return {
+        "original": original_stats,
+        "optimized": optimized_stats,
+        "speedup": speedup,
+        "faster": speedup >= SPEEDUP_THRESHOLD,
+        "outputs_match": outputs_match,
+        "problems": problems,
+    }
+
+
+if __name__ == "__main__":
+    program, result_path = sys.argv[1], sys.argv[2]
+    repeat, time_budget = int(sys.argv[3]), float(sys.argv[4])
+    sys.argv = [program]
+    result = benchmark_program(os.path.abspath(program), repeat, time_budget)
+    write_result(result_path, result)
+    if result["error"]:
+        print(result["error"], file=sys.stderr)
+        sys.exit(1)
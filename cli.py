@@ -0,0 +1,212 @@
+"""
+Command-line interface for running FixiFox over a directory tree.
+
+    python cli.py scan <dir> [--output results.jsonl] [--resume] [--fail-on high]
+    python cli.py fix <dir> [--write]
+    python cli.py convert <dir> --to Go [--out-dir converted/]
+
+Every source file is processed on a bounded worker pool and one JSON object
+per file is written (JSON Lines) as soon as it finishes. With --resume, files
+whose content hash already has a result in the output file are skipped, so an
+interrupted run can be restarted. ``scan`` exits with status 1 when any
+finding is at or above the --fail-on severity, and every command exits with
+status 3 when some files could not be processed. A scanned file whose record
+has notes (a part that could not be scanned, or an answer that could not be
+parsed) counts as failed, so a provider outage does not pass as a clean scan.
+
+Only the analysis modules are imported, never the Streamlit app.
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+from dotenv import load_dotenv
+from analysis import (
+    SEVERITY_ORDER,
+    analyze_project_file_async,
+    get_fixed_code_with_groq_async,
+    convert_code_language_async,
+)
+from batch_processing import BATCH_MAX_WORKERS, BATCH_MAX_FILE_BYTES, SOURCE_EXTENSIONS, iter_directory_sources, run_batch
+from rate_limiter import set_current_user
+
+EXIT_FINDINGS = 1
+EXIT_FAILED_FILES = 3
+
+# Feature functions report failures as text starting with these prefixes
+ERROR_PREFIXES = ("Error during code fixing:", "Error during code conversion:")
+
+
+def content_hash(code: str) -> str:
+    """Return the hash used to recognize files that were already processed."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def load_previous_results(path: str, command: str, target_language: str = None) -> dict:
+    """
+    Read the results of an earlier run of the same command from a JSON Lines file.
+
+    Returns:
+        dict: {content hash: record} for the files that were processed
+            successfully (scans with notes were not, see main).
+    """
+    previous = {}
+    if not os.path.exists(path):
+        return previous
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run interrupted while writing leaves a partial last line
+                continue
+            if record.get("command") != command or record.get("error") or record.get("notes"):
+                continue
+            if target_language and record.get("target_language") != target_language:
+                continue
+            previous[record["sha256"]] = record
+    return previous
+
+
+def severity_rank(severity) -> int:
+    return SEVERITY_ORDER.get(str(severity).lower(), len(SEVERITY_ORDER))
+
+
+def converted_path(path: str, target_language: str) -> str:
+    extension = next(
+        (extension for extension, language in SOURCE_EXTENSIONS.items() if language.lower() == target_language.lower()),
+        ".txt"
+    )
+    return os.path.splitext(path)[0] + extension
+
+
+def build_task(args, done_hashes: set):
+    """Return the per-file coroutine function for the selected command."""
+    async def task(code, language):
+        sha256 = content_hash(code)
+        if sha256 in done_hashes:
+            return {"sha256": sha256, "skipped": True}
+        record = {"sha256": sha256}
+        if args.command == "scan":
+            record.update(await analyze_project_file_async(code, language, minify=args.minify))
+        elif args.command == "fix":
+            record["fixed_code"] = await get_fixed_code_with_groq_async(code)
+            record["changed"] = record["fixed_code"].strip() != code.strip()
+        else:
+            record["target_language"] = args.target_language
+            record["converted_code"] = await convert_code_language_async(code, language, args.target_language, args.minify)
+        output = record.get("fixed_code") or record.get("converted_code") or ""
+        if output.startswith(ERROR_PREFIXES):
+            raise RuntimeError(output)
+        return record
+    return task
+
+
+def write_output(args, path: str, record: dict):
+    """Apply a fix in place (--write) or save a converted file (--out-dir)."""
+    if args.command == "fix" and args.write and record.get("changed"):
+        with open(os.path.join(args.directory, path), "w", encoding="utf-8") as file:
+            file.write(record["fixed_code"])
+    elif args.command == "convert" and args.out_dir:
+        target = os.path.join(args.out_dir, converted_path(path, args.target_language))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as file:
+            file.write(record["converted_code"])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="fixifox", description="Scan, fix or convert every source file in a directory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("directory", help="Project directory to process")
+    common.add_argument("-o", "--output", help="JSON Lines file to write (default: standard output)")
+    common.add_argument("--resume", action="store_true", help="Skip files whose content already has a result in --output")
+    common.add_argument("-j", "--workers", type=int, default=BATCH_MAX_WORKERS, help="Files processed at the same time")
+    common.add_argument("--max-file-bytes", type=int, default=BATCH_MAX_FILE_BYTES, help="Skip larger files")
+
+    scan = subparsers.add_parser("scan", parents=[common], help="Security-scan every file")
+    scan.add_argument("--minify", action="store_true", help="Strip comments and docstrings before sending (fewer tokens)")
+    scan.add_argument(
+        "--fail-on",
+        choices=["critical", "high", "medium", "low", "never"],
+        default="high",
+        help="Exit with status 1 if a finding is at least this severe (default: high)"
+    )
+
+    fix = subparsers.add_parser("fix", parents=[common], help="Fix every file")
+    fix.add_argument("--write", action="store_true", help="Overwrite the files with their fixed versions")
+
+    convert = subparsers.add_parser("convert", parents=[common], help="Convert every file to another language")
+    convert.add_argument("--to", dest="target_language", required=True, help="Target language, e.g. Go")
+    convert.add_argument("--out-dir", help="Directory to write the converted files to")
+    convert.add_argument("--minify", action="store_true", help="Strip comments and docstrings before sending (fewer tokens)")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.resume and not args.output:
+        print("--resume needs --output", file=sys.stderr)
+        return 2
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 2
+
+    load_dotenv()
+    if not os.environ.get("GROQ_API_KEY"):
+        print("The GROQ_API_KEY environment variable is required.", file=sys.stderr)
+        return 2
+    set_current_user("cli")
+
+    previous = load_previous_results(args.output, args.command, getattr(args, "target_language", None)) if args.resume else {}
+    fail_rank = SEVERITY_ORDER.get(getattr(args, "fail_on", "never"), -1)
+    worst = min(
+        (severity_rank(issue.get("severity")) for record in previous.values() for issue in record.get("issues", [])),
+        default=len(SEVERITY_ORDER)
+    )
+    counts = {"processed": 0, "skipped": 0, "failed": 0}
+
+    # Keep standard output for the results; diagnostics printed by the features go to stderr
+    output = open(args.output, "a" if args.resume else "w", encoding="utf-8") if args.output else sys.stdout
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        sources = iter_directory_sources(args.directory, args.max_file_bytes)
+        for file_result in run_batch(sources, build_task(args, set(previous)), max_workers=args.workers):
+            record = {"command": args.command, "path": file_result.path, "language": file_result.language}
+            if file_result.error:
+                counts["failed"] += 1
+                record.update(error=file_result.error, elapsed=round(file_result.elapsed, 2))
+            elif file_result.result.get("skipped"):
+                counts["skipped"] += 1
+                continue
+            else:
+                record.update(file_result.result, elapsed=round(file_result.elapsed, 2))
+                # Scan notes mean part of the file was not actually scanned
+                counts["failed" if record.get("notes") else "processed"] += 1
+                worst = min([worst] + [severity_rank(issue.get("severity")) for issue in record.get("issues", [])])
+                write_output(args, file_result.path, record)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    except KeyboardInterrupt:
+        print("Interrupted; rerun with --resume to continue.", file=sys.stderr)
+        return 130
+    finally:
+        sys.stdout = stdout
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"{counts['processed']} files processed, {counts['skipped']} skipped, {counts['failed']} failed",
+        file=sys.stderr
+    )
+    if worst <= fail_rank:
+        return EXIT_FINDINGS
+    if counts["failed"]:
+        return EXIT_FAILED_FILES
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Markdown code-fence extraction that also works on partial (streaming) output.
+"""
+import re
+
+# Opening fence with an optional language tag, e.g. ```python
+FENCE_OPEN = re.compile(r"```[^\n`]*\n")
+
+
+def _strip_partial_fence(text: str) -> str:
+    # Drop a trailing line that may be the first backticks of a closing fence
+    last_newline = text.rfind("\n")
+    last_line = text[last_newline + 1:]
+    if last_line and set(last_line) == {"`"} and len(last_line) < 3:
+        return text[:last_newline + 1]
+    return text
+
+
+def extract_code_block(text: str, partial: bool = False) -> str:
+    """
+    Extract the first fenced code block from a model response.
+
+    Args:
+        text (str): The response text, complete or still streaming.
+        partial (bool, optional): Whether the text may be incomplete. When True,
+            an unclosed block returns everything received so far and a
+            half-written fence is hidden. Defaults to False.
+
+    Returns:
+        str: The code inside the first fence, or the whole text when it has no fence.
+    """
+    match = FENCE_OPEN.search(text)
+    if not match:
+        if partial and "```" in text:
+            # The opening fence line has not fully arrived yet
+            return text[:text.index("```")].strip()
+        if partial:
+            return _strip_partial_fence(text).strip()
+        return text.strip()
+
+    body = text[match.end():]
+    if body.startswith("```"):
+        return ""
+    close = body.find("\n```")
+    if close != -1:
+        return body[:close].strip()
+    if partial:
+        return _strip_partial_fence(body).rstrip()
+    return body.strip()
+
+
+def extract_code_blocks(text: str) -> list:
+    """
+    Extract every complete fenced code block from a model response.
+
+    Args:
+        text (str): The complete response text.
+
+    Returns:
+        list: The code inside each closed fence, in order; empty when the
+            text has no fence.
+    """
+    blocks = []
+    position = 0
+    while True:
+        match = FENCE_OPEN.search(text, position)
+        if not match:
+            return blocks
+        close = text.find("\n```", match.end() - 1)
+        if close == -1:
+            return blocks
+        blocks.append(text[match.end():close].strip())
+        position = text.find("\n", close + 1)
+        if position == -1:
+            return blocks
@@ -0,0 +1,264 @@
+"""
+Split source files into chunks along top-level definitions.
+
+Used by the large-input explanation mode. Python is split with ``ast`` into
+top-level functions and classes (with the module-level statements between
+them); other languages use a brace-depth heuristic, or indentation when the
+code has no braces. Adjacent small pieces are packed together up to a size
+limit and oversized pieces are split further, so every chunk fits in a single
+model request.
+
+split_definitions instead keeps one chunk per top-level definition, with a
+fingerprint that only changes when that definition changes, for incremental
+re-analysis of edited code.
+"""
+import os
+import re
+import ast
+import hashlib
+
+CHUNK_MAX_CHARS = int(os.environ.get("FIXIFOX_CHUNK_MAX_CHARS", "8000"))
+
+# First line of a definition in brace/indent languages: "function foo", "class Foo", "fn foo", ...
+DEFINITION_PATTERN = re.compile(
+    r"\b(?:function|class|interface|struct|enum|trait|impl|def|fn|func|sub|module|namespace)\s+([A-Za-z_$][\w$]*)"
+)
+# C-like function header: "int main(", "public static void run("
+FUNCTION_HEADER_PATTERN = re.compile(r"([A-Za-z_$][\w$]*)\s*\([^;]*$")
+
+
+class CodeChunk:
+    """
+    A contiguous range of source lines.
+
+    Args:
+        start_line (int): First line (1-based, inclusive).
+        end_line (int): Last line (inclusive).
+        text (str): The source text of the range.
+        names (list, optional): Names of the definitions in the range.
+    """
+
+    def __init__(self, start_line: int, end_line: int, text: str, names: list = None):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+        self.names = names or []
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the chunk's text, ignoring surrounding blank lines and trailing whitespace."""
+        normalized = "\n".join(line.rstrip() for line in self.text.strip("\n").splitlines())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def title(self) -> str:
+        label = f"Lines {self.start_line}-{self.end_line}"
+        if self.names:
+            shown = ", ".join(self.names[:6])
+            if len(self.names) > 6:
+                shown += f" and {len(self.names) - 6} more"
+            label += f" ({shown})"
+        return label
+
+
+def _python_node_start(node) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+
+def _python_pieces(nodes: list, first_line: int, last_line: int, prefix: str = "") -> list:
+    # (start, end, names, node) for each statement; comments and blank lines
+    # before a statement belong to it, trailing ones to the last statement
+    pieces = []
+    line = first_line
+    for node in nodes:
+        names = []
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.append(prefix + node.name)
+        pieces.append((line, node.end_lineno, names, node))
+        line = node.end_lineno + 1
+    if pieces and line <= last_line:
+        start, _, names, node = pieces[-1]
+        pieces[-1] = (start, last_line, names, node)
+    return pieces
+
+
+def _split_python(code: str, lines: list, max_chars: int):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    pieces = []
+    for start, end, names, node in _python_pieces(tree.body, 1, len(lines)):
+        size = sum(len(line) for line in lines[start - 1:end])
+        if isinstance(node, ast.ClassDef) and size > max_chars and node.body:
+            # Split a large class into its header and its methods
+            body_start = _python_node_start(node.body[0])
+            if body_start > start:
+                pieces.append((start, body_start - 1, names))
+            class_pieces = _python_pieces(node.body, body_start, end, prefix=f"{node.name}.")
+            pieces.extend((s, e, n) for s, e, n, _ in class_pieces)
+        else:
+            pieces.append((start, end, names))
+    return pieces
+
+
+def _strip_literals(line: str) -> str:
+    # Remove string literals and line comments so braces inside them are not counted
+    line = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`[^`]*`', '""', line)
+    return re.split(r"//|#(?!include|define|if|endif|pragma)", line, maxsplit=1)[0]
+
+
+def _definition_name(line: str):
+    match = DEFINITION_PATTERN.search(line)
+    if match:
+        return match.group(1)
+    match = FUNCTION_HEADER_PATTERN.search(line.strip())
+    if match and match.group(1) not in ("if", "for", "while", "switch", "catch", "return"):
+        return match.group(1)
+    return None
+
+
+def _split_braces(lines: list) -> list:
+    pieces = []
+    depth = 0
+    start = 1
+    opened = False
+    names = []
+    for number, line in enumerate(lines, 1):
+        if depth == 0 and line.strip():
+            name = _definition_name(line)
+            if name:
+                names.append(name)
+        code = _strip_literals(line)
+        opened = opened or "{" in code
+        depth = max(0, depth + code.count("{") - code.count("}"))
+        # A top-level block just closed, or a blank line between top-level statements
+        if depth == 0 and ((opened and "}" in code) or (not line.strip() and not opened and number > start)):
+            pieces.append((start, number, names))
+            start, opened, names = number + 1, False, []
+    if start <= len(lines):
+        pieces.append((start, len(lines), names))
+    return pieces
+
+
+def _split_indent(lines: list) -> list:
+    pieces = []
+    start = 1
+    names = []
+    previous_indented = False
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        top_level = not line[0].isspace()
+        # A new top-level statement after an indented block starts a new piece
+        if top_level and previous_indented and number > start:
+            pieces.append((start, number - 1, names))
+            start, names = number, []
+        if top_level:
+            name = _definition_name(line)
+            if name:
+                names.append(name)
+        previous_indented = not top_level
+    if start <= len(lines):
+        pieces.append((start, len(lines), names))
+    return pieces
+
+
+def _split_lines(start: int, end: int, lines: list, names: list, max_chars: int) -> list:
+    # Last resort for a single piece that is too large: split on line boundaries
+    chunks = []
+    chunk_start = start
+    size = 0
+    for number in range(start, end + 1):
+        line_size = len(lines[number - 1])
+        if size and size + line_size > max_chars:
+            chunks.append((chunk_start, number - 1))
+            chunk_start, size = number, 0
+        size += line_size
+    chunks.append((chunk_start, end))
+    return [
+        CodeChunk(s, e, "".join(lines[s - 1:e]), names if index == 0 else [f"{name} (continued)" for name in names[:1]])
+        for index, (s, e) in enumerate(chunks)
+    ]
+
+
+def _split_pieces(code: str, lines: list, language: str, max_chars: float) -> list:
+    pieces = None
+    if language is None or language.lower() == "python":
+        pieces = _split_python(code, lines, max_chars)
+    if pieces is None:
+        uses_braces = sum(line.count("{") for line in lines) >= 2
+        pieces = _split_braces(lines) if uses_braces else _split_indent(lines)
+    return [piece for piece in pieces if piece[1] >= piece[0]]
+
+
+def split_definitions(code: str, language: str = None) -> list:
+    """
+    Split source code into its top-level definitions, without size packing.
+
+    Consecutive module-level statements between definitions (imports,
+    constants, ...) are kept together as one chunk with no names.
+
+    Args:
+        code (str): The source code.
+        language (str, optional): Programming language, as for split_code.
+
+    Returns:
+        list: CodeChunk objects in source order.
+    """
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    merged = []
+    for start, end, names in _split_pieces(code, lines, language, float("inf")):
+        if merged and not names and not merged[-1][2]:
+            merged[-1] = (merged[-1][0], end, [])
+        else:
+            merged.append((start, end, list(names)))
+    return [CodeChunk(start, end, "".join(lines[start - 1:end]), names) for start, end, names in merged]
+
+
+def split_code(code: str, language: str = None, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    """
+    Split source code into chunks of at most max_chars along definition boundaries.
+
+    Args:
+        code (str): The source code.
+        language (str, optional): Programming language. Python code (or any code
+            that parses as Python when no language is given) is split with ``ast``.
+        max_chars (int, optional): Maximum characters per chunk.
+
+    Returns:
+        list: CodeChunk objects in source order.
+    """
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    pieces = _split_pieces(code, lines, language, max_chars)
+
+    # Pack adjacent pieces into chunks up to max_chars
+    chunks = []
+    current = None  # [start, end, names, size]
+
+    def flush():
+        if current:
+            start, end, names, _ = current
+            chunks.append(CodeChunk(start, end, "".join(lines[start - 1:end]), names))
+
+    for start, end, names in pieces:
+        size = sum(len(line) for line in lines[start - 1:end])
+        if size > max_chars:
+            flush()
+            current = None
+            chunks.extend(_split_lines(start, end, lines, names, max_chars))
+        elif current and current[3] + size <= max_chars:
+            current = [current[0], end, current[2] + names, current[3] + size]
+        else:
+            flush()
+            current = [start, end, list(names), size]
+    flush()
+    return chunks
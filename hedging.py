@@ -0,0 +1,310 @@
+"""
+Hedged requests across a model fallback chain.
+
+Instead of trying the next model only after the previous one has completely
+failed, a HedgePolicy starts the primary model and, if it has not produced its
+first token within a delay derived from observed time-to-first-token
+percentiles, launches the next model in parallel. The first attempt to finish
+successfully wins (or, when streaming, the first attempt to produce a token)
+and the remaining attempts are cancelled.
+"""
+import os
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+HEDGE_PERCENTILE = float(os.environ.get("FIXIFOX_HEDGE_PERCENTILE", "0.9"))
+HEDGE_DEFAULT_DELAY = float(os.environ.get("FIXIFOX_HEDGE_DEFAULT_DELAY", "2.0"))
+HEDGE_MIN_DELAY = float(os.environ.get("FIXIFOX_HEDGE_MIN_DELAY", "0.25"))
+HEDGE_MAX_DELAY = float(os.environ.get("FIXIFOX_HEDGE_MAX_DELAY", "10.0"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("FIXIFOX_HEDGE_MIN_SAMPLES", "5"))
+HEDGE_MAX_WORKERS = int(os.environ.get("FIXIFOX_HEDGE_WORKERS", "32"))
+
+
+class HedgeCancelled(Exception):
+    """Raised inside an attempt when another attempt has already won."""
+
+
+class HedgeError(Exception):
+    """Raised when every model in the chain failed."""
+
+    def __init__(self, failures: dict):
+        self.failures = failures
+        details = "; ".join(f"{model}: {error}" for model, error in failures.items())
+        super().__init__(f"All model attempts failed. Tried: {list(failures)} ({details})")
+
+
+class HedgePolicy:
+    """
+    Reusable hedging policy for model fallback chains.
+
+    An attempt is a callable ``attempt(model, emit, cancel_event) -> str`` that
+    calls ``emit(delta)`` for each piece of output as it arrives, returns the
+    full text when finished, and should stop early (raising HedgeCancelled)
+    once ``cancel_event`` is set.
+    """
+
+    def __init__(
+        self,
+        percentile: float = HEDGE_PERCENTILE,
+        default_delay: float = HEDGE_DEFAULT_DELAY,
+        min_delay: float = HEDGE_MIN_DELAY,
+        max_delay: float = HEDGE_MAX_DELAY,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = 200,
+        max_workers: int = HEDGE_MAX_WORKERS
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies = {}
+        self._hedges_launched = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fixifox-hedge")
+
+    def record_first_token(self, model: str, seconds: float):
+        """Record an observed time-to-first-token for a model."""
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, model: str) -> float:
+        """
+        Return how long to wait for the model's first token before hedging.
+
+        Uses the configured percentile of recent time-to-first-token samples,
+        or the default delay until enough samples have been collected.
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < self.min_samples:
+            delay = self.default_delay
+        else:
+            index = min(len(samples) - 1, int(self.percentile * len(samples)))
+            delay = samples[index]
+        return max(self.min_delay, min(self.max_delay, delay))
+
+    def stats(self) -> dict:
+        """Return per-model hedge delays and the number of hedges launched."""
+        with self._lock:
+            models = list(self._latencies)
+            hedges = self._hedges_launched
+        return {
+            "hedges_launched": hedges,
+            "delays": {model: self.hedge_delay(model) for model in models},
+        }
+
+    def _race(self, models: list, attempt, streaming: bool):
+        # Yields ("delta", text) while streaming and finally ("result", model, text)
+        if not models:
+            raise ValueError("At least one model is required")
+
+        events = queue.Queue()
+        cancels = {}
+        failures = {}
+        finished = set()
+        state = {"next": 0}
+
+        def run(model, cancel_event, started):
+            first = [True]
+
+            def emit(delta):
+                if first[0]:
+                    first[0] = False
+                    self.record_first_token(model, time.time() - started)
+                    events.put((model, "first_token", None))
+                events.put((model, "delta", delta))
+
+            try:
+                text = attempt(model, emit, cancel_event)
+                events.put((model, "done", text))
+            except Exception as e:
+                events.put((model, "error", e))
+
+        def launch():
+            model = models[state["next"]]
+            state["next"] += 1
+            cancels[model] = threading.Event()
+            # Carry the caller's context (e.g. the current user) into the worker
+            context = contextvars.copy_context()
+            self._executor.submit(context.run, run, model, cancels[model], time.time())
+            return model
+
+        def cancel_others(winner):
+            for model, cancel_event in cancels.items():
+                if model != winner:
+                    cancel_event.set()
+
+        current = launch()
+        hedge_deadline = time.time() + self.hedge_delay(current)
+        got_first_token = False
+        leader = None
+
+        try:
+            while True:
+                timeout = None
+                if not got_first_token and state["next"] < len(models):
+                    timeout = max(0.0, hedge_deadline - time.time())
+
+                try:
+                    model, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    # Nobody has produced a token in time: hedge with the next model
+                    with self._lock:
+                        self._hedges_launched += 1
+                    current = launch()
+                    hedge_deadline = time.time() + self.hedge_delay(current)
+                    continue
+
+                if model in finished:
+                    continue
+
+                if kind == "first_token":
+                    got_first_token = True
+                    if streaming and leader is None:
+                        leader = model
+                        cancel_others(leader)
+                elif kind == "delta":
+                    if streaming and model == leader:
+                        yield ("delta", payload)
+                elif kind == "done":
+                    if streaming and leader is not None and model != leader:
+                        continue
+                    cancel_others(model)
+                    yield ("result", model, payload)
+                    return
+                elif kind == "error":
+                    finished.add(model)
+                    if isinstance(payload, HedgeCancelled):
+                        continue
+                    failures[model] = payload
+                    if streaming and model == leader:
+                        # Output was already shown; switching models now would duplicate it
+                        raise payload
+                    if state["next"] < len(models):
+                        current = launch()
+                        hedge_deadline = time.time() + self.hedge_delay(current)
+                    elif len(finished) == len(cancels):
+                        raise HedgeError(failures)
+        finally:
+            for cancel_event in cancels.values():
+                cancel_event.set()
+
+    def execute(self, models: list, attempt) -> tuple:
+        """
+        Run a hedged request and return the first successful result.
+
+        Args:
+            models (list): Model names in preference order.
+            attempt (callable): ``attempt(model, emit, cancel_event) -> str``.
+
+        Returns:
+            tuple: (winning model, response text)
+
+        Raises:
+            HedgeError: If every model failed.
+        """
+        for event in self._race(models, attempt, streaming=False):
+            if event[0] == "result":
+                return event[1], event[2]
+        raise HedgeError({})
+
+    async def execute_async(self, models: list, attempt) -> tuple:
+        """
+        Async counterpart of execute, racing attempts as tasks on the running loop.
+
+        Args:
+            models (list): Model names in preference order.
+            attempt (callable): ``async attempt(model, emit) -> str``. Losing
+                attempts are cancelled with asyncio task cancellation.
+
+        Returns:
+            tuple: (winning model, response text)
+
+        Raises:
+            HedgeError: If every model failed.
+        """
+        if not models:
+            raise ValueError("At least one model is required")
+
+        loop = asyncio.get_running_loop()
+        tasks = {}
+        failures = {}
+        first_token = asyncio.Event()
+        state = {"next": 0, "hedge_deadline": 0.0}
+
+        def launch():
+            model = models[state["next"]]
+            state["next"] += 1
+            started = time.time()
+            first = [True]
+
+            def emit(delta):
+                if first[0]:
+                    first[0] = False
+                    self.record_first_token(model, time.time() - started)
+                    first_token.set()
+
+            tasks[asyncio.ensure_future(attempt(model, emit))] = model
+            state["hedge_deadline"] = loop.time() + self.hedge_delay(model)
+
+        launch()
+        pending = set(tasks)
+        try:
+            while pending:
+                timeout = None
+                if not first_token.is_set() and state["next"] < len(models):
+                    timeout = max(0.0, state["hedge_deadline"] - loop.time())
+
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if not first_token.is_set():
+                        # Nobody has produced a token in time: hedge with the next model
+                        with self._lock:
+                            self._hedges_launched += 1
+                        launch()
+                        pending = set(task for task in tasks if not task.done())
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        return tasks[task], task.result()
+                    failures[tasks[task]] = task.exception()
+                    if state["next"] < len(models):
+                        launch()
+                pending = set(task for task in tasks if not task.done())
+            raise HedgeError(failures)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stream(self, models: list, attempt):
+        """
+        Run a hedged streaming request, yielding text deltas from the winner.
+
+        The first attempt to produce a token becomes the leader; the others are
+        cancelled and only the leader's deltas are yielded.
+        """
+        for event in self._race(models, attempt, streaming=True):
+            if event[0] == "delta":
+                yield event[1]
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """Return the process-wide hedge policy."""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = HedgePolicy()
+    return _policy
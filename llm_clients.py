@@ -0,0 +1,177 @@
+"""
+Process-wide registry of LLM provider clients.
+
+Streamlit re-executes app.py on every interaction, so anything created inside
+the script is rebuilt on each rerun. This module is imported once per process,
+which lets every session share the same Groq client (and its pooled HTTP
+keep-alive connections) and the same Gemini model handles. The async Groq
+client is used from the shared event loop in async_runtime.py.
+"""
+import os
+import threading
+
+import httpx
+from groq import Groq, AsyncGroq
+import google.generativeai as genai
+
+from async_runtime import submit
+
+# Connection pool settings (override through environment variables)
+HTTP_MAX_CONNECTIONS = int(os.environ.get("FIXIFOX_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("FIXIFOX_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("FIXIFOX_HTTP_KEEPALIVE_EXPIRY", "120"))
+HTTP_TIMEOUT = float(os.environ.get("FIXIFOX_HTTP_TIMEOUT", "60"))
+
+# Gemini models that are created (and connected) when the app starts
+PREWARM_GEMINI_MODELS = ["gemini-2.0-flash"]
+
+_lock = threading.Lock()
+_groq_api_key = None
+_google_api_key = None
+_groq_client = None
+_async_groq_client = None
+_gemini_configured = False
+_gemini_models = {}
+
+
+def configure_clients(groq_api_key: str = None, google_api_key: str = None) -> None:
+    """
+    Set the API keys used by the shared clients.
+
+    Args:
+        groq_api_key (str, optional): Groq API key. Defaults to the GROQ_API_KEY environment variable.
+        google_api_key (str, optional): Google API key. Defaults to the GOOGLE_API_KEY environment variable.
+    """
+    global _groq_api_key, _google_api_key, _gemini_configured
+    with _lock:
+        _groq_api_key = groq_api_key
+        _google_api_key = google_api_key
+        _gemini_configured = False
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _build_http_client() -> httpx.Client:
+    return httpx.Client(limits=_http_limits(), timeout=HTTP_TIMEOUT)
+
+
+def get_groq_client() -> Groq:
+    """
+    Return the shared Groq client, creating it on first use.
+
+    The client is thread-safe and keeps a pool of keep-alive connections, so
+    concurrent sessions reuse TLS connections instead of opening new ones.
+    """
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                _groq_client = Groq(
+                    api_key=_groq_api_key or os.environ.get("GROQ_API_KEY"),
+                    http_client=_build_http_client(),
+                    # Retries are handled by resilience.py
+                    max_retries=0,
+                )
+    return _groq_client
+
+
+def get_async_groq_client() -> AsyncGroq:
+    """
+    Return the shared async Groq client, creating it on first use.
+
+    Its connection pool belongs to the event loop it is first used on, so it
+    must only be used from the shared loop in async_runtime.py.
+    """
+    global _async_groq_client
+    if _async_groq_client is None:
+        with _lock:
+            if _async_groq_client is None:
+                _async_groq_client = AsyncGroq(
+                    api_key=_groq_api_key or os.environ.get("GROQ_API_KEY"),
+                    http_client=httpx.AsyncClient(limits=_http_limits(), timeout=HTTP_TIMEOUT),
+                    # Retries are handled by resilience.py
+                    max_retries=0,
+                )
+    return _async_groq_client
+
+
+def _ensure_gemini_configured() -> None:
+    global _gemini_configured
+    if not _gemini_configured:
+        genai.configure(api_key=_google_api_key or os.environ.get("GOOGLE_API_KEY"))
+        _gemini_configured = True
+
+
+def get_gemini_model(model_name: str = "gemini-2.0-flash") -> genai.GenerativeModel:
+    """
+    Return a shared Gemini model handle for the given model name.
+
+    Args:
+        model_name (str, optional): The Gemini model to use. Defaults to 'gemini-2.0-flash'.
+
+    Returns:
+        genai.GenerativeModel: A cached model instance.
+    """
+    model = _gemini_models.get(model_name)
+    if model is None:
+        with _lock:
+            _ensure_gemini_configured()
+            model = _gemini_models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _gemini_models[model_name] = model
+    return model
+
+
+def prewarm_clients(gemini_models: list = None) -> None:
+    """
+    Create the shared clients (sync and async Groq, Gemini) and open their
+    connections ahead of the first request.
+
+    Warm-up requests are best effort: failures are ignored so a provider outage
+    never blocks the app from starting.
+
+    Args:
+        gemini_models (list, optional): Gemini model names to create. Defaults to PREWARM_GEMINI_MODELS.
+    """
+    try:
+        # Listing models is cheap and leaves an open keep-alive connection in the pool
+        get_groq_client().models.list()
+    except Exception as e:
+        print(f"Groq client warm-up failed: {e}")
+
+    try:
+        # Most calls use the async client, whose pool lives on the shared event loop
+        submit(get_async_groq_client().models.list()).result(timeout=HTTP_TIMEOUT)
+    except Exception as e:
+        print(f"Async Groq client warm-up failed: {e}")
+
+    for model_name in gemini_models or PREWARM_GEMINI_MODELS:
+        try:
+            get_gemini_model(model_name)
+            genai.get_model(f"models/{model_name}")
+        except Exception as e:
+            print(f"Gemini client warm-up failed for {model_name}: {e}")
+
+
+def start_prewarm(gemini_models: list = None) -> threading.Thread:
+    """
+    Run prewarm_clients in a background thread so app startup is not delayed.
+
+    Returns:
+        threading.Thread: The warm-up thread.
+    """
+    thread = threading.Thread(
+        target=prewarm_clients,
+        args=(gemini_models,),
+        name="llm-client-prewarm",
+        daemon=True,
+    )
+    thread.start()
+    return thread
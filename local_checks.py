@@ -0,0 +1,317 @@
+"""
+Deterministic checks that run locally before Debug and Analyze ask the model.
+
+Python is compiled and its AST is checked for undefined names, unused
+imports and unreachable statements. Other languages get a syntax-only check
+when their toolchain is installed (node, gcc, g++, gofmt, ruby, php). The
+toolchain runs confined like sandboxed code (see sandbox.run_tool), because
+compilers read files named in the code (#include); the check is skipped
+where that is not possible. The results come back in milliseconds, are
+shown right away, and a compact summary is added to the prompt so the model
+starts from confirmed facts instead of rediscovering them.
+"""
+import os
+import re
+import ast
+import time
+import shutil
+import builtins
+
+from sandbox import run_tool, sandbox_isolation_available
+
+# Seconds a toolchain syntax check may take
+LOCAL_CHECK_TIMEOUT = float(os.environ.get("FIXIFOX_LOCAL_CHECK_TIMEOUT", "5"))
+# At most this many findings are listed in the prompt
+LOCAL_CHECK_MAX_PROMPT_FINDINGS = int(os.environ.get("FIXIFOX_LOCAL_CHECK_MAX_PROMPT_FINDINGS", "20"))
+
+# language: (file extension, command; {file} is replaced by the source file)
+SYNTAX_CHECKERS = {
+    "JavaScript": (".js", ["node", "--check", "{file}"]),
+    "C": (".c", ["gcc", "-fsyntax-only", "{file}"]),
+    "C++": (".cpp", ["g++", "-fsyntax-only", "{file}"]),
+    "Go": (".go", ["gofmt", "-e", "-l", "{file}"]),
+    "Ruby": (".rb", ["ruby", "-c", "{file}"]),
+    "PHP": (".php", ["php", "-l", "{file}"]),
+}
+
+# Names that exist in every module without being bound
+MODULE_NAMES = set(dir(builtins)) | {"__file__", "__name__", "__doc__", "__builtins__", "__spec__", "__loader__", "__package__", "__annotations__", "__path__", "__class__"}
+
+DIAGNOSTIC_LINE = re.compile(r"^:(\d+)(?::\d+)?:?\s*(.*)")
+PHP_DIAGNOSTIC_LINE = re.compile(r"^(?:PHP )?(?:Parse|Fatal) error:\s*(.*) in .* on line (\d+)")
+
+
+class Diagnostic:
+    """
+    One local finding.
+
+    Args:
+        severity (str): "error" or "warning".
+        line (int): 1-based line, or 0 when unknown.
+        message (str): Description of the problem.
+    """
+
+    def __init__(self, severity: str, line: int, message: str):
+        self.severity = severity
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        location = f"Line {self.line}" if self.line else "Code"
+        return f"{location}: {self.severity}: {self.message}"
+
+
+class LocalCheckReport:
+    """
+    Result of the local checks for one piece of code.
+
+    Args:
+        language (str): Language that was checked.
+        checker (str): What ran, e.g. "python" or "gcc", or None if no
+            checker is available for the language.
+        diagnostics (list): Diagnostic objects, in line order.
+        elapsed (float): Seconds the checks took.
+    """
+
+    def __init__(self, language: str, checker: str, diagnostics: list, elapsed: float):
+        self.language = language
+        self.checker = checker
+        self.diagnostics = diagnostics
+        self.elapsed = elapsed
+
+    @property
+    def errors(self) -> list:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.severity == "error"]
+
+    def prompt_summary(self) -> str:
+        """
+        Compact summary of the findings to add to a prompt.
+
+        Returns:
+            str: The summary, or an empty string if no checker ran.
+        """
+        if not self.checker:
+            return ""
+        checks = "compile, undefined names, unused imports, unreachable code" if self.checker == "python" else f"{self.checker} syntax check"
+        if not self.diagnostics:
+            return f"Local checks ({checks}) found no problems; do not look for syntax errors."
+        listed = self.diagnostics[:LOCAL_CHECK_MAX_PROMPT_FINDINGS]
+        lines = [f"Local checks ({checks}) confirmed these problems; explain and fix them without re-deriving them:"]
+        lines += [f"- {diagnostic}" for diagnostic in listed]
+        if len(self.diagnostics) > len(listed):
+            lines.append(f"- ... and {len(self.diagnostics) - len(listed)} more")
+        return "\n".join(lines)
+
+
+class _Names(ast.NodeVisitor):
+    # Every bound and every loaded name of a module, without scoping: a name
+    # bound anywhere counts as defined, so only certain problems are reported
+    def __init__(self):
+        self.bound = set()
+        self.loaded = set()
+        self.loads = []
+        self.imports = []
+        self.star_import = False
+        self.exported = set()
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loaded.add(node.id)
+            self.loads.append(node)
+        else:
+            self.bound.add(node.id)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            self.bound.add(name)
+            self.imports.append((node.lineno, name, alias.name))
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_import = True
+                continue
+            name = alias.asname or alias.name
+            self.bound.add(name)
+            if node.module != "__future__":
+                self.imports.append((node.lineno, name, f"{node.module or ''}.{alias.name}"))
+
+    def visit_FunctionDef(self, node):
+        self.bound.add(node.name)
+        arguments = node.args
+        for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]:
+            if argument:
+                self.bound.add(argument.arg)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        arguments = node.args
+        for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]:
+            if argument:
+                self.bound.add(argument.arg)
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node):
+        self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_Global(self, node):
+        self.bound.update(node.names)
+
+    visit_Nonlocal = visit_Global
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.bound.add(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self.bound.add(node.rest)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        # __all__ = ["name", ...] exports imported names
+        if any(isinstance(target, ast.Name) and target.id == "__all__" for target in node.targets):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                self.exported.update(
+                    element.value for element in node.value.elts
+                    if isinstance(element, ast.Constant) and isinstance(element.value, str)
+                )
+        self.generic_visit(node)
+
+
+def _unreachable(tree) -> list:
+    # The first statement after return/raise/break/continue in each block
+    diagnostics = []
+    for node in ast.walk(tree):
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if not isinstance(block, list):
+                continue
+            for index, statement in enumerate(block[:-1]):
+                if isinstance(statement, (ast.Return, ast.Raise, ast.Break, ast.Continue)):
+                    keyword = type(statement).__name__.lower()
+                    diagnostics.append(Diagnostic("warning", block[index + 1].lineno, f"unreachable code after '{keyword}'"))
+                    break
+    return diagnostics
+
+
+def check_python(code: str) -> list:
+    """
+    Compile Python code and check it for undefined names, unused imports and unreachable code.
+
+    Returns:
+        list: Diagnostic objects. A syntax error stops the other checks.
+    """
+    try:
+        tree = compile(code, "<code>", "exec", ast.PyCF_ONLY_AST)
+    except SyntaxError as error:
+        return [Diagnostic("error", error.lineno or 0, f"SyntaxError: {error.msg}")]
+    except ValueError as error:
+        # e.g. null bytes in the source
+        return [Diagnostic("error", 0, str(error))]
+
+    names = _Names()
+    names.visit(tree)
+    diagnostics = []
+    if not names.star_import:
+        reported = set()
+        for node in names.loads:
+            if node.id not in names.bound and node.id not in MODULE_NAMES and node.id not in reported:
+                reported.add(node.id)
+                diagnostics.append(Diagnostic("error", node.lineno, f"undefined name '{node.id}'"))
+
+    # An import is used if its name is loaded or exported (attribute access loads the base name)
+    for line, name, imported in names.imports:
+        if name not in names.loaded and name not in names.exported:
+            diagnostics.append(Diagnostic("warning", line, f"'{imported}' imported but unused"))
+
+    diagnostics += _unreachable(tree)
+    return sorted(diagnostics, key=lambda diagnostic: diagnostic.line)
+
+
+def _parse_toolchain_output(output: str, file_name: str) -> list:
+    diagnostics = []
+    pending_line = 0
+    for text in output.splitlines():
+        php = PHP_DIAGNOSTIC_LINE.match(text)
+        if php:
+            diagnostics.append(Diagnostic("error", int(php.group(2)), php.group(1)))
+            continue
+        if file_name not in text:
+            # node prints "file:LINE" and the message a few lines later
+            if pending_line and re.match(r"\w*Error\b", text):
+                diagnostics.append(Diagnostic("error", pending_line, text.strip()))
+                pending_line = 0
+            continue
+        match = DIAGNOSTIC_LINE.search(text.rsplit(file_name, 1)[1])
+        if not match:
+            continue
+        message = match.group(2).strip()
+        if not message:
+            pending_line = int(match.group(1))
+            continue
+        if message.startswith("note"):
+            continue
+        severity = "warning" if message.startswith("warning") else "error"
+        diagnostic = Diagnostic(severity, int(match.group(1)), re.sub(r"^(fatal )?(error|warning):\s*", "", message))
+        if str(diagnostic) not in {str(previous) for previous in diagnostics}:
+            diagnostics.append(diagnostic)
+    return diagnostics
+
+
+def check_syntax_with_toolchain(code: str, language: str):
+    """
+    Syntax-check code with the language's local toolchain.
+
+    Returns:
+        tuple: (checker name, list of Diagnostic objects), or (None, []) when
+            no toolchain is installed for the language or it cannot be run
+            confined.
+    """
+    extension, command = SYNTAX_CHECKERS.get(language, (None, None))
+    if not command or not shutil.which(command[0]) or not sandbox_isolation_available():
+        return None, []
+    file_name = "main" + extension
+    exit_code, output, errors, timed_out = run_tool(
+        [part.replace("{file}", file_name) for part in command], file_name, code, LOCAL_CHECK_TIMEOUT
+    )
+    if timed_out:
+        return command[0], [Diagnostic("warning", 0, f"{command[0]} syntax check timed out")]
+    diagnostics = _parse_toolchain_output(output + errors, file_name)
+    if exit_code and not any(diagnostic.severity == "error" for diagnostic in diagnostics):
+        lines = (errors or output).strip().splitlines()
+        diagnostics.append(Diagnostic("error", 0, lines[-1] if lines else f"{command[0]} exited with status {exit_code}"))
+    return command[0], sorted(diagnostics, key=lambda diagnostic: diagnostic.line)
+
+
+def run_local_checks(code: str, language: str) -> LocalCheckReport:
+    """
+    Run the local checks available for a language.
+
+    Args:
+        code (str): The source code.
+        language (str): Language name as shown in the app, e.g. "Python" or "C++".
+
+    Returns:
+        LocalCheckReport: The findings; checker is None if nothing could be checked.
+    """
+    started = time.perf_counter()
+    if language == "Python":
+        checker, diagnostics = "python", check_python(code)
+    else:
+        checker, diagnostics = check_syntax_with_toolchain(code, language)
+    return LocalCheckReport(language, checker, diagnostics, time.perf_counter() - started)
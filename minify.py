@@ -0,0 +1,230 @@
+"""
+Optional source compaction before code is sent to a model.
+
+Comments, docstrings, trailing whitespace and blank lines are removed, which
+often saves a third of the tokens of well-documented code. Python is handled
+with ``tokenize`` and ``ast``; the other languages in the conversion list use
+lexical rules for their strings and comments. Every kept line remembers its
+original line number, so line references in the model's response can be
+mapped back to the code the user sees.
+"""
+import io
+import re
+import ast
+import tokenize
+
+# Line comment markers per language (block comments are /* ... */ for all of them)
+LINE_COMMENT_MARKERS = {
+    "php": ("//", "#"),
+}
+# Languages where '...' is a string rather than a character literal
+SINGLE_QUOTE_STRING_LANGUAGES = {"javascript", "typescript", "php", "dart"}
+
+# "line 12", "Line 3", "lines 4-7", "lines 4 to 7", "L12"
+LINE_REFERENCE = re.compile(r"\b([Ll]ines?\s+|L)(\d+)(?:(\s*(?:-|–|to|and)\s*)(\d+))?\b")
+CHAR_LITERAL = re.compile(r"'(?:\\.|[^\\'\n]){1,8}'")
+
+
+class MinifiedSource:
+    """
+    Compacted code with the original line number of each of its lines.
+
+    Args:
+        code (str): The compacted code.
+        line_map (list): line_map[i] is the original line number of line i + 1.
+    """
+
+    def __init__(self, code: str, line_map: list):
+        self.code = code
+        self.line_map = line_map
+
+    def original_line(self, line: int) -> int:
+        """Map a 1-based line of the compacted code to the original line (unchanged if out of range)."""
+        if 1 <= line <= len(self.line_map):
+            return self.line_map[line - 1]
+        return line
+
+    def remap_line_references(self, text: str) -> str:
+        """Rewrite "line N" style references in a model response to original line numbers."""
+        def replace(match):
+            prefix, first, separator, last = match.groups()
+            result = f"{prefix}{self.original_line(int(first))}"
+            if last:
+                result += f"{separator}{self.original_line(int(last))}"
+            return result
+        return LINE_REFERENCE.sub(replace, text)
+
+
+def _before_offset(line: str, offset: int) -> str:
+    # ast column offsets count UTF-8 bytes, not characters
+    return line.encode("utf-8")[:offset].decode("utf-8", "replace")
+
+
+def _after_offset(line: str, offset: int) -> str:
+    return line.encode("utf-8")[offset:].decode("utf-8", "replace")
+
+
+def _python_docstrings(tree, lines: list) -> dict:
+    # {first line: (last line, replacement)} for docstrings on lines of their own
+    docstrings = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) or not node.body:
+            continue
+        first = node.body[0]
+        if not (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str)):
+            continue
+        rest = _after_offset(lines[first.end_lineno - 1], first.end_col_offset).strip()
+        if first.lineno == getattr(node, "lineno", 0) or _before_offset(lines[first.lineno - 1], first.col_offset).strip() or rest:
+            # Shares a line with other code: leave it
+            continue
+        # A body made only of a docstring still needs a statement
+        replacement = None
+        if len(node.body) == 1 and not isinstance(node, ast.Module):
+            replacement = _before_offset(lines[first.lineno - 1], first.col_offset) + "pass"
+        docstrings[first.lineno] = (first.end_lineno, replacement)
+    return docstrings
+
+
+def _minify_python(code: str):
+    try:
+        tree = ast.parse(code)
+        tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (SyntaxError, tokenize.TokenError, IndentationError):
+        return None
+
+    lines = code.splitlines()
+    protected = set()  # lines inside multi-line strings: kept exactly as they are
+    for token in tokens:
+        if token.type == tokenize.STRING and token.end[0] > token.start[0]:
+            protected.update(range(token.start[0] + 1, token.end[0] + 1))
+        elif token.type == tokenize.COMMENT:
+            row, column = token.start
+            lines[row - 1] = lines[row - 1][:column]
+
+    docstrings = _python_docstrings(tree, lines)
+    kept = []
+    line_map = []
+    number = 1
+    while number <= len(lines):
+        if number in docstrings:
+            last, replacement = docstrings[number]
+            if replacement:
+                kept.append(replacement)
+                line_map.append(number)
+            number = last + 1
+            continue
+        line = lines[number - 1]
+        if number in protected:
+            kept.append(line)
+            line_map.append(number)
+        elif line.strip():
+            kept.append(line.rstrip())
+            line_map.append(number)
+        number += 1
+    return kept, line_map
+
+
+def _minify_lexical(code: str, language: str):
+    # Blank out comments with a small scanner that skips string literals,
+    # keeping newlines so line numbers stay aligned
+    markers = LINE_COMMENT_MARKERS.get(language, ("//",))
+    single_quote_strings = language in SINGLE_QUOTE_STRING_LANGUAGES
+    output = []
+    open_at_line_end = set()
+    line = 1
+    index = 0
+    quote = None
+    length = len(code)
+    while index < length:
+        char = code[index]
+        if quote:
+            if char == "\\" and quote != "`":
+                if code.startswith("\n", index + 1):
+                    open_at_line_end.add(line)
+                    line += 1
+                output.append(code[index:index + 2])
+                index += 2
+                continue
+            if code.startswith(quote, index):
+                output.append(quote)
+                index += len(quote)
+                quote = None
+                continue
+            if char == "\n":
+                open_at_line_end.add(line)
+                line += 1
+            output.append(char)
+            index += 1
+        elif code.startswith("/*", index):
+            end = code.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+            newlines = code.count("\n", index, end)
+            output.append("\n" * newlines)
+            line += newlines
+            index = end
+        elif any(code.startswith(marker, index) for marker in markers):
+            end = code.find("\n", index)
+            index = length if end == -1 else end
+        elif code.startswith('"""', index):
+            quote = '"""'
+            output.append(quote)
+            index += 3
+        elif char in '"`' or (char == "'" and single_quote_strings):
+            quote = char
+            output.append(char)
+            index += 1
+        elif char == "'":
+            # Character literal, or a lone quote such as a Rust lifetime
+            match = CHAR_LITERAL.match(code, index)
+            literal = match.group(0) if match else char
+            output.append(literal)
+            index += len(literal)
+        else:
+            if char == "\n":
+                line += 1
+            output.append(char)
+            index += 1
+
+    kept = []
+    line_map = []
+    for number, text in enumerate("".join(output).split("\n"), 1):
+        inside_string = number - 1 in open_at_line_end
+        if number in open_at_line_end or inside_string:
+            kept.append(text)
+            line_map.append(number)
+        elif text.strip():
+            kept.append(text.rstrip())
+            line_map.append(number)
+    return kept, line_map
+
+
+def minify_source(code: str, language: str = None, first_line: int = 1) -> MinifiedSource:
+    """
+    Remove comments, docstrings, trailing whitespace and blank lines from code.
+
+    Args:
+        code (str): The source code.
+        language (str, optional): Programming language. Python (or unknown
+            code that parses as Python) uses the tokenizer; other languages use
+            lexical rules. Unknown code that does not parse as Python only
+            loses trailing whitespace and blank lines.
+        first_line (int, optional): Original line number of the code's first
+            line, when the code is a part of a larger file.
+
+    Returns:
+        MinifiedSource: The compacted code and its line map.
+    """
+    language = (language or "").lower()
+    result = None
+    if language in ("", "python"):
+        result = _minify_python(code)
+    if result is None and language not in ("", "python"):
+        result = _minify_lexical(code, language)
+    if result is None:
+        lines = code.splitlines()
+        result = (
+            [line.rstrip() for line in lines if line.strip()],
+            [number for number, line in enumerate(lines, 1) if line.strip()],
+        )
+    kept, line_map = result
+    return MinifiedSource("\n".join(kept) + "\n", [number + first_line - 1 for number in line_map])
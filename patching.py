@@ -0,0 +1,232 @@
+"""
+Parse and apply model-generated patches.
+
+For large files "Fix the code" asks the model for only the changed hunks,
+either as SEARCH/REPLACE blocks or as a unified diff, and applies them here.
+Each hunk is located exactly first, then ignoring whitespace, then by fuzzy
+similarity of its context lines; a hunk that cannot be located unambiguously
+raises PatchError so the caller can fall back to asking for the whole file.
+"""
+import re
+import ast
+import difflib
+
+PATCH_FUZZY_THRESHOLD = 0.85
+
+SEARCH_MARKER = re.compile(r"^\s*<{5,9}\s*SEARCH\s*$")
+DIVIDER_MARKER = re.compile(r"^\s*={5,9}\s*$")
+REPLACE_MARKER = re.compile(r"^\s*>{5,9}\s*REPLACE\s*$")
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class PatchError(Exception):
+    """Raised when a patch cannot be parsed or applied safely."""
+
+
+class Hunk:
+    """
+    One change: replace the ``search`` lines with the ``replace`` lines.
+
+    Args:
+        search (list): Lines to find in the original code.
+        replace (list): Lines to put in their place.
+        line_hint (int, optional): 1-based line where the search lines are expected.
+    """
+
+    def __init__(self, search: list, replace: list, line_hint: int = None):
+        self.search = search
+        self.replace = replace
+        self.line_hint = line_hint
+
+
+def parse_search_replace(text: str) -> list:
+    """Parse SEARCH/REPLACE blocks from a model response."""
+    hunks = []
+    state = None
+    search, replace = [], []
+    for line in text.splitlines():
+        if SEARCH_MARKER.match(line):
+            state, search, replace = "search", [], []
+        elif state == "search" and DIVIDER_MARKER.match(line):
+            state = "replace"
+        elif state == "replace" and REPLACE_MARKER.match(line):
+            hunks.append(Hunk(search, replace))
+            state = None
+        elif state == "search":
+            search.append(line)
+        elif state == "replace":
+            replace.append(line)
+    if state is not None:
+        raise PatchError("Unterminated SEARCH/REPLACE block")
+    return hunks
+
+
+def parse_unified_diff(text: str) -> list:
+    """Parse the hunks of a unified diff from a model response."""
+    hunks = []
+    current = None
+    for line in text.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = Hunk([], [], int(header.group(1)))
+            hunks.append(current)
+        elif current is None or line.startswith(("--- ", "+++ ", "\\")):
+            # File headers and "\ No newline at end of file"
+            continue
+        elif line.startswith(("```", "diff ")):
+            current = None
+        elif line.startswith("-"):
+            current.search.append(line[1:])
+        elif line.startswith("+"):
+            current.replace.append(line[1:])
+        elif line.startswith(" ") or not line:
+            current.search.append(line[1:])
+            current.replace.append(line[1:])
+        else:
+            current = None
+    return hunks
+
+
+def parse_patch(text: str) -> list:
+    """
+    Parse a model response into hunks, accepting SEARCH/REPLACE blocks or a unified diff.
+
+    Raises:
+        PatchError: If the response contains no hunks.
+    """
+    hunks = parse_search_replace(text) or parse_unified_diff(text)
+    if not hunks:
+        raise PatchError("No patch hunks found in the response")
+    return hunks
+
+
+def _find(lines: list, search: list, key) -> list:
+    wanted = [key(line) for line in search]
+    size = len(wanted)
+    keyed = [key(line) for line in lines]
+    return [i for i in range(len(lines) - size + 1) if keyed[i:i + size] == wanted]
+
+
+def _pick(positions: list, hunk: Hunk):
+    if len(positions) == 1:
+        return positions[0]
+    if positions and hunk.line_hint is not None:
+        # Several identical places: trust the diff's line number
+        return min(positions, key=lambda i: abs(i + 1 - hunk.line_hint))
+    return None
+
+
+def _fuzzy_find(lines: list, search: list):
+    # Best window of the same length whose stripped text is similar enough
+    wanted = "\n".join(line.strip() for line in search)
+    size = len(search)
+    scores = []
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(wanted)
+    for i in range(len(lines) - size + 1):
+        matcher.set_seq1("\n".join(line.strip() for line in lines[i:i + size]))
+        if matcher.real_quick_ratio() < PATCH_FUZZY_THRESHOLD or matcher.quick_ratio() < PATCH_FUZZY_THRESHOLD:
+            continue
+        scores.append((matcher.ratio(), i))
+    scores.sort(reverse=True)
+    if not scores or scores[0][0] < PATCH_FUZZY_THRESHOLD:
+        return None
+    if len(scores) > 1 and scores[1][0] == scores[0][0]:
+        return None
+    return scores[0][1]
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _reindent(replace: list, search: list, matched: list) -> list:
+    # The model may have shifted indentation; apply the same shift to its replacement
+    search_line = next((line for line in search if line.strip()), None)
+    matched_line = next((line for line in matched if line.strip()), None)
+    if search_line is None or matched_line is None:
+        return replace
+    have, want = _indent(search_line), _indent(matched_line)
+    if have == want:
+        return replace
+    result = []
+    for line in replace:
+        if line.startswith(have):
+            line = want + line[len(have):]
+        result.append(line)
+    return result
+
+
+def apply_hunks(code: str, hunks: list) -> str:
+    """
+    Apply hunks in order to the code.
+
+    Raises:
+        PatchError: If a hunk cannot be located unambiguously.
+    """
+    lines = code.splitlines()
+    for number, hunk in enumerate(hunks, 1):
+        search = hunk.search
+        # Ignore blank lines the model added around the block
+        while search and not search[0].strip():
+            search = search[1:]
+        while search and not search[-1].strip():
+            search = search[:-1]
+        if not search:
+            if hunk.line_hint is None:
+                raise PatchError(f"Hunk {number} has no lines to match")
+            position = max(0, min(len(lines), hunk.line_hint - 1))
+            lines[position:position] = hunk.replace
+            continue
+
+        replace = hunk.replace
+        position = _pick(_find(lines, search, lambda line: line.rstrip()), hunk)
+        if position is None:
+            position = _pick(_find(lines, search, lambda line: line.strip()), hunk)
+        if position is None:
+            position = _fuzzy_find(lines, search)
+        if position is None:
+            raise PatchError(f"Hunk {number} does not match the code")
+
+        matched = lines[position:position + len(search)]
+        if hunk.search is not search:
+            # Drop the same surrounding blank lines from the replacement
+            while replace and not replace[0].strip():
+                replace = replace[1:]
+            while replace and not replace[-1].strip():
+                replace = replace[:-1]
+        lines[position:position + len(search)] = _reindent(replace, search, matched)
+
+    result = "\n".join(lines)
+    if code.endswith("\n"):
+        result += "\n"
+    return result
+
+
+def apply_patch(code: str, patch_text: str, language: str = "python") -> str:
+    """
+    Parse a model's patch response and apply it to the code.
+
+    Args:
+        code (str): The original code.
+        patch_text (str): The model response with SEARCH/REPLACE blocks or a unified diff.
+        language (str, optional): Language of the code. Python results must still
+            parse if the original did.
+
+    Returns:
+        str: The patched code.
+
+    Raises:
+        PatchError: If the patch cannot be parsed, applied or validated.
+    """
+    patched = apply_hunks(code, parse_patch(patch_text))
+    if language and language.lower() == "python":
+        try:
+            ast.parse(code)
+        except SyntaxError:
+            return patched
+        try:
+            ast.parse(patched)
+        except SyntaxError as e:
+            raise PatchError(f"Patched code does not parse: {e}")
+    return patched
@@ -0,0 +1,245 @@
+"""
+Profiler for the Interactive Debugging Tool's Optimize mode.
+
+Run in the sandbox as a harness (see sandbox.run_code):
+
+    python harness.py main.py .result.json TIME_LIMIT
+
+The program runs under ``cProfile`` and ``tracemalloc``. The result lists
+the functions with the most cumulative time and the program lines holding
+the most memory, sampled every SAMPLE_INTERVAL seconds and at exit so that
+short-lived allocation peaks are seen too. format_profile_summary keeps
+only the top hotspots, so the prompt stays the same size however large the
+program is. Both tools slow the program down, so the times are relative
+rather than absolute.
+
+Only the standard library is used, because this file runs inside the sandbox.
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import pstats
+import signal
+import cProfile
+import linecache
+import traceback
+import tracemalloc
+
+# Rows kept in the result and in the prompt summary
+RESULT_MAX_FUNCTIONS = 15
+RESULT_MAX_LINES = 10
+SUMMARY_MAX_FUNCTIONS = 8
+SUMMARY_MAX_LINES = 5
+SAMPLE_INTERVAL = 0.05
+MAX_SOURCE_CHARS = 80
+
+# Memory is sampled again only after growing by this factor, and sampling
+# may take at most this share of the run
+SAMPLE_GROWTH = 1.5
+SAMPLE_MAX_SHARE = 0.25
+
+HARNESS_PATH = os.path.abspath(__file__)
+
+
+def _source(path: str, line: int) -> str:
+    text = linecache.getline(path, line).strip()
+    return text if len(text) <= MAX_SOURCE_CHARS else text[:MAX_SOURCE_CHARS - 3] + "..."
+
+
+class Profiler:
+    """
+    cProfile plus tracemalloc line sampling for one program file.
+
+    Args:
+        path (str): The program's file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.line_peaks = {}
+        self.samples = 0
+        self.sampled_memory = 0
+        self.sampling_time = 0.0
+        self.started = time.perf_counter()
+
+    def sample(self, force: bool = False):
+        # Keep each program line's largest allocated size seen so far. Snapshots
+        # are expensive, so one is only taken when memory use reaches a new high.
+        if not tracemalloc.is_tracing():
+            return
+        current = tracemalloc.get_traced_memory()[0]
+        if not force and (
+            current <= self.sampled_memory * SAMPLE_GROWTH
+            or self.sampling_time > SAMPLE_MAX_SHARE * (time.perf_counter() - self.started)
+        ):
+            return
+        sampling_started = time.perf_counter()
+        self.sampled_memory = max(self.sampled_memory, current)
+        self.samples += 1
+        for statistic in tracemalloc.take_snapshot().statistics("lineno"):
+            frame = statistic.traceback[0]
+            if frame.filename != self.path or not frame.lineno:
+                continue
+            peak = self.line_peaks.get(frame.lineno, (0, 0))
+            if statistic.size > peak[0]:
+                self.line_peaks[frame.lineno] = (statistic.size, statistic.count)
+        self.sampling_time += time.perf_counter() - sampling_started
+
+    def start(self):
+        tracemalloc.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.sample(force=True)
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def _program_functions(self, stats) -> set:
+        # The program's own functions and everything they called, but not the
+        # runner around them or the sampling that interrupts them
+        program = {key for key in stats if key[0] == self.path}
+        while True:
+            called = {
+                key for key, (_, _, _, _, callers) in stats.items()
+                if key not in program and key[0] != HARNESS_PATH and any(caller in program for caller in callers)
+            }
+            if not called:
+                return program
+            program |= called
+
+    def result(self, elapsed: float, error: str = None) -> dict:
+        stats = pstats.Stats(self.profile).stats
+        functions = []
+        for key in self._program_functions(stats):
+            file_name, line, name = key
+            _, calls, total_time, cumulative_time, _ = stats[key]
+            label = f"<{name[1:-1]}>" if file_name == "~" else name
+            functions.append({
+                "function": label,
+                "location": f"line {line}" if file_name == self.path else ("built-in" if file_name == "~" else os.path.basename(file_name)),
+                "calls": calls,
+                "total_time": total_time,
+                "cumulative_time": cumulative_time,
+            })
+        functions.sort(key=lambda function: function["cumulative_time"], reverse=True)
+        lines = sorted(self.line_peaks.items(), key=lambda item: item[1][0], reverse=True)[:RESULT_MAX_LINES]
+        return {
+            "elapsed": elapsed,
+            "peak_memory": getattr(self, "peak_memory", 0),
+            "functions": functions[:RESULT_MAX_FUNCTIONS],
+            "lines": [
+                {"line": line, "peak_bytes": size, "blocks": count, "source": _source(self.path, line)}
+                for line, (size, count) in lines
+            ],
+            "samples": self.samples,
+            "sampling_time": self.sampling_time,
+            "error": error,
+        }
+
+
+def profile_program(path: str, time_limit: float = None, result_path: str = None) -> dict:
+    """
+    Run a program file under the profiler.
+
+    Args:
+        path (str): The program file.
+        time_limit (float, optional): Stop the program after this many
+            seconds (Unix only); the profile so far is written to result_path
+            and the process exits with status 1.
+        result_path (str, optional): Where to write the profile when stopped.
+
+    Returns:
+        dict: The profile (see Profiler.result).
+    """
+    profiler = Profiler(path)
+    started = time.perf_counter()
+
+    def tick(signal_number, frame):
+        # Sample memory; stop the program once it is past the time limit
+        if time_limit and time.perf_counter() - started >= time_limit:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            profiler.stop()
+            write_result(result_path, profiler.result(
+                time.perf_counter() - started, f"Stopped after {time_limit:g} s: the program was still running"
+            ))
+            os._exit(1)
+        # No new tick while a (possibly slow) snapshot is taken
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        profiler.sample()
+        signal.setitimer(signal.ITIMER_REAL, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+
+    if result_path:
+        signal.signal(signal.SIGALRM, tick)
+        signal.setitimer(signal.ITIMER_REAL, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+    error = None
+    profiler.start()
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit:
+        pass
+    except BaseException as exception:
+        error = "".join(traceback.format_exception_only(type(exception), exception)).strip()
+    finally:
+        if result_path:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        profiler.stop()
+    return profiler.result(time.perf_counter() - started, error)
+
+
+def write_result(path: str, profile: dict):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(profile, file)
+
+
+def format_bytes(size: int) -> str:
+    """Human-readable size, e.g. "1.5 MB"."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_profile_summary(profile: dict) -> str:
+    """
+    Compact a profile into the top hotspots for a prompt.
+
+    Returns:
+        str: At most SUMMARY_MAX_FUNCTIONS functions and SUMMARY_MAX_LINES
+            allocation lines, whatever the size of the program.
+    """
+    lines = [
+        f"Measured run: {profile['elapsed'] * 1000:.0f} ms under the profiler "
+        f"(including {profile['sampling_time'] * 1000:.0f} ms of memory sampling), "
+        f"peak traced memory {format_bytes(profile['peak_memory'])}."
+    ]
+    if profile.get("error"):
+        lines.append(f"The run ended with: {profile['error']}")
+    if profile["functions"]:
+        lines.append("Functions by cumulative time:")
+        lines += [
+            f"- {function['function']} ({function['location']}): {function['cumulative_time'] * 1000:.1f} ms cumulative, "
+            f"{function['total_time'] * 1000:.1f} ms own, {function['calls']} calls"
+            for function in profile["functions"][:SUMMARY_MAX_FUNCTIONS]
+        ]
+    if profile["lines"]:
+        lines.append("Lines holding the most memory:")
+        lines += [
+            f"- line {line['line']}: {format_bytes(line['peak_bytes'])} in {line['blocks']} blocks: {line['source']}"
+            for line in profile["lines"][:SUMMARY_MAX_LINES]
+        ]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    program, result_path, time_limit = sys.argv[1], sys.argv[2], float(sys.argv[3])
+    sys.argv = [program]
+    profile = profile_program(os.path.abspath(program), time_limit, result_path)
+    write_result(result_path, profile)
+    if profile["error"]:
+        print(profile["error"], file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,134 @@
+"""
+Registry of prompt templates, compacted once at import time.
+
+Prompts are written as indented triple-quoted strings next to the code that
+uses them. Sent as they are, every call pays for the source indentation and
+blank lines, and code interpolated into an indented f-string loses its own
+indentation context on the first line. Registered templates are dedented and
+compacted once; at render time values are inserted verbatim, placeholders
+that fill a whole line are dropped when empty, and the token counts before
+and after compaction are kept for the Settings page.
+"""
+import re
+import textwrap
+import threading
+from token_budget import estimate_tokens
+
+# A placeholder that is the whole line, e.g. "{code}"
+_LINE_PLACEHOLDER = re.compile(r"^\{(\w+)\}$")
+
+
+def compact(text: str) -> str:
+    """
+    Dedent a prompt and drop trailing whitespace and repeated blank lines.
+
+    The first line may start right after the opening quotes, so it is
+    dedented separately from the rest.
+    """
+    first, _, rest = text.partition("\n")
+    lines = [first.strip()] + textwrap.dedent(rest).split("\n")
+    result = []
+    for line in lines:
+        line = line.rstrip()
+        if not line and (not result or not result[-1]):
+            continue
+        result.append(line)
+    while result and not result[-1]:
+        result.pop()
+    return "\n".join(result)
+
+
+class PromptTemplate:
+    """
+    A compacted prompt with ``{name}`` placeholders (``{{`` and ``}}`` for literal braces).
+
+    Args:
+        name (str): Registry name, used in the statistics.
+        text (str): The template as written in the source.
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = compact(text)
+        self.lines = self.text.split("\n")
+        self.raw_tokens = estimate_tokens(text)
+        self.compact_tokens = estimate_tokens(self.text)
+        self.renders = 0
+
+    def render(self, **values) -> str:
+        """
+        Fill in the placeholders.
+
+        Values are inserted verbatim: a multi-line value such as the user's
+        code keeps its own indentation (only trailing newlines of a value that
+        fills a whole line are dropped). A line holding only a placeholder is
+        removed when its value is empty, together with the blank line it
+        would leave.
+
+        Returns:
+            str: The prompt text.
+        """
+        parts = []
+        blank = True
+        for line in self.lines:
+            match = _LINE_PLACEHOLDER.match(line)
+            if match:
+                value = str(values[match.group(1)])
+                if not value.strip():
+                    continue
+                parts.append(value.rstrip("\n"))
+                blank = False
+            elif line:
+                parts.append(line.format(**values))
+                blank = False
+            elif not blank:
+                # Collapse blank lines left behind by removed placeholders
+                parts.append("")
+                blank = True
+        while parts and not parts[-1]:
+            parts.pop()
+        with _lock:
+            self.renders += 1
+        return "\n".join(parts)
+
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def register_template(name: str, text: str) -> PromptTemplate:
+    """
+    Compact a template and add it to the registry.
+
+    Returns:
+        PromptTemplate: The compacted template.
+    """
+    template = PromptTemplate(name, text)
+    with _lock:
+        _templates[name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Return a registered template by name."""
+    return _templates[name]
+
+
+def template_stats() -> dict:
+    """
+    Return token counts per template.
+
+    Returns:
+        dict: {name: {"raw_tokens", "compact_tokens", "renders", "tokens_saved"}}
+        where tokens_saved is the estimated saving over all renders so far.
+    """
+    with _lock:
+        return {
+            name: {
+                "raw_tokens": template.raw_tokens,
+                "compact_tokens": template.compact_tokens,
+                "renders": template.renders,
+                "tokens_saved": (template.raw_tokens - template.compact_tokens) * template.renders,
+            }
+            for name, template in _templates.items()
+        }
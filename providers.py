@@ -0,0 +1,457 @@
+"""
+Single entry point for provider calls made by the LLM-backed features.
+
+Every feature sends its prompt through groq_chat or gemini_generate so that
+cross-cutting behaviour (response caching, coalescing of identical in-flight
+requests, retries, circuit breaking and client-side rate limiting) is applied
+in one place.
+
+The non-streaming calls are implemented as coroutines (groq_chat_async,
+gemini_generate_async, groq_chat_hedged_async) on the async clients; their
+synchronous names run them on the shared event loop from async_runtime.py.
+"""
+from llm_clients import get_groq_client, get_async_groq_client, get_gemini_model
+from async_runtime import run_sync
+from response_cache import get_response_cache, make_cache_key
+from single_flight import get_single_flight
+from hedging import HedgeCancelled, get_hedge_policy
+from resilience import (
+    call_with_resilience_async,
+    stream_with_resilience,
+    get_circuit_breaker,
+    classify_error,
+)
+from rate_limiter import get_admission_controller, estimate_request_tokens
+from token_budget import (
+    MIN_OUTPUT_TOKENS,
+    TokenBudgetError,
+    check_fits,
+    context_window,
+    get_token_estimator,
+)
+
+
+def _admit(provider: str, model: str, prompt: str, params: dict):
+    # Wait for the rate limiter before every request that goes over the network
+    get_admission_controller().acquire(provider, model, estimate_request_tokens(prompt, params))
+
+
+async def _admit_async(provider: str, model: str, prompt: str, params: dict):
+    await get_admission_controller().acquire_async(provider, model, estimate_request_tokens(prompt, params))
+
+
+def _preflight(model: str, prompt: str, params: dict) -> dict:
+    # Reject prompts that cannot fit before any network call, and keep the
+    # requested output budget within what is left of the context window. A
+    # budget clamped below MIN_OUTPUT_TOKENS would only buy a truncated answer
+    # (which would then be cached), so such requests are rejected too.
+    prompt_tokens = check_fits(model, prompt)
+    available = context_window(model) - prompt_tokens
+    for name in ("max_tokens", "max_completion_tokens"):
+        requested = params.get(name) or 0
+        if requested > available:
+            if available < min(requested, MIN_OUTPUT_TOKENS):
+                raise TokenBudgetError(model, prompt_tokens, context_window(model))
+            params = {**params, name: available}
+    return params
+
+
+def _models_with_budget(models: list, prompt: str, params: dict) -> list:
+    # Skip the models in a fallback chain that cannot fit the prompt and the
+    # minimum output; each attempt then clamps the budget to its own model
+    fitting = []
+    for model in models:
+        try:
+            _preflight(model, prompt, params)
+            fitting.append(model)
+        except TokenBudgetError:
+            continue
+    if not fitting:
+        # Report against the model with the most room
+        _preflight(max(models, key=context_window), prompt, params)
+    return fitting
+
+
+def _record_usage(provider: str, model: str, prompt: str, prompt_tokens):
+    # Calibrate the local token estimator against the provider's count
+    if prompt_tokens:
+        get_token_estimator().record_usage(provider, model, prompt, prompt_tokens)
+
+
+def _groq_prompt_tokens(usage_holder):
+    # Usage is on the response for completions and on the last chunk's x_groq for streams
+    usage = getattr(usage_holder, "usage", None) or getattr(getattr(usage_holder, "x_groq", None), "usage", None)
+    return getattr(usage, "prompt_tokens", 0)
+
+
+async def groq_chat_async(
+    function: str,
+    model: str,
+    prompt: str,
+    use_cache: bool = True,
+    **params
+) -> str:
+    """
+    Send a single-turn chat completion to Groq and return the message text.
+
+    Args:
+        function (str): Name of the calling feature (used for cache keys and stats).
+        model (str): Groq model name.
+        prompt (str): The user prompt.
+        use_cache (bool, optional): Whether to read/write the response cache. Defaults to True.
+        **params: Extra completion parameters (temperature, max_tokens, ...).
+
+    Returns:
+        str: The completion text. Provider errors are raised to the caller.
+
+    Raises:
+        TokenBudgetError: Without calling the provider, if the prompt cannot fit the model.
+    """
+    params = _preflight(model, prompt, params)
+
+    async def call():
+        await _admit_async("groq", model, prompt, params)
+        response = await get_async_groq_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **params
+        )
+        _record_usage("groq", model, prompt, _groq_prompt_tokens(response))
+        return response.choices[0].message.content
+
+    key = make_cache_key(function, model, prompt, params)
+
+    async def compute():
+        # Identical requests already in flight share one upstream call
+        return await get_single_flight().do_async(key, lambda: call_with_resilience_async("groq", model, call))
+
+    if not use_cache:
+        return await compute()
+    return await get_response_cache().get_or_compute_async(function, model, prompt, params, compute)
+
+
+def groq_chat(
+    function: str,
+    model: str,
+    prompt: str,
+    use_cache: bool = True,
+    **params
+) -> str:
+    """Synchronous wrapper around groq_chat_async; same arguments and return value."""
+    return run_sync(groq_chat_async(function, model, prompt, use_cache=use_cache, **params))
+
+
+def groq_stream(
+    function: str,
+    model: str,
+    prompt: str,
+    use_cache: bool = True,
+    **params
+):
+    """
+    Stream a single-turn chat completion from Groq.
+
+    Args:
+        function (str): Name of the calling feature (used for cache keys and stats).
+        model (str): Groq model name.
+        prompt (str): The user prompt.
+        use_cache (bool, optional): Whether to read/write the response cache. Defaults to True.
+        **params: Extra completion parameters (temperature, max_tokens, ...).
+
+    Yields:
+        str: Text deltas as they arrive.
+    """
+    params = _preflight(model, prompt, params)
+
+    def open_stream():
+        _admit("groq", model, prompt, params)
+        completion = get_groq_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **params
+        )
+        for chunk in completion:
+            _record_usage("groq", model, prompt, _groq_prompt_tokens(chunk))
+            delta = chunk.choices[0].delta.content if chunk.choices else ""
+            if delta:
+                yield delta
+
+    key = make_cache_key(function, model, prompt, params)
+
+    def stream():
+        return get_single_flight().stream(key, lambda: stream_with_resilience("groq", model, open_stream))
+
+    if not use_cache:
+        yield from stream()
+        return
+    yield from get_response_cache().get_or_stream(function, model, prompt, params, stream)
+
+
+async def gemini_generate_async(
+    function: str,
+    model_name: str,
+    prompt: str,
+    generation_config: dict = None,
+    safety_settings: list = None,
+    use_cache: bool = True
+) -> str:
+    """
+    Generate content with a Gemini model and return the response text.
+
+    Args:
+        function (str): Name of the calling feature (used for cache keys and stats).
+        model_name (str): Gemini model name.
+        prompt (str): The prompt.
+        generation_config (dict, optional): Gemini generation config.
+        safety_settings (list, optional): Gemini safety settings.
+        use_cache (bool, optional): Whether to read/write the response cache. Defaults to True.
+
+    Returns:
+        str: The response text. Provider errors and empty responses are raised to the caller.
+    """
+    check_fits(model_name, prompt)
+
+    async def call():
+        await _admit_async("gemini", model_name, prompt, {"generation_config": generation_config})
+        response = await get_gemini_model(model_name).generate_content_async(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=safety_settings
+        )
+        _record_usage("gemini", model_name, prompt, getattr(getattr(response, "usage_metadata", None), "prompt_token_count", 0))
+        if not getattr(response, "text", None):
+            raise Exception("Empty response received")
+        return response.text
+
+    params = {"generation_config": generation_config, "safety_settings": safety_settings}
+    key = make_cache_key(function, model_name, prompt, params)
+
+    async def compute():
+        return await get_single_flight().do_async(key, lambda: call_with_resilience_async("gemini", model_name, call))
+
+    if not use_cache:
+        return await compute()
+    return await get_response_cache().get_or_compute_async(function, model_name, prompt, params, compute)
+
+
+def gemini_generate(
+    function: str,
+    model_name: str,
+    prompt: str,
+    generation_config: dict = None,
+    safety_settings: list = None,
+    use_cache: bool = True
+) -> str:
+    """Synchronous wrapper around gemini_generate_async; same arguments and return value."""
+    return run_sync(gemini_generate_async(
+        function,
+        model_name,
+        prompt,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+        use_cache=use_cache
+    ))
+
+
+def _groq_stream_attempt(prompt: str, params: dict):
+    # Build a hedging attempt that streams one Groq completion. The hedge
+    # policy is the fallback, so attempts do not retry; a model whose circuit
+    # is open fails immediately and the next model is launched straight away.
+    def attempt(model, emit, cancel_event):
+        # The budget was planned for the whole chain; fit it to this model
+        model_params = _preflight(model, prompt, params)
+        breaker = get_circuit_breaker("groq", model)
+        breaker.before_call()
+        parts = []
+        try:
+            _admit("groq", model, prompt, model_params)
+            stream = get_groq_client().chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **model_params
+            )
+            try:
+                for chunk in stream:
+                    if cancel_event.is_set():
+                        raise HedgeCancelled(model)
+                    _record_usage("groq", model, prompt, _groq_prompt_tokens(chunk))
+                    delta = chunk.choices[0].delta.content if chunk.choices else ""
+                    if delta:
+                        parts.append(delta)
+                        emit(delta)
+            finally:
+                response = getattr(stream, "response", None)
+                if response is not None:
+                    response.close()
+        except HedgeCancelled:
+            raise
+        except Exception as e:
+            breaker.record_failure(classify_error(e))
+            raise
+        breaker.record_success()
+        return "".join(parts)
+
+    return attempt
+
+
+def _groq_async_attempt(prompt: str, params: dict):
+    # Async counterpart of _groq_stream_attempt for HedgePolicy.execute_async.
+    # Losing attempts are cancelled as tasks, which closes their streams.
+    async def attempt(model, emit):
+        # The budget was planned for the whole chain; fit it to this model
+        model_params = _preflight(model, prompt, params)
+        breaker = get_circuit_breaker("groq", model)
+        breaker.before_call()
+        parts = []
+        try:
+            await _admit_async("groq", model, prompt, model_params)
+            stream = await get_async_groq_client().chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **model_params
+            )
+            try:
+                async for chunk in stream:
+                    _record_usage("groq", model, prompt, _groq_prompt_tokens(chunk))
+                    delta = chunk.choices[0].delta.content if chunk.choices else ""
+                    if delta:
+                        parts.append(delta)
+                        emit(delta)
+            finally:
+                await stream.close()
+        except Exception as e:
+            breaker.record_failure(classify_error(e))
+            raise
+        breaker.record_success()
+        return "".join(parts)
+
+    return attempt
+
+
+async def groq_chat_hedged_async(
+    function: str,
+    models: list,
+    prompt: str,
+    use_cache: bool = True,
+    **params
+) -> str:
+    """
+    Run a chat completion across a model fallback chain using hedged requests.
+
+    Args:
+        function (str): Name of the calling feature (used for cache keys and stats).
+        models (list): Groq model names in preference order.
+        prompt (str): The user prompt.
+        use_cache (bool, optional): Whether to read/write the response cache. Defaults to True.
+        **params: Extra completion parameters (temperature, max_tokens, ...).
+
+    Returns:
+        str: The text from the first model to succeed.
+
+    Raises:
+        HedgeError: If every model failed.
+        TokenBudgetError: Without calling the provider, if no model in the chain
+            fits the prompt and the minimum output. Models that do get
+            max_tokens clamped to their own context window.
+    """
+    # Skip models whose context window is too small for this prompt and budget
+    models = _models_with_budget(models, prompt, params)
+    key = make_cache_key(function, "|".join(models), prompt, params)
+
+    async def hedged():
+        _, text = await get_hedge_policy().execute_async(models, _groq_async_attempt(prompt, params))
+        return text
+
+    async def compute():
+        return await get_single_flight().do_async(key, hedged)
+
+    if not use_cache:
+        return await compute()
+    return await get_response_cache().get_or_compute_async(function, "|".join(models), prompt, params, compute)
+
+
+def groq_chat_hedged(
+    function: str,
+    models: list,
+    prompt: str,
+    use_cache: bool = True,
+    **params
+) -> str:
+    """Synchronous wrapper around groq_chat_hedged_async; same arguments and return value."""
+    return run_sync(groq_chat_hedged_async(function, models, prompt, use_cache=use_cache, **params))
+
+
+def groq_stream_hedged(
+    function: str,
+    models: list,
+    prompt: str,
+    use_cache: bool = True,
+    **params
+):
+    """
+    Stream a chat completion across a model fallback chain using hedged requests.
+
+    Yields:
+        str: Text deltas from the first model to start responding.
+    """
+    models = _models_with_budget(models, prompt, params)
+    key = make_cache_key(function, "|".join(models), prompt, params)
+
+    def stream():
+        return get_single_flight().stream(
+            key, lambda: get_hedge_policy().stream(models, _groq_stream_attempt(prompt, params))
+        )
+
+    if not use_cache:
+        yield from stream()
+        return
+    yield from get_response_cache().get_or_stream(function, "|".join(models), prompt, params, stream)
+
+
+def gemini_stream(
+    function: str,
+    model_name: str,
+    prompt: str,
+    generation_config: dict = None,
+    safety_settings: list = None,
+    use_cache: bool = True
+):
+    """
+    Stream content from a Gemini model.
+
+    Yields:
+        str: Text deltas as they arrive. Raises if the response is empty.
+    """
+    check_fits(model_name, prompt)
+
+    def open_stream():
+        _admit("gemini", model_name, prompt, {"generation_config": generation_config})
+        response = get_gemini_model(model_name).generate_content(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            stream=True
+        )
+        received = False
+        for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                received = True
+                yield text
+        _record_usage("gemini", model_name, prompt, getattr(getattr(response, "usage_metadata", None), "prompt_token_count", 0))
+        if not received:
+            raise Exception("Empty response received")
+
+    params = {"generation_config": generation_config, "safety_settings": safety_settings}
+    key = make_cache_key(function, model_name, prompt, params)
+
+    def stream():
+        return get_single_flight().stream(key, lambda: stream_with_resilience("gemini", model_name, open_stream))
+
+    if not use_cache:
+        yield from stream()
+        return
+    yield from get_response_cache().get_or_stream(function, model_name, prompt, params, stream)
@@ -0,0 +1,288 @@
+"""
+Client-side admission control for provider calls.
+
+Every provider call is admitted through token buckets for requests/minute and
+tokens/minute, keyed per provider and model, plus a per-user request bucket.
+When a bucket is empty the request waits in a queue (bounded by
+ADMISSION_MAX_WAIT) instead of being sent and bouncing off a 429. Waiters for
+the same model are served fairly: the user with the fewest recent grants goes
+first, so one busy session cannot starve the others.
+"""
+import os
+import time
+import asyncio
+import itertools
+import threading
+import contextvars
+from collections import deque
+
+from token_budget import estimate_tokens
+
+# Limits per provider (override through environment variables)
+PROVIDER_LIMITS = {
+    "groq": {
+        "rpm": float(os.environ.get("FIXIFOX_GROQ_RPM", "30")),
+        "tpm": float(os.environ.get("FIXIFOX_GROQ_TPM", "60000")),
+    },
+    "gemini": {
+        "rpm": float(os.environ.get("FIXIFOX_GEMINI_RPM", "15")),
+        "tpm": float(os.environ.get("FIXIFOX_GEMINI_TPM", "1000000")),
+    },
+}
+USER_RPM = float(os.environ.get("FIXIFOX_USER_RPM", "20"))
+ADMISSION_MAX_WAIT = float(os.environ.get("FIXIFOX_ADMISSION_MAX_WAIT", "30"))
+
+# Username of the session making the current request
+current_user = contextvars.ContextVar("fixifox_current_user", default="anonymous")
+
+
+def set_current_user(username: str):
+    """Record which user the provider calls made from this context belong to."""
+    current_user.set(username or "anonymous")
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a request could not be admitted within the maximum wait."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket.
+
+    Args:
+        capacity (float): Maximum burst size.
+        per_minute (float): Refill rate in tokens per minute.
+    """
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        self._refill(now)
+        # Requests larger than the bucket are admitted once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("user", "seq", "start")
+
+    def __init__(self, user: str, seq: int, start: float):
+        self.user = user
+        self.seq = seq
+        self.start = start
+
+
+class _Lane:
+    # Buckets, waiters and statistics for one provider model
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm, rpm)
+        self.tokens = TokenBucket(tpm, tpm)
+        self.cond = threading.Condition()
+        self.waiters = []
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_queue = 0
+
+
+class AdmissionController:
+    """Token-bucket admission controller shared by every session in the process."""
+
+    def __init__(self, limits: dict = None, user_rpm: float = USER_RPM, max_wait: float = ADMISSION_MAX_WAIT):
+        self.limits = limits or PROVIDER_LIMITS
+        self.user_rpm = user_rpm
+        self.max_wait = max_wait
+        self._lanes = {}
+        self._user_buckets = {}
+        self._user_grants = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _lane(self, provider: str, model: str) -> _Lane:
+        key = f"{provider}:{model}"
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                limits = self.limits.get(provider, {"rpm": 60, "tpm": 100000})
+                lane = self._lanes[key] = _Lane(limits["rpm"], limits["tpm"])
+            return lane
+
+    def _user_bucket(self, provider: str, user: str) -> TokenBucket:
+        key = (provider, user)
+        with self._lock:
+            bucket = self._user_buckets.get(key)
+            if bucket is None:
+                bucket = self._user_buckets[key] = TokenBucket(self.user_rpm, self.user_rpm)
+            return bucket
+
+    def _recent_grants(self, user: str, now: float) -> int:
+        grants = self._user_grants.setdefault(user, deque())
+        while grants and now - grants[0] > 60:
+            grants.popleft()
+        return len(grants)
+
+    def _is_next(self, lane: _Lane, waiter: _Waiter, now: float) -> bool:
+        # Fair order: fewest grants in the last minute first, then arrival order
+        with self._lock:
+            head = min(lane.waiters, key=lambda w: (self._recent_grants(w.user, now), w.seq))
+        return head is waiter
+
+    def acquire(self, provider: str, model: str, tokens: float = 0, user: str = None, max_wait: float = None) -> float:
+        """
+        Block until a request may be sent.
+
+        Args:
+            provider (str): Provider name ("groq" or "gemini").
+            model (str): Model name.
+            tokens (float, optional): Estimated tokens the request will consume.
+            user (str, optional): Username for fairness. Defaults to the current context's user.
+            max_wait (float, optional): Longest time to queue, in seconds.
+
+        Returns:
+            float: Seconds spent waiting.
+
+        Raises:
+            AdmissionTimeout: If the request could not be admitted in time.
+        """
+        lane, user_bucket, waiter, deadline = self._enqueue(provider, model, user, max_wait)
+        with lane.cond:
+            try:
+                while True:
+                    waited, wait = self._try_admit(lane, user_bucket, waiter, tokens)
+                    if waited is not None:
+                        return waited
+                    lane.cond.wait(self._next_wait(lane, model, wait, deadline))
+            finally:
+                lane.waiters.remove(waiter)
+                lane.cond.notify_all()
+
+    async def acquire_async(self, provider: str, model: str, tokens: float = 0, user: str = None, max_wait: float = None) -> float:
+        """
+        Async counterpart of acquire: waits with asyncio.sleep instead of blocking the thread.
+
+        Returns:
+            float: Seconds spent waiting.
+
+        Raises:
+            AdmissionTimeout: If the request could not be admitted in time.
+        """
+        lane, user_bucket, waiter, deadline = self._enqueue(provider, model, user, max_wait)
+        try:
+            while True:
+                with lane.cond:
+                    waited, wait = self._try_admit(lane, user_bucket, waiter, tokens)
+                if waited is not None:
+                    return waited
+                await asyncio.sleep(self._next_wait(lane, model, wait, deadline))
+        finally:
+            with lane.cond:
+                lane.waiters.remove(waiter)
+                lane.cond.notify_all()
+
+    def _enqueue(self, provider: str, model: str, user: str, max_wait: float):
+        user = user or current_user.get()
+        max_wait = self.max_wait if max_wait is None else max_wait
+        lane = self._lane(provider, model)
+        user_bucket = self._user_bucket(provider, user)
+        waiter = _Waiter(user, next(self._seq), time.monotonic())
+        with lane.cond:
+            lane.waiters.append(waiter)
+            lane.peak_queue = max(lane.peak_queue, len(lane.waiters))
+        return lane, user_bucket, waiter, waiter.start + max_wait
+
+    def _try_admit(self, lane: _Lane, user_bucket: TokenBucket, waiter: _Waiter, tokens: float):
+        # Called with lane.cond held. Returns (seconds waited, None) once admitted,
+        # otherwise (None, seconds until it is worth checking again)
+        now = time.monotonic()
+        if not self._is_next(lane, waiter, now):
+            # Someone ahead of us is waiting; re-check when they are admitted
+            return None, 0.25
+        with self._lock:
+            wait = max(
+                lane.requests.time_until(1, now),
+                lane.tokens.time_until(tokens, now),
+                user_bucket.time_until(1, now),
+            )
+            if wait > 0:
+                return None, wait
+            lane.requests.consume(1)
+            lane.tokens.consume(tokens)
+            user_bucket.consume(1)
+            self._user_grants.setdefault(waiter.user, deque()).append(now)
+            waited = now - waiter.start
+            lane.admitted += 1
+            lane.total_wait += waited
+            lane.max_wait = max(lane.max_wait, waited)
+            return waited, None
+
+    def _next_wait(self, lane: _Lane, model: str, wait: float, deadline: float) -> float:
+        # How long to sleep before the next check, or AdmissionTimeout if that would pass the deadline
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or wait > remaining:
+            lane.rejected += 1
+            raise AdmissionTimeout(
+                f"Too many requests to {model} right now. Please try again in a moment."
+            )
+        return min(wait, max(remaining, 0.01))
+
+    def stats(self) -> dict:
+        """
+        Return queue depth and wait-time statistics per provider model.
+
+        Returns:
+            dict: {"provider:model": {"queue_depth", "peak_queue", "admitted",
+            "rejected", "avg_wait", "max_wait"}}
+        """
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {
+            key: {
+                "queue_depth": len(lane.waiters),
+                "peak_queue": lane.peak_queue,
+                "admitted": lane.admitted,
+                "rejected": lane.rejected,
+                "avg_wait": lane.total_wait / lane.admitted if lane.admitted else 0.0,
+                "max_wait": lane.max_wait,
+            }
+            for key, lane in lanes.items()
+        }
+
+
+def estimate_request_tokens(prompt: str, params: dict = None) -> int:
+    """
+    Rough token cost of a request: prompt size plus the requested output budget.
+    """
+    params = params or {}
+    output_budget = params.get("max_tokens") or params.get("max_completion_tokens") or 0
+    if not output_budget:
+        output_budget = (params.get("generation_config") or {}).get("max_output_tokens", 0)
+    return estimate_tokens(prompt) + int(output_budget)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
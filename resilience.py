@@ -0,0 +1,392 @@
+"""
+Shared resilience layer for provider calls.
+
+Provides error classification by exception type (not by message substring),
+exponential backoff with full jitter, parsing of provider Retry-After and
+rate-limit reset headers, and a per-model circuit breaker so fallback chains
+skip models that are currently failing instead of paying a timeout on every
+request.
+"""
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+import httpx
+import groq
+
+from rate_limiter import AdmissionTimeout
+from token_budget import TokenBudgetError
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:  # google-api-core ships with google-generativeai
+    google_exceptions = None
+
+RETRY_MAX_ATTEMPTS = int(os.environ.get("FIXIFOX_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.environ.get("FIXIFOX_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.environ.get("FIXIFOX_RETRY_MAX_DELAY", "20"))
+RETRY_AFTER_LIMIT = float(os.environ.get("FIXIFOX_RETRY_AFTER_LIMIT", "60"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("FIXIFOX_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("FIXIFOX_BREAKER_COOLDOWN", "30"))
+
+
+class ErrorKind:
+    """Categories of provider errors."""
+    RATE_LIMIT = "rate_limit"
+    TIMEOUT = "timeout"
+    CONNECTION = "connection"
+    SERVER = "server"
+    AUTH = "auth"
+    NOT_FOUND = "not_found"
+    CONTEXT_LENGTH = "context_length"
+    BAD_REQUEST = "bad_request"
+    CIRCUIT_OPEN = "circuit_open"
+    THROTTLED = "throttled"
+    UNKNOWN = "unknown"
+
+
+# Errors worth retrying on the same model
+RETRYABLE_KINDS = {ErrorKind.RATE_LIMIT, ErrorKind.TIMEOUT, ErrorKind.CONNECTION, ErrorKind.SERVER}
+
+# Errors caused by the request itself (or our own throttling) rather than the model's health
+CLIENT_KINDS = {ErrorKind.CONTEXT_LENGTH, ErrorKind.BAD_REQUEST, ErrorKind.THROTTLED}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider when a model's circuit is open."""
+
+    def __init__(self, key: str, retry_in: float):
+        self.key = key
+        self.retry_in = retry_in
+        super().__init__(f"Model {key} is temporarily unavailable (retry in {retry_in:.0f}s)")
+
+
+def _status_kind(status: int) -> str:
+    if status == 429:
+        return ErrorKind.RATE_LIMIT
+    if status in (408, 504):
+        return ErrorKind.TIMEOUT
+    if status == 413:
+        return ErrorKind.CONTEXT_LENGTH
+    if status in (401, 403):
+        return ErrorKind.AUTH
+    if status == 404:
+        return ErrorKind.NOT_FOUND
+    if status >= 500:
+        return ErrorKind.SERVER
+    if status >= 400:
+        return ErrorKind.BAD_REQUEST
+    return ErrorKind.UNKNOWN
+
+
+def classify_error(error: Exception) -> str:
+    """
+    Classify a provider exception.
+
+    Args:
+        error (Exception): The exception raised by the Groq or Gemini client.
+
+    Returns:
+        str: One of the ErrorKind values.
+    """
+    if isinstance(error, CircuitOpenError):
+        return ErrorKind.CIRCUIT_OPEN
+    if isinstance(error, AdmissionTimeout):
+        return ErrorKind.THROTTLED
+    if isinstance(error, TokenBudgetError):
+        return ErrorKind.CONTEXT_LENGTH
+
+    # Groq SDK
+    if isinstance(error, groq.APITimeoutError):
+        return ErrorKind.TIMEOUT
+    if isinstance(error, groq.APIConnectionError):
+        return ErrorKind.CONNECTION
+    if isinstance(error, groq.APIStatusError):
+        if getattr(error, "code", None) == "context_length_exceeded":
+            return ErrorKind.CONTEXT_LENGTH
+        return _status_kind(error.status_code)
+
+    # Gemini (google-api-core)
+    if google_exceptions is not None:
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return ErrorKind.RATE_LIMIT
+        if isinstance(error, google_exceptions.DeadlineExceeded):
+            return ErrorKind.TIMEOUT
+        if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)):
+            return ErrorKind.SERVER
+        if isinstance(error, (google_exceptions.Unauthenticated, google_exceptions.PermissionDenied)):
+            return ErrorKind.AUTH
+        if isinstance(error, google_exceptions.NotFound):
+            return ErrorKind.NOT_FOUND
+        if isinstance(error, google_exceptions.InvalidArgument):
+            # Gemini reports oversized prompts as a generic InvalidArgument
+            if "token" in str(error).lower():
+                return ErrorKind.CONTEXT_LENGTH
+            return ErrorKind.BAD_REQUEST
+        if isinstance(error, google_exceptions.GoogleAPICallError) and error.code:
+            return _status_kind(int(error.code))
+
+    # Raw transport errors
+    if isinstance(error, (httpx.TimeoutException, TimeoutError)):
+        return ErrorKind.TIMEOUT
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return ErrorKind.CONNECTION
+
+    return ErrorKind.UNKNOWN
+
+
+def _parse_duration(value: str):
+    # Groq reset headers look like "2m59.56s", "7.66s" or "120ms"
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+def parse_retry_after(error: Exception):
+    """
+    Read how long the provider asked us to wait from the error's response headers.
+
+    Understands Retry-After (seconds or HTTP date), retry-after-ms and the Groq
+    x-ratelimit-reset-requests / x-ratelimit-reset-tokens headers.
+
+    Returns:
+        float or None: Seconds to wait, or None when the provider gave no hint.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    resets = []
+    for header in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if headers.get(header):
+            seconds = _parse_duration(headers[header])
+            if seconds is not None:
+                resets.append(seconds)
+    return max(resets) if resets else None
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one provider model.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError. Once ``cooldown`` seconds have passed a
+    single trial call is let through (half-open); success closes the circuit,
+    failure re-opens it.
+    """
+
+    def __init__(self, key: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.next_trial_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call should not be attempted."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.time()
+            if now >= self.next_trial_at:
+                # Let one trial request through, then wait another cooldown
+                self.state = "half_open"
+                self.next_trial_at = now + self.cooldown
+                return
+            raise CircuitOpenError(self.key, self.next_trial_at - now)
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self, kind: str):
+        # Bad requests say nothing about the model's health
+        if kind in CLIENT_KINDS or kind == ErrorKind.CIRCUIT_OPEN:
+            return
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.time()
+                self.next_trial_at = self.opened_at + self.cooldown
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in": max(0.0, self.next_trial_at - time.time()) if self.state != "closed" else 0.0,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str, model: str) -> CircuitBreaker:
+    """Return the shared circuit breaker for a provider model."""
+    key = f"{provider}:{model}"
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker(key))
+    return breaker
+
+
+def circuit_states() -> dict:
+    """Return a snapshot of every circuit breaker, keyed by "provider:model"."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.key: breaker.snapshot() for breaker in breakers}
+
+
+def _retry_wait(error: Exception, kind: str, attempt: int, max_attempts: int):
+    # Seconds to wait before retrying, or None if we should give up
+    if kind not in RETRYABLE_KINDS or attempt + 1 >= max_attempts:
+        return None
+    retry_after = parse_retry_after(error)
+    if retry_after is not None:
+        if retry_after > RETRY_AFTER_LIMIT:
+            return None
+        # Small jitter so sessions told the same reset time do not retry in lockstep
+        return retry_after + random.uniform(0, RETRY_BASE_DELAY)
+    return backoff_delay(attempt)
+
+
+def call_with_resilience(provider: str, model: str, fn, max_attempts: int = RETRY_MAX_ATTEMPTS):
+    """
+    Call fn() with circuit breaking and jittered retries.
+
+    Args:
+        provider (str): Provider name ("groq" or "gemini").
+        model (str): Model name.
+        fn (callable): Zero-argument function that performs the provider call.
+        max_attempts (int, optional): Total attempts including the first.
+
+    Returns:
+        The value returned by fn().
+
+    Raises:
+        CircuitOpenError: If the model's circuit is open.
+        Exception: The last provider error once retries are exhausted.
+    """
+    breaker = get_circuit_breaker(provider, model)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            kind = classify_error(e)
+            breaker.record_failure(kind)
+            wait = _retry_wait(e, kind, attempt, max_attempts)
+            if wait is None:
+                raise
+            time.sleep(wait)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+async def call_with_resilience_async(provider: str, model: str, fn, max_attempts: int = RETRY_MAX_ATTEMPTS):
+    """
+    Async counterpart of call_with_resilience.
+
+    Args:
+        provider (str): Provider name ("groq" or "gemini").
+        model (str): Model name.
+        fn (callable): Zero-argument coroutine function that performs the provider call.
+        max_attempts (int, optional): Total attempts including the first.
+
+    Returns:
+        The value returned by fn().
+    """
+    breaker = get_circuit_breaker(provider, model)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            kind = classify_error(e)
+            breaker.record_failure(kind)
+            wait = _retry_wait(e, kind, attempt, max_attempts)
+            if wait is None:
+                raise
+            await asyncio.sleep(wait)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+def stream_with_resilience(provider: str, model: str, stream_fn, max_attempts: int = RETRY_MAX_ATTEMPTS):
+    """
+    Streaming counterpart of call_with_resilience.
+
+    Failures before the first delta are retried; once output has been yielded
+    the error is raised, since replaying the stream would duplicate text.
+
+    Yields:
+        str: Text deltas from stream_fn().
+    """
+    breaker = get_circuit_breaker(provider, model)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        started = False
+        try:
+            for delta in stream_fn():
+                started = True
+                yield delta
+        except Exception as e:
+            kind = classify_error(e)
+            breaker.record_failure(kind)
+            wait = None if started else _retry_wait(e, kind, attempt, max_attempts)
+            if wait is None:
+                raise
+            time.sleep(wait)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return
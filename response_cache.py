@@ -0,0 +1,263 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Responses are keyed on a hash of (function, model, full prompt, generation
+parameters) and stored in a local SQLite file, so repeated clicks on identical
+snippets are answered locally and the cache survives server restarts. Entries
+expire after a TTL and the least recently used entries are evicted once the
+cache grows past its entry or size limits.
+"""
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+
+CACHE_PATH = os.environ.get("FIXIFOX_CACHE_PATH", "fixifox_cache.db")
+CACHE_TTL_SECONDS = int(os.environ.get("FIXIFOX_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("FIXIFOX_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.environ.get("FIXIFOX_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+
+def make_cache_key(function: str, model: str, prompt: str, params: dict = None) -> str:
+    """
+    Build the content address for a request.
+
+    Args:
+        function (str): Name of the feature making the request.
+        model (str): Model name.
+        prompt (str): The full prompt sent to the model.
+        params (dict, optional): Generation parameters (temperature, max_tokens, ...).
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request.
+    """
+    payload = json.dumps(
+        {"function": function, "model": model, "prompt": prompt, "params": params or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _init_db(self):
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            function TEXT NOT NULL,
+            model TEXT NOT NULL,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        conn.commit()
+        conn.close()
+
+    def _count(self, function: str, outcome: str):
+        with self._lock:
+            counters = self._counters.setdefault(function, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, key: str, function: str = "unknown"):
+        """
+        Look up a cached response.
+
+        Returns:
+            str or None: The cached response, or None on a miss or expired entry.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,))
+            row = c.fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                c.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self._count(function, "hits")
+                return row[0]
+            if row:
+                # Expired entry
+                c.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+        finally:
+            conn.close()
+        self._count(function, "misses")
+        return None
+
+    def set(self, key: str, value: str, function: str = "unknown", model: str = ""):
+        """Store a response and evict old entries if the cache is over its limits."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute(
+                "INSERT OR REPLACE INTO responses (key, function, model, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, function, model, value, len(value.encode("utf-8")), now, now)
+            )
+            self._evict(c, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, c, now: float):
+        # Drop expired entries first, then the least recently used ones
+        c.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        c.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+        count, total_size = c.fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        c.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+        doomed = []
+        for key, size in c.fetchall():
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total_size -= size
+        c.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def get_or_compute(self, function: str, model: str, prompt: str, params: dict, compute) -> str:
+        """
+        Return the cached response for a request, calling compute() on a miss.
+
+        Args:
+            function (str): Name of the feature making the request.
+            model (str): Model name.
+            prompt (str): The full prompt.
+            params (dict): Generation parameters.
+            compute (callable): Zero-argument function performing the provider call.
+                Exceptions propagate and nothing is cached.
+
+        Returns:
+            str: The response text.
+        """
+        key = make_cache_key(function, model, prompt, params)
+        cached = self.get(key, function)
+        if cached is not None:
+            return cached
+
+        value = compute()
+        if value:
+            self.set(key, value, function, model)
+        return value
+
+    async def get_or_compute_async(self, function: str, model: str, prompt: str, params: dict, compute) -> str:
+        """
+        Async counterpart of get_or_compute; compute is a zero-argument coroutine function.
+
+        SQLite access runs in a worker thread so the event loop is never blocked on disk.
+        """
+        key = make_cache_key(function, model, prompt, params)
+        cached = await asyncio.to_thread(self.get, key, function)
+        if cached is not None:
+            return cached
+
+        value = await compute()
+        if value:
+            await asyncio.to_thread(self.set, key, value, function, model)
+        return value
+
+    def get_or_stream(self, function: str, model: str, prompt: str, params: dict, stream):
+        """
+        Streaming counterpart of get_or_compute.
+
+        On a hit the cached response is yielded as a single delta. On a miss the
+        deltas from stream() are passed through and the full text is stored once
+        the stream completes successfully.
+
+        Yields:
+            str: Text deltas.
+        """
+        key = make_cache_key(function, model, prompt, params)
+        cached = self.get(key, function)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        for delta in stream():
+            parts.append(delta)
+            yield delta
+        value = "".join(parts)
+        if value:
+            self.set(key, value, function, model)
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and storage usage.
+
+        Returns:
+            dict: {"hits", "misses", "hit_rate", "entries", "bytes", "by_function"}
+        """
+        with self._lock:
+            by_function = {name: dict(counts) for name, counts in self._counters.items()}
+        hits = sum(counts["hits"] for counts in by_function.values())
+        misses = sum(counts["misses"] for counts in by_function.values())
+
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+        entries, total_size = c.fetchone()
+        conn.close()
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "bytes": total_size,
+            "by_function": by_function,
+        }
+
+    def clear(self):
+        """Remove every cached response."""
+        conn = self._connect()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+        conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
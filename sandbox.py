@@ -0,0 +1,493 @@
+"""
+Local execution of user code for the Interactive Debugging Tool's Run mode.
+
+The code is written to a scratch directory, compiled if the language needs
+it, and run in a subprocess with the program input as stdin. Each process
+gets CPU, memory, file size, open file and process count rlimits, a
+wall-clock timeout and its own process group (killed as a whole on
+timeout). It is confined with sandbox_worker.confine: when the server runs
+as root it drops to SANDBOX_UID, and it gets its own user, mount, PID, IPC
+and (on Linux) network namespaces. Inside, the whole filesystem is
+read-only, /tmp and the other temporary directories are private, the
+SANDBOX_HIDDEN_PATHS (the application's directory, home directories, ...)
+are empty, only the scratch directory is writable, and the server's
+processes are not visible. Output is written to
+files capped by the file size limit and truncated to
+SANDBOX_MAX_OUTPUT_BYTES when read back. Python runs go to the warm worker
+pool (see sandbox_pool) unless FIXIFOX_SANDBOX_POOL_SIZE is 0.
+
+Running code locally is opt-in (FIXIFOX_SANDBOX=1). Languages whose
+toolchain is not installed, and systems where the sandbox cannot be set up
+(or the network cannot be isolated), are reported by can_run_locally so the
+caller can fall back to another mode.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import signal
+import tempfile
+import contextlib
+import threading
+import subprocess
+
+try:
+    import resource
+    from sandbox_worker import apply_limits, confine
+except ImportError:  # Not available on Windows
+    resource = None
+
+from sandbox_pool import SANDBOX_POOL_SIZE, get_sandbox_pool
+
+SANDBOX_ENABLED = os.environ.get("FIXIFOX_SANDBOX", "0") != "0"
+SANDBOX_TIMEOUT = float(os.environ.get("FIXIFOX_SANDBOX_TIMEOUT", "5"))
+SANDBOX_COMPILE_TIMEOUT = float(os.environ.get("FIXIFOX_SANDBOX_COMPILE_TIMEOUT", "30"))
+SANDBOX_CPU_SECONDS = int(os.environ.get("FIXIFOX_SANDBOX_CPU_SECONDS", "5"))
+SANDBOX_MEMORY_MB = int(os.environ.get("FIXIFOX_SANDBOX_MEMORY_MB", "256"))
+SANDBOX_FILE_SIZE_MB = int(os.environ.get("FIXIFOX_SANDBOX_FILE_SIZE_MB", "16"))
+SANDBOX_MAX_OPEN_FILES = int(os.environ.get("FIXIFOX_SANDBOX_MAX_OPEN_FILES", "64"))
+# Processes and threads; runtimes such as the JVM start a few dozen threads
+SANDBOX_MAX_PROCESSES = int(os.environ.get("FIXIFOX_SANDBOX_MAX_PROCESSES", "256"))
+# Unprivileged user the code runs as when the server runs as root
+SANDBOX_UID = int(os.environ.get("FIXIFOX_SANDBOX_UID", "65534"))
+SANDBOX_MAX_OUTPUT_BYTES = int(os.environ.get("FIXIFOX_SANDBOX_MAX_OUTPUT_BYTES", "65536"))
+# Refuse to run code when the network cannot be isolated (0 runs it anyway)
+SANDBOX_REQUIRE_NETWORK_ISOLATION = os.environ.get("FIXIFOX_SANDBOX_REQUIRE_NETWORK_ISOLATION", "1") != "0"
+
+# Build cache shared by Go runs, so the standard library is compiled only once
+GO_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "fixifox-go-cache")
+
+APP_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Temporary directories: each run gets private, empty ones
+SANDBOX_TMP_PATHS = ["/tmp", "/var/tmp", tempfile.gettempdir(), "/dev/shm"]
+# Directories replaced with empty read-only ones inside the sandbox, plus
+# any listed in FIXIFOX_SANDBOX_HIDDEN_PATHS (separated by os.pathsep)
+SANDBOX_HIDDEN_PATHS = [
+    "/run", "/var/run", "/root", "/home", os.path.expanduser("~"), APP_DIRECTORY,
+] + [path for path in os.environ.get("FIXIFOX_SANDBOX_HIDDEN_PATHS", "").split(os.pathsep) if path]
+
+# Python harnesses (tracer, profiler, ...) are copied next to the program as
+# HARNESS_FILE and write their results to HARNESS_RESULT_FILE
+HARNESS_FILE = "harness.py"
+HARNESS_RESULT_FILE = ".result.json"
+HARNESS_MAX_RESULT_BYTES = 1024 * 1024
+
+JAVA_CLASS = re.compile(r"public\s+(?:final\s+)?class\s+(\w+)")
+
+
+class Toolchain:
+    """
+    How to build and run one language.
+
+    Args:
+        file_name (str): Name of the source file; "{class}" is replaced by the
+            Java public class name.
+        compile (list): Build command, or None for interpreted languages.
+        run (list): Run command. "{memory}" is replaced by the memory limit in MB.
+        limit_address_space (bool): Apply the memory limit as RLIMIT_AS. Off
+            for runtimes that reserve large address ranges up front and are
+            given their own heap limit in the command instead.
+    """
+
+    def __init__(self, file_name: str, compile, run: list, limit_address_space: bool = True):
+        self.file_name = file_name
+        self.compile = compile
+        self.run = run
+        self.limit_address_space = limit_address_space
+
+    @property
+    def executables(self) -> list:
+        commands = [self.compile, self.run] if self.compile else [self.run]
+        return [command[0] for command in commands if not command[0].startswith("./")]
+
+
+TOOLCHAINS = {
+    "Python": Toolchain("main.py", None, [sys.executable, "-I", "-S", "main.py"]),
+    "JavaScript": Toolchain("main.js", None, ["node", "--max-old-space-size={memory}", "main.js"], limit_address_space=False),
+    "C": Toolchain("main.c", ["gcc", "-O1", "-o", "main", "main.c", "-lm"], ["./main"]),
+    "C++": Toolchain("main.cpp", ["g++", "-O1", "-o", "main", "main.cpp"], ["./main"]),
+    "Java": Toolchain("{class}.java", ["javac", "{class}.java"], ["java", "-Xmx{memory}m", "-cp", ".", "{class}"], limit_address_space=False),
+    "Go": Toolchain("main.go", ["go", "build", "-o", "main", "main.go"], ["./main"], limit_address_space=False),
+}
+
+
+class ExecutionResult:
+    """
+    Outcome of running code in the sandbox.
+
+    Args:
+        language (str): Language of the code.
+        phase (str): "compile" if the build failed, otherwise "run".
+        stdout (str): Captured standard output (possibly truncated).
+        stderr (str): Captured standard error (possibly truncated).
+        exit_code (int): Exit status; negative for a terminating signal.
+        elapsed (float): Wall-clock seconds of the phase.
+        timed_out (bool): The phase was killed after its timeout.
+        truncated (bool): Some output was dropped.
+        data (dict, optional): Result written by a harness, if one was used.
+    """
+
+    def __init__(self, language, phase, stdout, stderr, exit_code, elapsed, timed_out=False, truncated=False, data=None):
+        self.language = language
+        self.phase = phase
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exit_code = exit_code
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+        self.truncated = truncated
+        self.data = data
+
+    def status(self) -> str:
+        """One-line description of how the program ended."""
+        if self.timed_out:
+            what = "Compilation" if self.phase == "compile" else "Program"
+            return f"{what} stopped after the {self.elapsed:.1f} s time limit"
+        if self.phase == "compile":
+            return f"Compilation failed (exit code {self.exit_code})"
+        if self.exit_code < 0:
+            name = signal.Signals(-self.exit_code).name if -self.exit_code in signal.valid_signals() else str(-self.exit_code)
+            reason = {"SIGXCPU": " (CPU time limit)", "SIGXFSZ": " (file size limit)", "SIGKILL": " (killed)"}.get(name, "")
+            return f"Terminated by {name}{reason} after {self.elapsed * 1000:.0f} ms"
+        return f"Exited with code {self.exit_code} in {self.elapsed * 1000:.0f} ms"
+
+
+_isolation_checks = {}
+_isolation_lock = threading.Lock()
+_go_cache_ready = False
+
+
+def _exposed_paths() -> list:
+    # Toolchain installations, which may live inside a hidden directory (a
+    # virtualenv in the application's directory, ~/.nvm, ...)
+    prefixes = {sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix}
+    prefixes.add(os.path.dirname(os.path.dirname(os.path.realpath(sys.executable))))
+    for toolchain in TOOLCHAINS.values():
+        for executable in toolchain.executables:
+            found = shutil.which(executable)
+            if found:
+                prefixes.add(os.path.dirname(os.path.dirname(os.path.realpath(found))))
+    # Exposing a hidden directory (or one that contains it) would undo the hiding
+    hidden = [os.path.realpath(path) for path in SANDBOX_TMP_PATHS + SANDBOX_HIDDEN_PATHS]
+    return sorted(
+        path for path in prefixes
+        if not any(directory == path or directory.startswith(path.rstrip("/") + "/") for directory in hidden)
+    )
+
+
+def _confinement(directory: str, network: bool) -> dict:
+    # What sandbox_worker.confine isolates for a run in this scratch directory
+    return {
+        "uid": SANDBOX_UID,
+        "network": network,
+        "tmp": [os.path.realpath(path) for path in SANDBOX_TMP_PATHS],
+        "hide": [os.path.realpath(path) for path in SANDBOX_HIDDEN_PATHS],
+        "writable": [directory, GO_CACHE_DIRECTORY],
+        "expose": _exposed_paths(),
+    }
+
+
+def _hand_over(path: str):
+    # Give SANDBOX_UID the files the server created for it (only needed as root)
+    if os.geteuid() != 0:
+        return
+    for root, _, files in os.walk(path):
+        os.chown(root, SANDBOX_UID, SANDBOX_UID)
+        for name in files:
+            os.chown(os.path.join(root, name), SANDBOX_UID, SANDBOX_UID, follow_symlinks=False)
+
+
+def _prepare_go_cache():
+    # The shared cache must exist to be made writable inside the sandbox
+    global _go_cache_ready
+    if not _go_cache_ready:
+        with _isolation_lock:
+            if not _go_cache_ready:
+                os.makedirs(GO_CACHE_DIRECTORY, exist_ok=True)
+                _hand_over(GO_CACHE_DIRECTORY)
+                _go_cache_ready = True
+
+
+def _isolation_works(network: bool) -> bool:
+    with tempfile.TemporaryDirectory(prefix="fixifox-check-") as directory:
+        _hand_over(directory)
+        try:
+            subprocess.run(
+                ["true"], start_new_session=True, check=True, timeout=5,
+                preexec_fn=_preexec([], _confinement(directory, network), directory),
+            )
+            return True
+        except (OSError, subprocess.SubprocessError):
+            return False
+
+
+def _isolation_available(network: bool) -> bool:
+    # Checked once per kind
+    if network not in _isolation_checks:
+        with _isolation_lock:
+            if network not in _isolation_checks:
+                supported = resource is not None and sys.platform.startswith("linux")
+                _isolation_checks[network] = supported and _isolation_works(network)
+    return _isolation_checks[network]
+
+
+def sandbox_isolation_available() -> bool:
+    """Return whether child processes can be confined (see sandbox_worker.confine), checked once."""
+    return _isolation_available(False)
+
+
+def network_isolation_available() -> bool:
+    """Return whether confined child processes can also get their own network namespace (checked once)."""
+    return _isolation_available(True)
+
+
+def can_run_locally(language: str) -> bool:
+    """
+    Return whether code in a language can be run in the sandbox here.
+
+    Requires SANDBOX_ENABLED, rlimit support, the language's toolchain, the
+    sandbox's confinement and, unless SANDBOX_REQUIRE_NETWORK_ISOLATION is
+    off, network isolation.
+    """
+    toolchain = TOOLCHAINS.get(language)
+    if not SANDBOX_ENABLED or resource is None or toolchain is None:
+        return False
+    if not all(shutil.which(executable) for executable in toolchain.executables):
+        return False
+    if not sandbox_isolation_available():
+        return False
+    return network_isolation_available() or not SANDBOX_REQUIRE_NETWORK_ISOLATION
+
+
+def _limits(cpu_seconds: int, memory_mb: int, file_size_mb: int) -> list:
+    limits = [
+        (resource.RLIMIT_CPU, cpu_seconds),
+        (resource.RLIMIT_FSIZE, file_size_mb * 1024 * 1024),
+        (resource.RLIMIT_NOFILE, SANDBOX_MAX_OPEN_FILES),
+        (resource.RLIMIT_NPROC, SANDBOX_MAX_PROCESSES),
+        (resource.RLIMIT_CORE, 0),
+    ]
+    if memory_mb:
+        limits.append((resource.RLIMIT_AS, memory_mb * 1024 * 1024))
+    return limits
+
+
+def _preexec(limits: list, confinement: dict, directory: str):
+    # Build the function run in the child before exec: confinement, then
+    # rlimits. The working directory is entered again inside the new mounts.
+    def apply():
+        confine(confinement)
+        os.chdir(directory)
+        apply_limits(limits)
+    return apply
+
+
+def prewarm_sandbox():
+    """Start the warm Python worker pool in the background, if Python runs are pooled."""
+    if SANDBOX_POOL_SIZE > 0 and can_run_locally("Python"):
+        threading.Thread(target=get_sandbox_pool, name="sandbox-pool-prewarm", daemon=True).start()
+
+
+def _read_capped(file):
+    # Read from the server's own descriptor: the program can replace the
+    # file in its writable directory (e.g. with a symlink to a host file), so
+    # it must never be opened again by path after the run
+    file.seek(0)
+    data = file.read(SANDBOX_MAX_OUTPUT_BYTES + 1)
+    truncated = len(data) > SANDBOX_MAX_OUTPUT_BYTES
+    return data[:SANDBOX_MAX_OUTPUT_BYTES].decode("utf-8", errors="replace"), truncated
+
+
+def _execute(command: list, directory: str, stdin_path: str, environment: dict, limits: list, timeout: float):
+    # Run one command with its output in files; returns (exit code, stdout, stderr, elapsed, timed out, truncated)
+    stdout_path = os.path.join(directory, ".stdout")
+    stderr_path = os.path.join(directory, ".stderr")
+    with open(stdin_path, "rb") as stdin, open(stdout_path, "w+b") as stdout, open(stderr_path, "w+b") as stderr:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            cwd=directory,
+            env=environment,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            start_new_session=True,
+            preexec_fn=_preexec(limits, _confinement(directory, network_isolation_available()), directory),
+        )
+        timed_out = False
+        try:
+            exit_code = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+        # Kill the whole process group, including anything the program started
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        exit_code = process.wait()
+        elapsed = time.perf_counter() - started
+        output, stdout_truncated = _read_capped(stdout)
+        errors, stderr_truncated = _read_capped(stderr)
+    return exit_code, output, errors, elapsed, timed_out, stdout_truncated or stderr_truncated
+
+
+def _execute_in_pool(command: list, directory: str, stdin_path: str, environment: dict, limits: list, timeout: float):
+    # Run a Python command's script on a warm worker (see sandbox_pool); same return value as _execute
+    stdout_path = os.path.join(directory, ".stdout")
+    stderr_path = os.path.join(directory, ".stderr")
+    script = next(index for index, part in enumerate(command) if part.endswith(".py"))
+    # Created here, opened by path only by the worker's child before the
+    # program starts, and read back through these descriptors (see _read_capped)
+    with open(stdout_path, "w+b") as stdout, open(stderr_path, "w+b") as stderr:
+        reply = get_sandbox_pool().run({
+            "directory": directory,
+            "file": os.path.join(directory, command[script]),
+            "argv": command[script:],
+            "stdin": stdin_path,
+            "stdout": stdout_path,
+            "stderr": stderr_path,
+            "environment": environment,
+            "limits": limits,
+            "timeout": timeout,
+            "confinement": _confinement(directory, network_isolation_available()),
+        })
+        output, stdout_truncated = _read_capped(stdout)
+        errors, stderr_truncated = _read_capped(stderr)
+    return reply["exit_code"], output, errors, reply["elapsed"], reply["timed_out"], stdout_truncated or stderr_truncated
+
+
+def _read_harness_result(file):
+    # Like _read_capped, through the descriptor opened before the run
+    file.seek(0)
+    data = file.read(HARNESS_MAX_RESULT_BYTES + 1)
+    if len(data) > HARNESS_MAX_RESULT_BYTES:
+        return None
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def _environment(directory: str) -> dict:
+    # The only environment variables sandboxed processes see
+    return {
+        "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
+        "HOME": directory,
+        "TMPDIR": directory,
+        "LANG": "C.UTF-8",
+        "PYTHONIOENCODING": "utf-8",
+        "GOCACHE": GO_CACHE_DIRECTORY,
+        "GOPATH": os.path.join(GO_CACHE_DIRECTORY, "path"),
+        "GO111MODULE": "off",
+    }
+
+
+def run_tool(command: list, file_name: str, code: str, timeout: float):
+    """
+    Run a toolchain command on code with the same confinement as run_code.
+
+    Unlike run_code this does not require SANDBOX_ENABLED: the command is a
+    trusted tool such as a syntax checker, only its input is untrusted.
+
+    Args:
+        command (list): The command; it runs in a scratch directory holding
+            the code, so it can refer to it by file_name.
+        file_name (str): Name of the file the code is written to.
+        code (str): The source code.
+        timeout (float): Seconds the command may take (also its CPU limit).
+
+    Returns:
+        tuple: (exit code, stdout, stderr, timed out).
+
+    Raises:
+        ValueError: If sandboxed processes cannot be confined here
+            (see sandbox_isolation_available).
+    """
+    if not sandbox_isolation_available():
+        raise ValueError("Tools cannot be run confined on this server")
+    with tempfile.TemporaryDirectory(prefix="fixifox-tool-") as directory:
+        with open(os.path.join(directory, file_name), "w", encoding="utf-8") as file:
+            file.write(code)
+        _hand_over(directory)
+        exit_code, output, errors, _, timed_out, _ = _execute(
+            command, directory, os.devnull, _environment(directory),
+            _limits(int(timeout) + 1, 0, SANDBOX_FILE_SIZE_MB), timeout
+        )
+    return exit_code, output, errors, timed_out
+
+
+def run_code(code: str, language: str, stdin: str = "", harness=None, harness_args: list = ()) -> ExecutionResult:
+    """
+    Build and run code in the sandbox.
+
+    Args:
+        code (str): The program's source code.
+        language (str): Language name as shown in the app, e.g. "Python" or "C++".
+        stdin (str, optional): Text fed to the program as standard input.
+        harness (module, optional): A standard-library-only Python module run
+            instead of the program, as ``harness.py main.py .result.json
+            *harness_args``. It runs the program itself (e.g. under a tracer)
+            and writes a JSON result, returned as ExecutionResult.data.
+        harness_args (list, optional): Extra string arguments for the harness.
+
+    Returns:
+        ExecutionResult: Output and exit status of the run, or of the build if it failed.
+
+    Raises:
+        ValueError: If the language cannot be run here (see can_run_locally),
+            or a harness is given for a language other than Python.
+        SandboxBusyError: If Python runs are pooled and no worker became free in time.
+    """
+    if not can_run_locally(language):
+        raise ValueError(f"{language} code cannot be run locally on this server")
+    if harness is not None and language != "Python":
+        raise ValueError("Harnesses can only run Python code")
+    toolchain = TOOLCHAINS[language]
+    class_match = JAVA_CLASS.search(code)
+    replacements = {"{class}": class_match.group(1) if class_match else "Main", "{memory}": str(SANDBOX_MEMORY_MB)}
+
+    def expand(part):
+        for placeholder, value in replacements.items():
+            part = part.replace(placeholder, value)
+        return part
+
+    with tempfile.TemporaryDirectory(prefix="fixifox-run-") as directory:
+        with open(os.path.join(directory, expand(toolchain.file_name)), "w", encoding="utf-8") as file:
+            file.write(code)
+        stdin_path = os.path.join(directory, ".stdin")
+        with open(stdin_path, "w", encoding="utf-8") as file:
+            file.write(stdin)
+        environment = _environment(directory)
+        if language == "Go":
+            _prepare_go_cache()
+
+        if toolchain.compile:
+            _hand_over(directory)
+            # Compilers get more time and memory than the program itself
+            exit_code, output, errors, elapsed, timed_out, truncated = _execute(
+                [expand(part) for part in toolchain.compile], directory, stdin_path, environment,
+                _limits(int(SANDBOX_COMPILE_TIMEOUT), 0, 256), SANDBOX_COMPILE_TIMEOUT
+            )
+            if exit_code or timed_out:
+                return ExecutionResult(language, "compile", output, errors, exit_code, elapsed, timed_out, truncated)
+
+        command = [expand(part) for part in toolchain.run]
+        if harness is not None:
+            shutil.copyfile(harness.__file__, os.path.join(directory, HARNESS_FILE))
+            command = command[:-1] + [HARNESS_FILE, toolchain.file_name, HARNESS_RESULT_FILE, *harness_args]
+
+        # The harness writes its result into a file created here, which is read
+        # back through this descriptor
+        result_file = open(os.path.join(directory, HARNESS_RESULT_FILE), "w+b") if harness is not None else None
+        with result_file or contextlib.nullcontext():
+            _hand_over(directory)
+            memory_mb = SANDBOX_MEMORY_MB if toolchain.limit_address_space else 0
+            limits = _limits(SANDBOX_CPU_SECONDS, memory_mb, SANDBOX_FILE_SIZE_MB)
+            execute = _execute_in_pool if language == "Python" and SANDBOX_POOL_SIZE > 0 else _execute
+            exit_code, output, errors, elapsed, timed_out, truncated = execute(
+                command, directory, stdin_path, environment, limits, SANDBOX_TIMEOUT
+            )
+            data = _read_harness_result(result_file) if result_file is not None else None
+        return ExecutionResult(language, "run", output, errors, exit_code, elapsed, timed_out, truncated, data)
@@ -0,0 +1,229 @@
+"""
+Pool of warm Python sandbox workers.
+
+Starting an interpreter and importing modules on every Run click costs tens
+of milliseconds and does not scale to many concurrent users. The pool keeps
+SANDBOX_POOL_SIZE worker processes (see sandbox_worker.py) running with the
+common standard library modules already imported. A job takes an idle
+worker, which forks a fresh, confined child for it, so jobs stay isolated
+from each other and from the worker while skipping interpreter startup. Jobs wait in a queue when every
+worker is busy; workers are replaced when they die, fail a health check or
+have served SANDBOX_POOL_MAX_JOBS jobs.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import select
+import threading
+import subprocess
+from collections import deque
+
+SANDBOX_POOL_SIZE = int(os.environ.get("FIXIFOX_SANDBOX_POOL_SIZE", "2"))
+SANDBOX_POOL_MAX_JOBS = int(os.environ.get("FIXIFOX_SANDBOX_POOL_MAX_JOBS", "100"))
+# Seconds a job may wait for a free worker
+SANDBOX_POOL_QUEUE_TIMEOUT = float(os.environ.get("FIXIFOX_SANDBOX_POOL_QUEUE_TIMEOUT", "10"))
+SANDBOX_POOL_HEALTH_INTERVAL = float(os.environ.get("FIXIFOX_SANDBOX_POOL_HEALTH_INTERVAL", "15"))
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+# Extra seconds a worker may take to answer beyond the job's own timeout
+WORKER_REPLY_GRACE = 5.0
+# Latency samples kept for the statistics
+STATS_WINDOW = 200
+
+
+class SandboxBusyError(Exception):
+    """Raised when no worker became free within SANDBOX_POOL_QUEUE_TIMEOUT."""
+
+
+class _Worker:
+    # One warm worker process and its control pipes
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", "-S", WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8"},
+        )
+        self.jobs = 0
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, message: dict, timeout: float) -> dict:
+        self.process.stdin.write(json.dumps(message).encode() + b"\n")
+        self.process.stdin.flush()
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise TimeoutError("the sandbox worker did not answer")
+        line = self.process.stdout.readline()
+        if not line:
+            raise OSError("the sandbox worker exited")
+        return json.loads(line)
+
+    def stop(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            pipe.close()
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of warm sandbox workers.
+
+    Args:
+        size (int): Number of worker processes.
+        max_jobs (int): Jobs a worker serves before it is replaced.
+    """
+
+    def __init__(self, size: int = SANDBOX_POOL_SIZE, max_jobs: int = SANDBOX_POOL_MAX_JOBS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._waiting = 0
+        self.jobs = 0
+        self.failures = 0
+        self.recycled = 0
+        self.replaced = 0
+        self._queue_waits = deque(maxlen=STATS_WINDOW)
+        self._latencies = deque(maxlen=STATS_WINDOW)
+        for _ in range(size):
+            self._idle.put(_Worker())
+        self._health_thread = threading.Thread(target=self._check_health, name="sandbox-pool-health", daemon=True)
+        self._health_thread.start()
+
+    def run(self, job: dict) -> dict:
+        """
+        Run one job on a free worker, waiting in the queue if all are busy.
+
+        Args:
+            job (dict): The job for sandbox_worker (directory, file, stdin,
+                stdout, stderr, environment, limits, timeout, confinement).
+
+        Returns:
+            dict: The worker's reply: exit_code, elapsed and timed_out.
+
+        Raises:
+            SandboxBusyError: If no worker became free in time.
+            OSError, TimeoutError: If the worker failed; it is replaced.
+        """
+        with self._lock:
+            self._waiting += 1
+        queued = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=SANDBOX_POOL_QUEUE_TIMEOUT)
+        except queue.Empty:
+            raise SandboxBusyError(f"All {self.size} sandbox workers are busy; try again shortly") from None
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        started = time.perf_counter()
+        with self._lock:
+            self._busy += 1
+            self._queue_waits.append(started - queued)
+
+        try:
+            if not worker.alive():
+                worker = self._replace(worker)
+            reply = worker.request(job, job["timeout"] + WORKER_REPLY_GRACE)
+            worker.jobs += 1
+        except (OSError, ValueError, TimeoutError):
+            with self._lock:
+                self.failures += 1
+            worker = self._replace(worker)
+            raise
+        finally:
+            if worker.jobs >= self.max_jobs:
+                with self._lock:
+                    self.recycled += 1
+                worker.stop()
+                worker = _Worker()
+            with self._lock:
+                self._busy -= 1
+            self._idle.put(worker)
+
+        with self._lock:
+            self.jobs += 1
+            self._latencies.append(time.perf_counter() - started)
+        return reply
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.stop()
+        with self._lock:
+            self.replaced += 1
+        return _Worker()
+
+    def _check_health(self):
+        # Ping idle workers now and then; replace the ones that died or hang
+        while True:
+            time.sleep(SANDBOX_POOL_HEALTH_INTERVAL)
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    worker.request({"ping": True}, WORKER_REPLY_GRACE)
+                except (OSError, ValueError, TimeoutError):
+                    worker = self._replace(worker)
+                self._idle.put(worker)
+
+    def stats(self) -> dict:
+        """
+        Return pool utilization and latency statistics.
+
+        Returns:
+            dict: size, busy, idle, waiting, utilization (busy / size), jobs,
+                failures, recycled, replaced, and average and 95th percentile
+                queue wait and job latency in seconds over recent jobs.
+        """
+        with self._lock:
+            waits = list(self._queue_waits)
+            latencies = list(self._latencies)
+            return {
+                "size": self.size,
+                "busy": self._busy,
+                "idle": self._idle.qsize(),
+                "waiting": self._waiting,
+                "utilization": self._busy / self.size if self.size else 0.0,
+                "jobs": self.jobs,
+                "failures": self.failures,
+                "recycled": self.recycled,
+                "replaced": self.replaced,
+                "avg_queue_wait": sum(waits) / len(waits) if waits else 0.0,
+                "p95_queue_wait": _percentile(waits, 0.95),
+                "avg_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p95_latency": _percentile(latencies, 0.95),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the process-wide sandbox worker pool, starting its workers on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SandboxPool()
+    return _pool
+
+
+def sandbox_pool_stats():
+    """Return the pool's statistics, or None if the pool has not been started."""
+    return _pool.stats() if _pool is not None else None
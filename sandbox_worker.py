@@ -0,0 +1,333 @@
+"""
+Code that runs inside sandbox processes.
+
+Imported by sandbox.py for the confinement and rlimits of the processes it
+starts, and run as a script by sandbox_pool.py as a warm Python worker:
+
+    python -I -S sandbox_worker.py
+
+A worker imports the commonly used standard library modules once, then reads
+one JSON job per line from stdin. For each job it forks a child that enters
+its own session, redirects stdin/stdout/stderr to the job's files, confines
+itself like any other sandboxed process (see confine), applies the rlimits
+and runs the program with runpy. The worker enforces the wall-clock timeout,
+kills the child's process group, and answers with one JSON line.
+
+The worker is a clean template that never runs user code: each job runs in a
+fresh fork of it that is thrown away afterwards, together with its mount
+namespace and private temporary directories. Inside, the job runs under
+another uid (or user namespace) and PID namespace, so it cannot see, trace or
+signal the worker, and the worker's control pipes are closed before the
+program starts. A job therefore cannot change the worker or the next job.
+
+This file only uses the standard library: it is started with -I, so the
+application's modules are not importable from the worker.
+"""
+import os
+import re
+import sys
+import json
+import time
+import signal
+import ctypes
+import resource
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_NOATIME = 0x400
+MS_NODIRATIME = 0x800
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+# Per-mount flags that must be repeated on a bind remount (the statvfs
+# ST_* values are the same as the MS_* ones)
+LOCKED_MOUNT_FLAGS = MS_NOSUID | MS_NODEV | MS_NOEXEC | MS_NOATIME | MS_NODIRATIME | MS_RELATIME
+PR_SET_PDEATHSIG = 1
+PR_SET_NO_NEW_PRIVS = 38
+# Size of each tmpfs (the private temporary directories and the empty ones
+# mounted over hidden paths)
+TMPFS_SIZE = "64m"
+
+# Imported once by each worker so programs using them start instantly
+PRELOADED_MODULES = [
+    "math", "random", "re", "json", "collections", "itertools", "functools", "heapq", "bisect",
+    "string", "datetime", "decimal", "fractions", "statistics", "dataclasses", "typing", "copy",
+    "traceback", "runpy",
+]
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _write_id_maps(uid: int, gid: int):
+    # Map the ids to themselves, so file permissions are unchanged
+    for name, content in (("setgroups", "deny"), ("uid_map", f"{uid} {uid} 1"), ("gid_map", f"{gid} {gid} 1")):
+        with open(f"/proc/self/{name}", "w") as file:
+            file.write(content)
+
+
+def _mount(source, target: str, fstype, flags: int, data=None):
+    encode = lambda value: value.encode() if isinstance(value, str) else value
+    if _libc.mount(encode(source), encode(target), encode(fstype), flags, encode(data)) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, f"cannot mount {target}: {os.strerror(error)}")
+
+
+def _mount_points() -> list:
+    with open("/proc/self/mountinfo") as file:
+        points = [line.split()[4] for line in file]
+    # Spaces and other special characters are escaped as octal
+    return [re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), point) for point in points]
+
+
+def _inside(path: str, directories) -> bool:
+    return any(path == directory or path.startswith(directory.rstrip("/") + "/") for directory in directories)
+
+
+def _set_up_filesystem(confinement: dict):
+    # In the new mount namespace: make every mount read-only, put a private
+    # tmpfs over the temporary directories and an empty read-only one over the
+    # hidden paths, then bring back the writable and exposed paths
+    _mount(None, "/", None, MS_REC | MS_PRIVATE)
+    writable = confinement["writable"]
+    # Opened before anything is hidden, to be bound back from the descriptors
+    handles = {path: os.open(path, os.O_PATH) for path in writable + confinement["expose"] if os.path.exists(path)}
+
+    for point in _mount_points():
+        if point == "/proc" or point.startswith("/proc/"):
+            continue
+        try:
+            flags = os.statvfs(point).f_flag & LOCKED_MOUNT_FLAGS
+        except OSError:
+            # Shadowed by another mount
+            continue
+        _mount(None, point, None, MS_REMOUNT | MS_BIND | MS_RDONLY | flags)
+
+    covered = []
+    for path in sorted(set(confinement["tmp"]) | set(confinement["hide"])):
+        # A path inside an already covered directory is gone anyway
+        if os.path.isdir(path) and not os.path.islink(path) and not _inside(path, covered):
+            mode = "1777" if path in confinement["tmp"] else "755"
+            _mount("tmpfs", path, "tmpfs", MS_NOSUID | MS_NODEV, f"size={TMPFS_SIZE},mode={mode}")
+            covered.append(path)
+
+    for path, handle in handles.items():
+        if path in writable or _inside(path, covered):
+            if not os.path.exists(path):
+                if os.path.isdir(f"/proc/self/fd/{handle}"):
+                    os.makedirs(path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    open(path, "w").close()
+            _mount(f"/proc/self/fd/{handle}", path, None, MS_BIND | MS_REC)
+            flags = os.statvfs(path).f_flag & LOCKED_MOUNT_FLAGS
+            read_only = 0 if path in writable else MS_RDONLY
+            _mount(None, path, None, MS_REMOUNT | MS_BIND | read_only | flags | MS_NOSUID | MS_NODEV)
+        os.close(handle)
+
+    for path in covered:
+        if path not in confinement["tmp"]:
+            _mount(None, path, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV, f"size={TMPFS_SIZE}")
+
+    # Only the sandbox's own processes in /proc
+    try:
+        _mount("proc", "/proc", "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC)
+    except OSError:
+        # Not allowed where parts of /proc are masked (e.g. in containers): hide it
+        _mount("tmpfs", "/proc", "tmpfs", MS_NOSUID | MS_NODEV | MS_NOEXEC, "size=16k,mode=555")
+
+
+def _exit_like(pid: int):
+    # Wait for a child and end this process the same way (exit code or signal)
+    os.closerange(3, 65536)
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        number = os.WTERMSIG(status)
+        signal.signal(number, signal.SIG_DFL)
+        os.kill(os.getpid(), number)
+    os._exit(os.waitstatus_to_exitcode(status) & 0xFF)
+
+
+def confine(confinement: dict):
+    """
+    Confine the current process before it runs untrusted code.
+
+    The process gets its own mount, PID and IPC namespaces (and network
+    namespace with confinement["network"]); when it does not run as root, a
+    user namespace lets it create them. It then forks: this process only
+    waits for the child and exits with its status, and the child continues as
+    PID 1 of the new PID namespace. In the child, every mount is made
+    read-only, the confinement["tmp"] directories get a private tmpfs, the
+    confinement["hide"] directories are replaced with an empty read-only one,
+    the confinement["writable"] directories are bound back writable and the
+    confinement["expose"] paths inside covered directories read-only, and
+    /proc only shows the sandbox's processes. Finally the child gives up the
+    privileges needed to undo any of this: as root it switches to
+    confinement["uid"], otherwise it enters a nested user namespace.
+
+    The process must be single-threaded (between fork and exec, or in a
+    forked worker child) and in its own session, so that killing the
+    process group stops both processes; the child is also killed, with
+    everything in its PID namespace, when this process dies.
+
+    Args:
+        confinement (dict): uid (int), network (bool), and tmp, hide,
+            writable and expose (lists of absolute paths).
+
+    Raises:
+        OSError: If a namespace or mount cannot be set up.
+    """
+    as_root = os.getuid() == 0
+    uid, gid = os.getuid(), os.getgid()
+    flags = CLONE_NEWNS | CLONE_NEWPID | CLONE_NEWIPC
+    if confinement.get("network"):
+        flags |= CLONE_NEWNET
+    if not as_root:
+        flags |= CLONE_NEWUSER
+    if _libc.unshare(flags) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, f"cannot create the sandbox namespaces: {os.strerror(error)}")
+    if not as_root:
+        _write_id_maps(uid, gid)
+
+    pid = os.fork()
+    if pid:
+        _exit_like(pid)
+    # Killing the waiting parent (on timeout) takes down the whole namespace,
+    # even processes that left the process group
+    _libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0)
+    _set_up_filesystem(confinement)
+    if as_root:
+        # Dropping root also drops every capability
+        os.setgroups([])
+        os.setgid(confinement["uid"])
+        os.setuid(confinement["uid"])
+        # Changing the uid clears the parent death signal
+        _libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0)
+    elif _libc.unshare(CLONE_NEWUSER) == 0:
+        _write_id_maps(uid, gid)
+    else:
+        error = ctypes.get_errno()
+        raise OSError(error, f"cannot drop the sandbox setup privileges: {os.strerror(error)}")
+    _libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+
+
+def apply_limits(limits):
+    """Set rlimits given as [(resource.RLIMIT_*, value), ...] as both soft and hard limits."""
+    for limit, value in limits:
+        resource.setrlimit(limit, (value, value))
+
+
+def _run_child(job):
+    # In the forked child: isolate, redirect and run the program, never return
+    code = 1
+    try:
+        os.setsid()
+        for fd, path, flags in (
+            (0, job["stdin"], os.O_RDONLY),
+            (1, job["stdout"], os.O_WRONLY | os.O_TRUNC),
+            (2, job["stderr"], os.O_WRONLY | os.O_TRUNC),
+        ):
+            # The server created these files and reads them back through its
+            # own descriptors, so they must be the same files
+            opened = os.open(path, flags | os.O_NOFOLLOW)
+            os.dup2(opened, fd)
+            os.close(opened)
+        # Drop the worker's control pipes before confining, so the program
+        # cannot reach them
+        os.closerange(3, 1024)
+        try:
+            confine(job["confinement"])
+        except OSError as error:
+            os.write(2, f"Cannot confine the sandbox: {error}\n".encode())
+            raise
+        os.chdir(job["directory"])
+        apply_limits(job["limits"])
+        os.environ.clear()
+        os.environ.update(job["environment"])
+        sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+        sys.stdout = open(1, "w", encoding="utf-8", closefd=False)
+        sys.stderr = open(2, "w", encoding="utf-8", closefd=False)
+        sys.argv = job.get("argv", [job["file"]])
+        code = 0
+        try:
+            runpy.run_path(job["file"], run_name="__main__")
+        except SystemExit as error:
+            code = error.code if isinstance(error.code, int) else (0 if error.code is None else 1)
+            if error.code is not None and not isinstance(error.code, int):
+                print(error.code, file=sys.stderr)
+        except BaseException as error:
+            # Show the traceback from the program's own frames, as a plain run would
+            trace = traceback.TracebackException.from_exception(error)
+            frames = list(trace.stack)
+            first = next((index for index, frame in enumerate(frames) if frame.filename == job["file"]), 0)
+            trace.stack = traceback.StackSummary.from_list(frames[first:])
+            sys.stderr.write("".join(trace.format()))
+            code = 1
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+    finally:
+        os._exit(code)
+
+
+def _wait(pid, timeout):
+    # Wait for the child with a wall-clock timeout; returns (status, elapsed, timed out)
+    started = time.perf_counter()
+    delay = 0.0005
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return status, time.perf_counter() - started, False
+        if time.perf_counter() - started >= timeout:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # The child has not called setsid yet
+                os.kill(pid, signal.SIGKILL)
+            _, status = os.waitpid(pid, 0)
+            return status, time.perf_counter() - started, True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.01)
+
+
+def serve():
+    """Answer jobs from stdin until it is closed."""
+    control_in = sys.stdin.buffer
+    control_out = sys.stdout.buffer
+    for line in control_in:
+        job = json.loads(line)
+        if job.get("ping"):
+            reply = {"pong": True, "pid": os.getpid()}
+        else:
+            pid = os.fork()
+            if pid == 0:
+                _run_child(job)
+            status, elapsed, timed_out = _wait(pid, job["timeout"])
+            # Kill anything the program left running in its session
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            reply = {"exit_code": os.waitstatus_to_exitcode(status), "elapsed": elapsed, "timed_out": timed_out}
+        control_out.write(json.dumps(reply).encode() + b"\n")
+        control_out.flush()
+
+
+if __name__ == "__main__":
+    for module in PRELOADED_MODULES:
+        __import__(module)
+    import runpy
+    import traceback
+    serve()
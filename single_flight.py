@@ -0,0 +1,196 @@
+"""
+Single-flight coalescing of identical in-flight LLM requests.
+
+When several sessions send the same request (same function, model, prompt and
+parameters) at the same time, only the first one goes upstream. The others
+attach to that in-flight call and receive its result, or its streamed deltas
+as they arrive, instead of sending their own copy.
+"""
+import asyncio
+import threading
+import contextvars
+
+
+class _Flight:
+    # State of one in-flight upstream call shared by all of its subscribers
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.deltas = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.futures = []
+
+    def wait_result(self):
+        with self.cond:
+            while not self.done:
+                self.cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    async def wait_result_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.cond:
+            if not self.done:
+                self.futures.append((loop, future))
+        if not future.done() and not self.done:
+            await future
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """Registry of in-flight calls keyed by request hash."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.leaders += 1
+            return flight, True
+
+    def _finish(self, key: str, flight: _Flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            if error is None and not flight.deltas and result:
+                flight.deltas.append(result)
+            flight.result = result
+            flight.error = error
+            flight.done = True
+            flight.cond.notify_all()
+            for loop, future in flight.futures:
+                loop.call_soon_threadsafe(_wake, future)
+
+    def do(self, key: str, fn):
+        """
+        Run fn() unless an identical call is already in flight, in which case
+        wait for and return that call's result.
+
+        Args:
+            key (str): Request hash.
+            fn (callable): Zero-argument function performing the upstream call.
+
+        Returns:
+            The result of the (shared) call. Its exception is raised to every caller.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.wait_result()
+
+        try:
+            result = fn()
+        except Exception as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, result=result)
+        return result
+
+    async def do_async(self, key: str, fn):
+        """
+        Async counterpart of do(); fn is a zero-argument coroutine function.
+
+        Async and synchronous callers with the same key share one flight.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return await flight.wait_result_async()
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._finish(key, flight, error=RuntimeError("The shared request was cancelled"))
+            raise
+        except Exception as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, result=result)
+        return result
+
+    def stream(self, key: str, stream_fn):
+        """
+        Streaming counterpart of do().
+
+        The upstream stream is consumed by a background thread, so it completes
+        even if the session that started it goes away; every subscriber replays
+        the deltas received so far and then follows along live.
+
+        Yields:
+            str: Text deltas.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            def pump():
+                parts = []
+                try:
+                    for delta in stream_fn():
+                        parts.append(delta)
+                        with flight.cond:
+                            flight.deltas.append(delta)
+                            flight.cond.notify_all()
+                except Exception as e:
+                    self._finish(key, flight, error=e)
+                    return
+                self._finish(key, flight, result="".join(parts))
+
+            # Carry the caller's context (e.g. the current user) into the pump thread
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(pump,), name="fixifox-single-flight", daemon=True).start()
+
+        index = 0
+        while True:
+            with flight.cond:
+                while index >= len(flight.deltas) and not flight.done:
+                    flight.cond.wait()
+                new_deltas = flight.deltas[index:]
+                index = len(flight.deltas)
+                finished = flight.done
+            for delta in new_deltas:
+                yield delta
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def stats(self) -> dict:
+        """Return the number of upstream calls, coalesced requests and calls in flight."""
+        with self._lock:
+            return {
+                "upstream_calls": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight registry."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,366 @@
+"""
+Local security rules that run before the model-based security scan.
+
+Python code is checked by walking its ``ast``; other languages (and Python
+that does not parse) are checked with per-line regular expressions. The scan
+takes milliseconds, so its findings can be shown immediately, and only the
+regions around them are sent to the model to be confirmed and explained.
+"""
+import os
+import re
+import ast
+
+from code_chunks import CodeChunk
+
+# Lines of context around a finding outside any function, and the largest
+# enclosing function sent as a whole
+REGION_CONTEXT_LINES = int(os.environ.get("FIXIFOX_PRESCAN_CONTEXT_LINES", "5"))
+REGION_MAX_LINES = int(os.environ.get("FIXIFOX_PRESCAN_REGION_MAX_LINES", "80"))
+
+SECRET_NAME = re.compile(r"(?i)(pass(word|wd)?|secret|api_?key|auth_?token|access_?token|private_?key|access_?key)$")
+PASSWORD_NAME = re.compile(r"(?i)pass(word|wd)")
+PLACEHOLDER_VALUE = re.compile(r"(?i)^(x+|\*+|changeme|your[_ -].*|<.*>|\{.*\}|\$\{.*\}|none|null|test|example.*)$")
+SQL_KEYWORDS = re.compile(r"(?i)\b(select|insert|update|delete|replace|create|drop|alter)\b")
+
+SHELL_FUNCTIONS = {"subprocess.run", "subprocess.call", "subprocess.Popen", "subprocess.check_output", "subprocess.check_call"}
+DESERIALIZERS = {"pickle.loads", "pickle.load", "cPickle.loads", "cPickle.load", "marshal.loads", "marshal.load", "shelve.open", "yaml.unsafe_load", "dill.loads", "jsonpickle.decode"}
+WEAK_HASHES = {"hashlib.md5", "hashlib.sha1"}
+FAST_HASHES = {"hashlib.md5", "hashlib.sha1", "hashlib.sha224", "hashlib.sha256", "hashlib.sha384", "hashlib.sha512", "hashlib.blake2b", "hashlib.blake2s"}
+SQL_METHODS = {"execute", "executemany", "executescript", "raw", "query"}
+
+
+class Finding:
+    """
+    A potential vulnerability found by a local rule.
+
+    Args:
+        rule (str): Rule identifier, e.g. "PY-EVAL".
+        title (str): Vulnerability type.
+        severity (str): "Critical", "High", "Medium" or "Low".
+        line (int): 1-based line of the finding.
+        message (str): What was found.
+        fix (str): How to fix it.
+    """
+
+    def __init__(self, rule: str, title: str, severity: str, line: int, message: str, fix: str):
+        self.rule = rule
+        self.title = title
+        self.severity = severity
+        self.line = line
+        self.message = message
+        self.fix = fix
+
+    def as_issue(self) -> dict:
+        """Return the finding in the issue format of the model-based scan."""
+        return {
+            "type": self.title,
+            "severity": self.severity,
+            "description": f"Line {self.line}: {self.message}",
+            "explanation": f"Flagged by the local rule {self.rule}.",
+            "fix": self.fix,
+        }
+
+
+def _dotted_name(node, aliases: dict):
+    # "os.path.join" for a Name/Attribute chain, with import aliases resolved
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(aliases.get(node.id, node.id))
+    return ".".join(reversed(parts))
+
+
+def _import_aliases(tree) -> dict:
+    aliases = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                aliases[alias.asname or alias.name.split(".")[0]] = alias.name if alias.asname else alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            for alias in node.names:
+                aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+    return aliases
+
+
+def _keyword(call, name: str):
+    return next((keyword.value for keyword in call.keywords if keyword.arg == name), None)
+
+
+def _is_true(node) -> bool:
+    return isinstance(node, ast.Constant) and node.value is True
+
+
+def _is_false(node) -> bool:
+    return isinstance(node, ast.Constant) and node.value is False
+
+
+def _is_formatted_string(node) -> bool:
+    # f-strings, "..." % x, "..." + x and "...".format(x)
+    if isinstance(node, ast.JoinedStr):
+        return any(isinstance(value, ast.FormattedValue) for value in node.values)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mod, ast.Add)):
+        return any(isinstance(side, (ast.Constant, ast.JoinedStr, ast.BinOp)) for side in (node.left, node.right))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "format":
+        return isinstance(node.func.value, ast.Constant)
+    return False
+
+
+def _string_text(node) -> str:
+    # Literal text of a (possibly formatted) string expression, for keyword checks
+    return " ".join(
+        child.value for child in ast.walk(node) if isinstance(child, ast.Constant) and isinstance(child.value, str)
+    )
+
+
+def _is_secret_value(node) -> bool:
+    return (
+        isinstance(node, ast.Constant)
+        and isinstance(node.value, str)
+        and len(node.value) >= 4
+        and not PLACEHOLDER_VALUE.match(node.value)
+    )
+
+
+def _mentions_password(node) -> bool:
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and PASSWORD_NAME.search(child.id):
+            return True
+        if isinstance(child, ast.Attribute) and PASSWORD_NAME.search(child.attr):
+            return True
+    return False
+
+
+class _PythonRules(ast.NodeVisitor):
+    def __init__(self, aliases: dict):
+        self.aliases = aliases
+        self.findings = []
+        self.functions = []
+
+    def add(self, node, *args):
+        self.findings.append(Finding(args[0], args[1], args[2], node.lineno, args[3], args[4]))
+
+    def visit_FunctionDef(self, node):
+        self.functions.append(node.name)
+        self.generic_visit(node)
+        self.functions.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Assign(self, node):
+        for target in node.targets:
+            self.check_secret(node, target, node.value)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self.check_secret(node, node.target, node.value)
+        self.generic_visit(node)
+
+    def check_secret(self, node, target, value):
+        name = target.id if isinstance(target, ast.Name) else getattr(target, "attr", None)
+        if name and SECRET_NAME.search(name) and _is_secret_value(value):
+            self.add(node, "PY-SECRET", "Hardcoded credential", "High",
+                     f"'{name}' is assigned a literal secret.",
+                     "Load the value from an environment variable or a secrets manager.")
+
+    def visit_Call(self, node):
+        name = _dotted_name(node.func, self.aliases) or ""
+        short = name.rsplit(".", 1)[-1]
+
+        if name in ("eval", "exec", "builtins.eval", "builtins.exec"):
+            self.add(node, "PY-EVAL", "Code injection", "High",
+                     f"{short}() executes dynamically built code.",
+                     "Avoid eval/exec; parse the input explicitly (e.g. ast.literal_eval for literals).")
+        elif name in SHELL_FUNCTIONS and _is_true(_keyword(node, "shell")):
+            self.add(node, "PY-SHELL", "Command injection", "High",
+                     f"{name}() runs a shell with shell=True.",
+                     "Pass the command as a list of arguments and drop shell=True.")
+        elif name in ("os.system", "os.popen"):
+            constant = node.args and isinstance(node.args[0], ast.Constant)
+            self.add(node, "PY-SHELL", "Command injection", "Medium" if constant else "High",
+                     f"{name}() runs its argument through the shell.",
+                     "Use subprocess.run with a list of arguments instead.")
+        elif name in DESERIALIZERS:
+            self.add(node, "PY-DESERIALIZE", "Insecure deserialization", "High",
+                     f"{name}() can execute code while loading untrusted data.",
+                     "Use a data-only format such as JSON for untrusted input.")
+        elif name == "yaml.load":
+            loader = _keyword(node, "Loader")
+            if loader is None or "Safe" not in (_dotted_name(loader, self.aliases) or ""):
+                self.add(node, "PY-DESERIALIZE", "Insecure deserialization", "High",
+                         "yaml.load() without SafeLoader can construct arbitrary objects.",
+                         "Use yaml.safe_load().")
+        elif short in SQL_METHODS and isinstance(node.func, ast.Attribute) and node.args:
+            query = node.args[0]
+            if _is_formatted_string(query) and SQL_KEYWORDS.search(_string_text(query)):
+                self.add(node, "PY-SQL", "SQL injection", "High",
+                         f"The query passed to {short}() is built with string formatting.",
+                         "Use parameterized queries (placeholders and a parameters tuple).")
+        elif name == "tempfile.mktemp":
+            self.add(node, "PY-TEMPFILE", "Insecure temporary file", "Low",
+                     "tempfile.mktemp() is open to race conditions.",
+                     "Use tempfile.mkstemp() or NamedTemporaryFile().")
+
+        if name in FAST_HASHES and (
+            _mentions_password(node) or any(PASSWORD_NAME.search(function) for function in self.functions)
+        ):
+            self.add(node, "PY-PASSWORD-HASH", "Weak password hashing", "High",
+                     f"Passwords are hashed with {name}(), a fast unsalted hash.",
+                     "Use a salted, slow hash: hashlib.scrypt, hashlib.pbkdf2_hmac, bcrypt or argon2.")
+        elif name in WEAK_HASHES and not _is_false(_keyword(node, "usedforsecurity")):
+            self.add(node, "PY-WEAK-HASH", "Weak cryptographic hash", "Medium",
+                     f"{name}() is broken for security purposes.",
+                     "Use hashlib.sha256 or stronger (or pass usedforsecurity=False for non-security uses).")
+
+        verify = _keyword(node, "verify")
+        if _is_false(verify):
+            self.add(node, "PY-TLS", "Disabled certificate verification", "Medium",
+                     "TLS certificate verification is turned off (verify=False).",
+                     "Keep verification on; pass a CA bundle path if needed.")
+        if short == "run" and _is_true(_keyword(node, "debug")):
+            self.add(node, "PY-DEBUG", "Debug mode enabled", "Medium",
+                     "The application is started with debug=True.",
+                     "Disable debug mode outside development.")
+
+        for keyword in node.keywords:
+            if keyword.arg and SECRET_NAME.search(keyword.arg) and _is_secret_value(keyword.value):
+                self.add(keyword.value, "PY-SECRET", "Hardcoded credential", "High",
+                         f"A literal secret is passed as '{keyword.arg}'.",
+                         "Load the value from an environment variable or a secrets manager.")
+        self.generic_visit(node)
+
+
+# (rule, title, severity, pattern, message, fix) for languages without an AST pass
+REGEX_RULES = [
+    ("RX-EVAL", "Code injection", "High", re.compile(r"\beval\s*\(|\bnew\s+Function\s*\("),
+     "Dynamically built code is executed.", "Avoid eval; parse the input explicitly."),
+    ("RX-SHELL", "Command injection", "High",
+     re.compile(r"\b(child_process|execSync|shell_exec|passthru|popen|system)\s*\(|Runtime\.getRuntime\(\)\.exec|exec\.Command\(\s*\"(ba)?sh\"|shell\s*=\s*True"),
+     "A command is run through the shell.", "Pass arguments as a list and avoid the shell."),
+    ("RX-SQL", "SQL injection", "High",
+     re.compile(r"(?i)[\"'`]\s*(select|insert|update|delete)\b[^\"'`]*[\"'`]\s*(\+|\.)|\b(select|insert|update|delete)\b[^`\n]*\$\{"),
+     "A SQL query is built by concatenating strings.", "Use parameterized queries."),
+    ("RX-XSS", "Cross-site scripting", "Medium",
+     re.compile(r"\.(inner|outer)HTML\s*=|document\.write\s*\(|dangerouslySetInnerHTML"),
+     "HTML is written from a string.", "Use textContent or escape the value before inserting it."),
+    ("RX-BUFFER", "Buffer overflow", "Medium", re.compile(r"\b(strcpy|strcat|sprintf|vsprintf)\s*\("),
+     "An unbounded C string function is used.", "Use bounded variants such as snprintf or strncpy."),
+    ("RX-GETS", "Buffer overflow", "High", re.compile(r"\bgets\s*\("),
+     "gets() cannot limit the input length.", "Use fgets() with the buffer size."),
+    ("RX-DESERIALIZE", "Insecure deserialization", "High",
+     re.compile(r"\bunserialize\s*\(|ObjectInputStream|BinaryFormatter|pickle\.loads?\s*\("),
+     "Untrusted data may be deserialized into objects.", "Use a data-only format such as JSON."),
+    ("RX-WEAK-HASH", "Weak cryptographic hash", "Medium",
+     re.compile(r"(?i)\b(md5|sha1)\s*\(|getInstance\(\s*\"(md5|sha-?1)\"|createHash\(\s*['\"](md5|sha1)['\"]"),
+     "MD5 and SHA-1 are broken for security purposes.", "Use SHA-256 or stronger, and a slow salted hash for passwords."),
+    ("RX-SECRET", "Hardcoded credential", "High",
+     re.compile(r"(?i)\b(password|passwd|secret|api_?key|auth_?token|access_?token|private_?key)\w*\s*[:=]\s*[\"'][^\"'\s]{4,}[\"']"),
+     "A literal secret is assigned in the code.", "Load it from an environment variable or a secrets manager."),
+    ("RX-TLS", "Disabled certificate verification", "Medium",
+     re.compile(r"rejectUnauthorized\s*:\s*false|InsecureSkipVerify\s*:\s*true|verify\s*=\s*False|CURLOPT_SSL_VERIFYPEER\s*,\s*(false|0)"),
+     "TLS certificate verification is turned off.", "Keep certificate verification enabled."),
+]
+
+
+def _scan_python(code: str):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    rules = _PythonRules(_import_aliases(tree))
+    rules.visit(tree)
+    return rules.findings
+
+
+def _scan_regex(code: str) -> list:
+    findings = []
+    for number, line in enumerate(code.splitlines(), 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith(("//", "*", "/*", "#")) and not stripped.startswith("#include"):
+            continue
+        for rule, title, severity, pattern, message, fix in REGEX_RULES:
+            if pattern.search(line):
+                findings.append(Finding(rule, title, severity, number, message, fix))
+    return findings
+
+
+def scan_code(code: str, language: str = None) -> list:
+    """
+    Run the local security rules over code.
+
+    Args:
+        code (str): The source code.
+        language (str, optional): Programming language. Python (or unknown
+            code that parses as Python) is checked with the AST rules, the
+            rest with the regex rules.
+
+    Returns:
+        list: Finding objects ordered by line.
+    """
+    findings = None
+    if not language or language.lower() == "python":
+        findings = _scan_python(code)
+    if findings is None:
+        findings = _scan_regex(code)
+    # One finding per rule and line
+    unique = {(finding.line, finding.rule): finding for finding in findings}
+    return sorted(unique.values(), key=lambda finding: (finding.line, finding.rule))
+
+
+def _python_functions(code: str) -> list:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    functions = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            functions.append((start, node.end_lineno, node.name))
+    return functions
+
+
+def flagged_regions(code: str, findings: list, language: str = None) -> list:
+    """
+    Cut the code down to the regions around the findings.
+
+    A finding inside a Python function is sent with its innermost enclosing
+    function (up to REGION_MAX_LINES); otherwise REGION_CONTEXT_LINES lines
+    around it are used. Overlapping regions are merged.
+
+    Returns:
+        list: (CodeChunk, findings in that region) tuples in source order.
+    """
+    lines = code.splitlines(keepends=True)
+    functions = _python_functions(code) if not language or language.lower() == "python" else []
+    spans = []
+    for finding in findings:
+        enclosing = [
+            (start, end, name) for start, end, name in functions
+            if start <= finding.line <= end and end - start < REGION_MAX_LINES
+        ]
+        if enclosing:
+            start, end, name = max(enclosing, key=lambda function: function[0])
+        else:
+            start = max(1, finding.line - REGION_CONTEXT_LINES)
+            end = min(len(lines), finding.line + REGION_CONTEXT_LINES)
+            name = None
+        spans.append([start, end, [name] if name else [], [finding]])
+
+    spans.sort(key=lambda span: span[0])
+    merged = []
+    for span in spans:
+        if merged and span[0] <= merged[-1][1] + 1:
+            last = merged[-1]
+            last[1] = max(last[1], span[1])
+            last[2] += [name for name in span[2] if name not in last[2]]
+            last[3] += span[3]
+        else:
+            merged.append(span)
+    return [
+        (CodeChunk(start, end, "".join(lines[start - 1:end]), names), region_findings)
+        for start, end, names, region_findings in merged
+    ]
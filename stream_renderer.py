@@ -0,0 +1,230 @@
+"""
+Streamlit component for rendering streamed model output efficiently.
+
+Updating a single placeholder with the whole accumulated response on every
+token re-sends (and re-parses) everything already on screen, which is
+quadratic in the response size. StreamRenderer instead:
+
+- coalesces deltas and only flushes when enough time has passed or enough
+  bytes are pending, and
+- freezes completed output into its own elements so each flush only
+  re-sends the part currently being written: completed paragraphs in
+  markdown mode, and in code mode (or inside one long ``` fence in markdown
+  mode) completed lines, once RENDER_CODE_SEGMENT_BYTES of them are pending.
+
+Code split across elements shows as several code blocks while it streams;
+close() merges them into one with a single final send.
+"""
+import time
+import threading
+
+import streamlit as st
+
+from code_blocks import extract_code_block
+
+RENDER_MIN_INTERVAL = 0.08  # seconds between flushes
+RENDER_MIN_BYTES = 512      # pending bytes that force a flush
+RENDER_CODE_SEGMENT_BYTES = 4096  # completed code lines frozen into one element
+
+_totals_lock = threading.Lock()
+_totals = {"streams": 0, "flushes": 0, "bytes_sent": 0, "render_seconds": 0.0}
+
+
+class StreamRenderer:
+    """
+    Incrementally render a stream of text deltas.
+
+    Args:
+        container: Streamlit container to render into. Defaults to a new st.container().
+        mode (str, optional): "markdown" or "code". Defaults to "markdown".
+        language (str, optional): Syntax highlighting language in code mode. Defaults to 'python'.
+        min_interval (float, optional): Minimum seconds between flushes.
+        min_bytes (int, optional): Pending bytes that trigger a flush regardless of time.
+    """
+
+    def __init__(
+        self,
+        container=None,
+        mode: str = "markdown",
+        language: str = 'python',
+        min_interval: float = RENDER_MIN_INTERVAL,
+        min_bytes: int = RENDER_MIN_BYTES
+    ):
+        self.container = container if container is not None else st.container()
+        self.mode = mode
+        self.language = language
+        self.min_interval = min_interval
+        self.min_bytes = min_bytes
+
+        self.text = ""
+        self._segments = [self.container.empty()]
+        self._frozen_upto = 0      # text before this index lives in frozen segments
+        self._frozen_fences = 0    # number of ``` fences inside the frozen text
+        self._reopen_fence = ""    # fence opener repeated when a fence was split across segments
+        self._frozen_code = ""     # code mode: the extracted code in frozen segments
+        self._split = False        # whether a code block was split across segments
+        self._rendered_upto = 0    # text before this index has been flushed
+        self._last_flush = 0.0
+        self._started = time.perf_counter()
+
+        self.flushes = 0
+        self.bytes_sent = 0
+        self.render_seconds = 0.0
+        self.max_render_seconds = 0.0
+        self.first_flush_seconds = None
+
+    def write(self, delta: str):
+        """Add a delta, flushing to the browser if the coalescing thresholds are met."""
+        if not delta:
+            return
+        self.text += delta
+        pending = len(self.text) - self._rendered_upto
+        if pending >= self.min_bytes or time.perf_counter() - self._last_flush >= self.min_interval:
+            self.flush()
+
+    def render(self, deltas) -> str:
+        """
+        Consume an iterable of deltas, rendering as they arrive.
+
+        Returns:
+            str: The full text.
+        """
+        for delta in deltas:
+            self.write(delta)
+        self.close()
+        return self.text
+
+    def close(self) -> str:
+        """Flush any pending output, merge split code blocks and return the full text."""
+        if self._rendered_upto < len(self.text) or self.flushes == 0:
+            self.flush()
+        if self._split:
+            self.replace(extract_code_block(self.text, partial=True) if self.mode == "code" else self.text)
+        with _totals_lock:
+            _totals["streams"] += 1
+        return self.text
+
+    def _send(self, placeholder, payload: str):
+        start = time.perf_counter()
+        if self.mode == "code":
+            placeholder.code(payload, language=self.language)
+        else:
+            placeholder.markdown(payload)
+        elapsed = time.perf_counter() - start
+
+        self.flushes += 1
+        self.bytes_sent += len(payload.encode("utf-8"))
+        self.render_seconds += elapsed
+        self.max_render_seconds = max(self.max_render_seconds, elapsed)
+        if self.first_flush_seconds is None:
+            self.first_flush_seconds = time.perf_counter() - self._started
+        with _totals_lock:
+            _totals["flushes"] += 1
+            _totals["bytes_sent"] += len(payload.encode("utf-8"))
+            _totals["render_seconds"] += elapsed
+
+    def _freeze_boundary(self) -> int:
+        # Last paragraph break after the frozen region that is not inside a code fence
+        boundary = self.text.rfind("\n\n", self._frozen_upto)
+        while boundary != -1:
+            fences = self._frozen_fences + self.text.count("```", self._frozen_upto, boundary)
+            if fences % 2 == 0:
+                return boundary + 2
+            boundary = self.text.rfind("\n\n", self._frozen_upto, boundary)
+        # Inside a long fence: the last completed line, after the fence's opening line
+        if (self._frozen_fences + self.text.count("```", self._frozen_upto)) % 2 == 1:
+            fence = self.text.rfind("```", self._frozen_upto)
+            # A fence opened in a frozen segment was already reopened
+            opened = self.text.find("\n", fence) + 1 if fence != -1 else self._frozen_upto
+            line_end = self.text.rfind("\n", opened) if opened else -1
+            if line_end != -1 and line_end + 1 - self._frozen_upto >= RENDER_CODE_SEGMENT_BYTES:
+                return line_end + 1
+        return -1
+
+    def _new_segment(self):
+        self._segments.append(self.container.empty())
+
+    def _flush_code(self):
+        code = extract_code_block(self.text, partial=True)
+        if not code.startswith(self._frozen_code):
+            # The extracted block changed (e.g. the fence only just opened): start over
+            for placeholder in self._segments[1:]:
+                placeholder.empty()
+            self._segments = self._segments[:1]
+            self._frozen_code = ""
+        pending = code[len(self._frozen_code):]
+        if len(pending) >= RENDER_CODE_SEGMENT_BYTES and "\n" in pending:
+            # Freeze the completed lines; only the last line keeps being re-sent
+            completed = pending[:pending.rindex("\n") + 1]
+            self._send(self._segments[-1], completed.rstrip("\n"))
+            self._frozen_code += completed
+            pending = pending[len(completed):]
+            self._new_segment()
+            self._split = True
+        if pending or not self._frozen_code:
+            self._send(self._segments[-1], pending)
+
+    def flush(self):
+        """Send the pending output to the browser."""
+        self._last_flush = time.perf_counter()
+        self._rendered_upto = len(self.text)
+
+        if self.mode == "code":
+            self._flush_code()
+            return
+
+        boundary = self._freeze_boundary()
+        if boundary > self._frozen_upto:
+            # Finish the current segment and start a new one for the remainder
+            frozen = self.text[self._frozen_upto:boundary]
+            self._frozen_fences += frozen.count("```")
+            if self._frozen_fences % 2 == 1:
+                # Split inside a fence: close it here and reopen it in the next segment
+                opener = self._reopen_fence + frozen
+                opener = opener[opener.rindex("```"):]
+                self._send(self._segments[-1], self._reopen_fence + frozen + "```")
+                self._reopen_fence = opener[:opener.index("\n") + 1]
+                self._split = True
+            else:
+                self._send(self._segments[-1], self._reopen_fence + frozen)
+                self._reopen_fence = ""
+            self._frozen_upto = boundary
+            self._new_segment()
+        tail = self.text[self._frozen_upto:]
+        if tail:
+            self._send(self._segments[-1], self._reopen_fence + tail)
+
+    def replace(self, text: str):
+        """Replace everything rendered so far with the given final text."""
+        for placeholder in self._segments[1:]:
+            placeholder.empty()
+        self._segments = self._segments[:1]
+        self._split = False
+        self._send(self._segments[0], text)
+
+    def metrics(self) -> dict:
+        """
+        Return rendering metrics for this stream.
+
+        Returns:
+            dict: flushes, bytes_sent, chars_received, avg/max render latency and
+            time to first flush (seconds).
+        """
+        return {
+            "flushes": self.flushes,
+            "bytes_sent": self.bytes_sent,
+            "chars_received": len(self.text),
+            "avg_render_seconds": self.render_seconds / self.flushes if self.flushes else 0.0,
+            "max_render_seconds": self.max_render_seconds,
+            "first_flush_seconds": self.first_flush_seconds,
+        }
+
+
+def get_render_stats() -> dict:
+    """Return rendering totals across every stream in this process."""
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["avg_render_seconds"] = (
+        totals["render_seconds"] / totals["flushes"] if totals["flushes"] else 0.0
+    )
+    return totals
@@ -0,0 +1,234 @@
+"""
+Local token estimation and pre-flight budgeting for provider requests.
+
+Prompt sizes are estimated locally with a tokenizer approximation, so that
+oversized inputs are rejected (or routed to a model with a larger context
+window) before any network call, and output budgets (max_tokens) can be sized
+from the input instead of being fixed per feature. Estimates are compared with
+the token usage the providers report, and a per-model correction factor is
+learned from that, so the calibration error can be tracked.
+"""
+import os
+import re
+import math
+import threading
+
+# Context windows (prompt + completion tokens) of the models the app uses
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "llama3-70b-8192": 8192,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 131072,
+    "qwen-qwq-32b": 131072,
+    "qwen-2.5-coder-32b": 131072,
+    "deepseek-r1-distill-llama-70b": 131072,
+    "gemma2-9b-it": 8192,
+    "gemini-2.0-flash": 1048576,
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.environ.get("FIXIFOX_DEFAULT_CONTEXT_WINDOW", "8192"))
+MAX_OUTPUT_TOKENS = int(os.environ.get("FIXIFOX_MAX_OUTPUT_TOKENS", "8192"))
+# Smallest output budget worth sending a request for
+MIN_OUTPUT_TOKENS = int(os.environ.get("FIXIFOX_MIN_OUTPUT_TOKENS", "512"))
+
+# Calibration: weight of each new observation in the running correction factor
+CALIBRATION_ALPHA = 0.2
+
+# Word pieces, digit runs, whitespace runs and symbol runs
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[ \t]+|\n+|[^\sA-Za-z\d]+")
+
+
+class TokenBudgetError(Exception):
+    """Raised before sending a request that cannot fit in the model's context window."""
+
+    def __init__(self, model: str, prompt_tokens: int, context_window: int):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.context_window = context_window
+        super().__init__(
+            f"The input is too large for {model}: about {prompt_tokens} tokens "
+            f"against a context window of {context_window}."
+        )
+
+
+def _raw_estimate(text: str) -> int:
+    # BPE vocabularies keep common words whole (with their leading space), split
+    # long identifiers into pieces of a few characters and merge common pairs
+    # of symbols such as "()", "):" or "=="
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            tokens += 1 + (len(piece) - 1) // 6
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif first == "\n":
+            tokens += 1
+        elif first in " \t":
+            # A single space is part of the next word; indentation is merged into a few tokens
+            tokens += 0 if len(piece) == 1 else math.ceil(len(piece) / 8)
+        else:
+            tokens += math.ceil(len(piece) / 2)
+    return tokens
+
+
+class TokenEstimator:
+    """Tokenizer approximation with per-model calibration against reported usage."""
+
+    def __init__(self):
+        self._factors = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, text: str, model: str = None) -> int:
+        """
+        Estimate the number of tokens in a text.
+
+        Args:
+            text (str): The text.
+            model (str, optional): Model whose calibration factor to apply.
+
+        Returns:
+            int: Estimated token count.
+        """
+        if not text:
+            return 0
+        with self._lock:
+            factor = self._factors.get(model, 1.0)
+        return max(1, round(_raw_estimate(text) * factor))
+
+    def record_usage(self, provider: str, model: str, text: str, reported_tokens: int):
+        """
+        Compare the estimate for a prompt with the provider's reported prompt tokens.
+
+        Args:
+            provider (str): Provider name ("groq" or "gemini").
+            model (str): Model name.
+            text (str): The prompt that was sent.
+            reported_tokens (int): Prompt tokens reported by the provider.
+        """
+        if not text or not reported_tokens:
+            return
+        raw = _raw_estimate(text)
+        with self._lock:
+            factor = self._factors.get(model, 1.0)
+            estimated = raw * factor
+            error = (estimated - reported_tokens) / reported_tokens
+            self._factors[model] = (1 - CALIBRATION_ALPHA) * factor + CALIBRATION_ALPHA * (reported_tokens / raw)
+            stats = self._stats.setdefault(f"{provider}:{model}", {"samples": 0, "abs_error": 0.0, "last_error": 0.0})
+            stats["samples"] += 1
+            stats["abs_error"] += abs(error)
+            stats["last_error"] = error
+
+    def stats(self) -> dict:
+        """
+        Return calibration statistics per provider model.
+
+        Returns:
+            dict: {"provider:model": {"samples", "mean_abs_error", "last_error", "factor"}}
+            where errors are relative (0.1 means the estimate was 10% off).
+        """
+        with self._lock:
+            return {
+                key: {
+                    "samples": stats["samples"],
+                    "mean_abs_error": stats["abs_error"] / stats["samples"],
+                    "last_error": stats["last_error"],
+                    "factor": self._factors.get(key.split(":", 1)[1], 1.0),
+                }
+                for key, stats in self._stats.items()
+            }
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_token_estimator() -> TokenEstimator:
+    """Return the process-wide token estimator."""
+    global _estimator
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                _estimator = TokenEstimator()
+    return _estimator
+
+
+def estimate_tokens(text: str, model: str = None) -> int:
+    """Estimate the number of tokens in a text with the shared, calibrated estimator."""
+    return get_token_estimator().estimate(text, model)
+
+
+def context_window(model: str) -> int:
+    """Return the context window of a model, or DEFAULT_CONTEXT_WINDOW if unknown."""
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def check_fits(model: str, prompt: str, output_tokens: int = 0) -> int:
+    """
+    Raise TokenBudgetError if the prompt (plus a minimal output) cannot fit the model.
+
+    Returns:
+        int: Estimated prompt tokens.
+    """
+    prompt_tokens = estimate_tokens(prompt, model)
+    window = context_window(model)
+    if prompt_tokens + min(output_tokens, 256) > window:
+        raise TokenBudgetError(model, prompt_tokens, window)
+    return prompt_tokens
+
+
+def plan_output_tokens(
+    model: str,
+    prompt: str,
+    source: str = None,
+    ratio: float = 1.0,
+    minimum: int = MIN_OUTPUT_TOKENS,
+    maximum: int = MAX_OUTPUT_TOKENS
+) -> int:
+    """
+    Size max_tokens for a request from its input.
+
+    Args:
+        model (str): Model name.
+        prompt (str): The full prompt.
+        source (str, optional): The user's input inside the prompt (e.g. the code
+            to fix). The output budget is ``ratio`` times its size. Defaults to the prompt.
+        ratio (float, optional): Expected output size relative to the source.
+        minimum (int, optional): Smallest budget to ask for.
+        maximum (int, optional): Largest budget to ask for.
+
+    Returns:
+        int: The output budget, capped by what is left of the context window.
+
+    Raises:
+        TokenBudgetError: If the prompt does not leave room for the minimum output.
+    """
+    prompt_tokens = check_fits(model, prompt)
+    source_tokens = estimate_tokens(source, model) if source is not None else prompt_tokens
+    budget = max(minimum, min(maximum, int(source_tokens * ratio) + 256))
+    available = context_window(model) - prompt_tokens
+    if available < min(minimum, budget):
+        raise TokenBudgetError(model, prompt_tokens, context_window(model))
+    return min(budget, available)
+
+
+def models_that_fit(models: list, prompt: str, output_tokens: int = 0) -> list:
+    """
+    Filter a fallback chain down to the models whose context window fits the prompt.
+
+    Raises:
+        TokenBudgetError: If no model fits (reported against the largest window).
+    """
+    fitting = []
+    for model in models:
+        try:
+            check_fits(model, prompt, output_tokens)
+            fitting.append(model)
+        except TokenBudgetError:
+            continue
+    if not fitting:
+        largest = max(models, key=context_window)
+        raise TokenBudgetError(largest, estimate_tokens(prompt, largest), context_window(largest))
+    return fitting
@@ -0,0 +1,323 @@
+"""
+Execution tracer for the Interactive Debugging Tool's Debug mode.
+
+Run in the sandbox as a harness (see sandbox.run_code):
+
+    python harness.py main.py .result.json TIME_LIMIT [breakpoint line ...]
+
+The program runs under ``sys.settrace``. The tracer records how often each
+line ran, the order in which lines ran (up to TRACE_MAX_STEPS), variable
+snapshots and the call stack at the breakpoint lines, the locals of each
+function when it returns, and the exceptions raised. format_trace_summary
+compacts the result into a bounded text for the prompt: repeated loop
+iterations are collapsed, only the first and last hits of a breakpoint are
+kept, and long values are truncated. A program still running after
+TIME_LIMIT seconds is stopped and the trace recorded so far is kept.
+
+Only the standard library is used, because this file runs inside the sandbox.
+"""
+import os
+import sys
+import json
+import runpy
+import signal
+import reprlib
+import traceback
+
+TRACE_MAX_STEPS = 5000
+TRACE_MAX_LINE_EVENTS = 200000
+# Snapshots kept per breakpoint: the first few hits and the last one
+SNAPSHOTS_FIRST_HITS = 3
+# Function returns recorded per function
+RETURNS_PER_FUNCTION = 2
+MAX_VALUE_CHARS = 80
+MAX_VARIABLES = 20
+MAX_STACK_DEPTH = 10
+MAX_EXCEPTIONS = 10
+# Upper bound of format_trace_summary's output
+MAX_SUMMARY_CHARS = 4000
+# Longest repeated block of lines collapsed into "× N"
+MAX_LOOP_BODY = 30
+
+_repr = reprlib.Repr()
+_repr.maxstring = MAX_VALUE_CHARS
+_repr.maxother = MAX_VALUE_CHARS
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 8
+
+
+def safe_repr(value) -> str:
+    """repr() shortened to about MAX_VALUE_CHARS; never raises."""
+    try:
+        text = _repr.repr(value)
+    except Exception as error:
+        text = f"<unprintable {type(value).__name__}: {type(error).__name__}>"
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS - 3] + "..."
+
+
+def _variables(frame) -> dict:
+    names = [name for name in frame.f_locals if not (name.startswith("__") and name.endswith("__"))]
+    variables = {}
+    for name in names[:MAX_VARIABLES]:
+        value = frame.f_locals[name]
+        if type(value).__name__ in ("module", "function", "type", "builtin_function_or_method"):
+            continue
+        variables[name] = safe_repr(value)
+    return variables
+
+
+class Tracer:
+    """
+    Records the execution of one program file.
+
+    Args:
+        path (str): The program's file; frames from other files are not traced.
+        breakpoints (set): Line numbers where snapshots are taken.
+    """
+
+    def __init__(self, path: str, breakpoints: set):
+        self.path = path
+        self.breakpoints = breakpoints
+        self.line_hits = {}
+        self.steps = []
+        self.line_events = 0
+        self.truncated = False
+        self.snapshots = {line: {"hits": 0, "first": [], "last": None} for line in breakpoints}
+        self.calls = {}
+        self.returns = {}
+        self.max_depth = 0
+        self.exceptions = []
+        self._last_error = None
+        self._raising = None
+
+    def _stack(self, frame) -> list:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            if frame.f_code.co_filename == self.path:
+                stack.append(f"{frame.f_code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return list(reversed(stack))
+
+    def global_trace(self, frame, event, arg):
+        if frame.f_code.co_filename != self.path or self.truncated:
+            return None
+        name = frame.f_code.co_name
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.max_depth = max(self.max_depth, len(self._stack(frame)))
+        return self.local_trace
+
+    def local_trace(self, frame, event, arg):
+        if event == "line":
+            self.line_events += 1
+            if self.line_events > TRACE_MAX_LINE_EVENTS:
+                # Stop tracing; the program keeps running at full speed
+                self.truncated = True
+                sys.settrace(None)
+                return None
+            line = frame.f_lineno
+            self._raising = None
+            self.line_hits[line] = self.line_hits.get(line, 0) + 1
+            if len(self.steps) < TRACE_MAX_STEPS:
+                self.steps.append(line)
+            if line in self.breakpoints:
+                record = self.snapshots[line]
+                record["hits"] += 1
+                snapshot = {"hit": record["hits"], "function": frame.f_code.co_name, "variables": _variables(frame), "stack": self._stack(frame)}
+                if len(record["first"]) < SNAPSHOTS_FIRST_HITS:
+                    record["first"].append(snapshot)
+                else:
+                    record["last"] = snapshot
+        elif event == "return":
+            name = frame.f_code.co_name
+            returns = self.returns.setdefault(name, [])
+            if name != "<module>" and len(returns) < RETURNS_PER_FUNCTION:
+                # A frame left by an exception also gets a "return" event, with None
+                value = f"<raised {type(self._last_error).__name__}>" if self._raising is frame else safe_repr(arg)
+                returns.append({"line": frame.f_lineno, "value": value, "variables": _variables(frame)})
+        elif event == "exception":
+            error_type, error, _ = arg
+            self._raising = frame
+            # Record where an exception was raised, not every frame it passes through
+            if error is self._last_error or len(self.exceptions) >= MAX_EXCEPTIONS:
+                return self.local_trace
+            self._last_error = error
+            self.exceptions.append({
+                "line": frame.f_lineno,
+                "function": frame.f_code.co_name,
+                "type": error_type.__name__,
+                "message": safe_repr(str(error)),
+            })
+        return self.local_trace
+
+    def result(self, error: str = None) -> dict:
+        return {
+            "line_hits": self.line_hits,
+            "steps": self.steps,
+            "line_events": self.line_events,
+            "truncated": self.truncated,
+            "breakpoints": self.snapshots,
+            "calls": self.calls,
+            "returns": self.returns,
+            "max_depth": self.max_depth,
+            "exceptions": self.exceptions,
+            "error": error,
+        }
+
+
+def trace_program(path: str, breakpoints: set, time_limit: float = None, result_path: str = None) -> dict:
+    """
+    Run a program file under the tracer.
+
+    Args:
+        path (str): The program file.
+        breakpoints (set): Line numbers where snapshots are taken.
+        time_limit (float, optional): Stop the program after this many
+            seconds (Unix only). The trace so far is written to result_path
+            and the process exits with status 1.
+        result_path (str, optional): Where to write the trace when stopped.
+
+    Returns:
+        dict: The recorded trace (see Tracer.result); "error" holds the
+            uncaught exception, if any.
+    """
+    tracer = Tracer(path, breakpoints)
+    error = None
+
+    def stop(signal_number, frame):
+        sys.settrace(None)
+        write_result(result_path, tracer.result(f"Stopped after {time_limit:g} s: the program was still running"))
+        os._exit(1)
+
+    if time_limit and result_path:
+        signal.signal(signal.SIGALRM, stop)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    sys.settrace(tracer.global_trace)
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit:
+        pass
+    except BaseException as exception:
+        error = "".join(traceback.format_exception_only(type(exception), exception)).strip()
+    finally:
+        sys.settrace(None)
+        if time_limit and result_path:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return tracer.result(error)
+
+
+def write_result(path: str, trace: dict):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(trace, file)
+
+
+def collapse_loops(steps: list) -> list:
+    """
+    Collapse consecutive repetitions of a block of lines.
+
+    [1, 2, 3, 2, 3, 2, 3, 4] becomes [1, ([2, 3], 3), 4]: items are either a
+    line number or a (block, repetitions) tuple.
+    """
+    result = []
+    index = 0
+    while index < len(steps):
+        best = None
+        for size in range(1, min(MAX_LOOP_BODY, (len(steps) - index) // 2) + 1):
+            block = steps[index:index + size]
+            repeats = 1
+            while steps[index + repeats * size:index + (repeats + 1) * size] == block:
+                repeats += 1
+            if repeats > 1 and (best is None or repeats * size > best[1] * len(best[0])):
+                best = (block, repeats)
+        if best:
+            result.append((collapse_loops(best[0]) if len(best[0]) > 1 else best[0], best[1]))
+            index += len(best[0]) * best[1]
+        else:
+            result.append(steps[index])
+            index += 1
+    return result
+
+
+def _format_steps(items) -> str:
+    parts = []
+    for item in items:
+        if isinstance(item, tuple):
+            block, repeats = item
+            parts.append(f"[{_format_steps(block)}] × {repeats}")
+        else:
+            parts.append(str(item))
+    return " → ".join(parts)
+
+
+def _format_snapshot(snapshot: dict) -> str:
+    variables = ", ".join(f"{name}={value}" for name, value in snapshot["variables"].items()) or "no locals"
+    stack = " > ".join(snapshot["stack"])
+    return f"  hit {snapshot['hit']} in {snapshot['function']}: {variables} (stack: {stack})"
+
+
+def format_trace_summary(trace: dict, options=None, max_chars: int = MAX_SUMMARY_CHARS) -> str:
+    """
+    Compact a recorded trace into text for a prompt.
+
+    Args:
+        trace (dict): Result of trace_program.
+        options (iterable, optional): Debug options selected in the app
+            ("step_by_step", "breakpoints", "watch_variables", "call_stack");
+            all sections are included when omitted.
+        max_chars (int, optional): Upper bound of the summary's length.
+
+    Returns:
+        str: The summary.
+    """
+    options = set(options) if options is not None else {"step_by_step", "breakpoints", "watch_variables", "call_stack"}
+    sections = []
+    if trace.get("error"):
+        sections.append(f"Uncaught exception: {trace['error']}")
+    if trace["exceptions"]:
+        sections.append("Exceptions raised: " + "; ".join(
+            f"{error['type']}({error['message']}) at line {error['line']} in {error['function']}" for error in trace["exceptions"]
+        ))
+    if "breakpoints" in options or "watch_variables" in options:
+        for line, record in sorted(trace["breakpoints"].items(), key=lambda item: int(item[0])):
+            if not record["hits"]:
+                sections.append(f"Breakpoint line {line}: never reached")
+                continue
+            lines = [f"Breakpoint line {line}: hit {record['hits']} times"]
+            lines += [_format_snapshot(snapshot) for snapshot in record["first"]]
+            if record["last"]:
+                if record["last"]["hit"] > SNAPSHOTS_FIRST_HITS + 1:
+                    lines.append("  ...")
+                lines.append(_format_snapshot(record["last"]))
+            sections.append("\n".join(lines))
+    if "watch_variables" in options and trace["returns"]:
+        lines = ["Function returns:"]
+        for name, returns in trace["returns"].items():
+            for record in returns:
+                variables = ", ".join(f"{key}={value}" for key, value in record["variables"].items())
+                lines.append(f"  {name} returned {record['value']} at line {record['line']} ({variables})")
+        sections.append("\n".join(lines))
+    if "call_stack" in options and trace["calls"]:
+        calls = ", ".join(f"{name} ×{count}" for name, count in trace["calls"].items())
+        sections.append(f"Calls: {calls}; deepest stack: {trace['max_depth']} frames")
+    if "step_by_step" in options and trace["steps"]:
+        path = _format_steps(collapse_loops(trace["steps"]))
+        if len(trace["steps"]) < trace["line_events"]:
+            path += f" → ... ({trace['line_events']} lines executed in total)"
+        sections.append(f"Executed lines: {path}")
+    if trace.get("truncated"):
+        sections.append("Tracing stopped early: the program ran too many lines.")
+
+    summary = "\n".join(sections) or "The program ran without executing any traced lines."
+    if len(summary) > max_chars:
+        summary = summary[:max_chars - 15].rstrip() + "\n... (truncated)"
+    return summary
+
+
+if __name__ == "__main__":
+    program, result_path = sys.argv[1], sys.argv[2]
+    time_limit = float(sys.argv[3])
+    breakpoint_lines = {int(line) for line in sys.argv[4:]}
+    sys.argv = [program]
+    trace = trace_program(os.path.abspath(program), breakpoint_lines, time_limit, result_path)
+    write_result(result_path, trace)
+    if trace["error"]:
+        print(trace["error"], file=sys.stderr)
+        sys.exit(1)